@@ -0,0 +1,305 @@
+"""Almacen de evidencias direccionado por contenido.
+
+Cada archivo se guarda una sola vez bajo el SHA-256 de su contenido, asi que
+subir dos veces la misma imagen no ocupa mas espacio. La tarea guarda en
+``evidencia_link`` una referencia ``adjunto:<sha256>.<ext>`` en lugar de una URL.
+
+- ``AlmacenLocal``: directorio en disco (``HAYLEX_DIR_ADJUNTOS``).
+- ``AlmacenSupabase``: bucket de Supabase Storage (``HAYLEX_BUCKET_ADJUNTOS``),
+  con la clave service_role (``SUPABASE_SERVICE_KEY``).
+
+La subida se lee por bloques (hash y copia a un temporal a la vez). Si Pillow
+esta instalado, las imagenes se validan antes de guardarse y se genera su
+miniatura JPEG (si esta falla, el adjunto queda sin miniatura). Las pantallas
+solo piden miniaturas; los bytes leidos se conservan en una cache LRU acotada
+por tamano.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+# --- IMPORTACIÓN PARA MINIATURAS ---
+try:
+    from PIL import Image, ImageOps
+    THUMBNAILS_AVAILABLE = True
+except ImportError:
+    THUMBNAILS_AVAILABLE = False
+
+# --- IMPORTACIÓN PARA SUPABASE STORAGE ---
+try:
+    from supabase import create_client
+    SUPABASE_AVAILABLE = True
+except ImportError:
+    SUPABASE_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+DIR_ADJUNTOS = os.getenv("HAYLEX_DIR_ADJUNTOS", "adjuntos")
+BUCKET_ADJUNTOS = os.getenv("HAYLEX_BUCKET_ADJUNTOS", "evidencias")
+MAX_BYTES_ADJUNTO = 10 * 2**20
+MAX_BYTES_CACHE = 64 * 2**20
+TAMANO_BLOQUE = 2**20
+TAMANO_MINIATURA = (320, 320)
+
+PREFIJO = "adjunto:"
+TIPOS = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "pdf": "application/pdf"}
+IMAGENES = {"png", "jpg", "jpeg"}
+# evidencia_link tambien admite texto libre: solo esto se trata como referencia al almacen.
+_REFERENCIA = re.compile(rf"^{PREFIJO}[0-9a-f]{{64}}\.({'|'.join(TIPOS)})$")
+
+
+class AdjuntoInvalido(ValueError):
+    """Tipo no permitido o archivo demasiado grande."""
+
+
+def es_adjunto(valor):
+    return bool(valor) and _REFERENCIA.match(str(valor)) is not None
+
+
+def _partes(referencia):
+    nombre = referencia[len(PREFIJO):]
+    digest, _, extension = nombre.partition(".")
+    return digest, extension
+
+
+def es_imagen(referencia):
+    return _partes(referencia)[1] in IMAGENES
+
+
+def mime(referencia):
+    return TIPOS.get(_partes(referencia)[1], "application/octet-stream")
+
+
+def _ruta_blob(digest, extension):
+    return f"{digest[:2]}/{digest}.{extension}"
+
+
+def _ruta_miniatura(digest):
+    return f"miniaturas/{digest[:2]}/{digest}.jpg"
+
+
+def _validar_imagen(ruta):
+    try:
+        with Image.open(ruta) as imagen:
+            imagen.verify()
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        raise AdjuntoInvalido("La imagen está dañada o no tiene un formato admitido.") from e
+
+
+def _miniatura(ruta_origen):
+    with Image.open(ruta_origen) as imagen:
+        imagen = ImageOps.exif_transpose(imagen).convert("RGB")
+        imagen.thumbnail(TAMANO_MINIATURA)
+        salida = io.BytesIO()
+        imagen.save(salida, "JPEG", quality=80, optimize=True)
+    return salida.getvalue()
+
+
+class CacheBytes:
+    """LRU de bytes acotada por tamano total, segura entre hilos."""
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._datos[clave] = valor
+            self.bytes += len(valor)
+            while self.bytes > self.max_bytes:
+                _, sobrante = self._datos.popitem(last=False)
+                self.bytes -= len(sobrante)
+
+
+class Almacen:
+    """Operaciones comunes; las subclases implementan ``_existe``, ``_escribir`` y ``_leer``."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else CacheBytes()
+
+    def _existe(self, ruta):
+        raise NotImplementedError
+
+    def _escribir(self, ruta, ruta_origen, tipo):
+        raise NotImplementedError
+
+    def _leer(self, ruta):
+        raise NotImplementedError
+
+    def guardar(self, archivo, nombre):
+        """Guarda un archivo subido (objeto con ``read``) y devuelve su referencia."""
+        extension = os.path.splitext(nombre)[1].lstrip(".").lower()
+        if extension not in TIPOS:
+            raise AdjuntoInvalido(f"Tipo de archivo no permitido: .{extension}")
+        digest = hashlib.sha256()
+        tamano = 0
+        temporal = tempfile.NamedTemporaryFile(delete=False)
+        try:
+            with temporal:
+                for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b""):
+                    tamano += len(bloque)
+                    if tamano > MAX_BYTES_ADJUNTO:
+                        raise AdjuntoInvalido(f"El archivo supera {MAX_BYTES_ADJUNTO // 2**20} MB.")
+                    digest.update(bloque)
+                    temporal.write(bloque)
+            digest = digest.hexdigest()
+            ruta = _ruta_blob(digest, extension)
+            con_miniatura = extension in IMAGENES and THUMBNAILS_AVAILABLE
+            if con_miniatura:
+                # Antes de escribir nada: una imagen invalida no deja rastro en el almacen.
+                _validar_imagen(temporal.name)
+            if not self._existe(ruta):
+                self._escribir(ruta, temporal.name, TIPOS[extension])
+            if con_miniatura and not self._existe(_ruta_miniatura(digest)):
+                self._guardar_miniatura(digest, temporal.name)
+        finally:
+            if os.path.exists(temporal.name):
+                os.remove(temporal.name)
+        return f"{PREFIJO}{digest}.{extension}"
+
+    def _guardar_miniatura(self, digest, ruta_origen):
+        try:
+            datos = _miniatura(ruta_origen)
+        except Exception:
+            log.warning("No se pudo generar la miniatura de %s", digest, exc_info=True)
+            return
+        with tempfile.NamedTemporaryFile(delete=False) as miniatura:
+            miniatura.write(datos)
+        try:
+            self._escribir(_ruta_miniatura(digest), miniatura.name, "image/jpeg")
+        finally:
+            os.remove(miniatura.name)
+
+    def _leer_cacheado(self, ruta):
+        datos = self.cache.obtener(ruta)
+        if datos is None:
+            datos = self._leer(ruta)
+            if datos is not None:
+                self.cache.guardar(ruta, datos)
+        return datos
+
+    def leer(self, referencia):
+        """Bytes del archivo original (o ``None`` si no existe)."""
+        digest, extension = _partes(referencia)
+        return self._leer_cacheado(_ruta_blob(digest, extension))
+
+    def miniatura(self, referencia):
+        """Bytes JPEG de la miniatura; si no hay, los del original cuando es imagen."""
+        digest, _ = _partes(referencia)
+        datos = self._leer_cacheado(_ruta_miniatura(digest))
+        if datos is None and es_imagen(referencia):
+            datos = self.leer(referencia)
+        return datos
+
+
+class AlmacenLocal(Almacen):
+    def __init__(self, directorio=DIR_ADJUNTOS, cache=None):
+        super().__init__(cache)
+        self.directorio = directorio
+
+    def _ruta(self, ruta):
+        return os.path.join(self.directorio, *ruta.split("/"))
+
+    def _existe(self, ruta):
+        return os.path.exists(self._ruta(ruta))
+
+    def _escribir(self, ruta, ruta_origen, tipo):
+        destino = self._ruta(ruta)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f"{destino}.{threading.get_ident()}.tmp"
+        with open(ruta_origen, "rb") as origen, open(temporal, "wb") as f:
+            for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b""):
+                f.write(bloque)
+        os.replace(temporal, destino)
+
+    def _leer(self, ruta):
+        try:
+            with open(self._ruta(ruta), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class AlmacenSupabase(Almacen):
+    """Bucket privado de Supabase Storage (ver sql/supabase_storage.sql)."""
+
+    def __init__(self, url, key, bucket=BUCKET_ADJUNTOS, cache=None):
+        super().__init__(cache)
+        self.bucket = create_client(url, key).storage.from_(bucket)
+
+    def _existe(self, ruta):
+        carpeta, _, nombre = ruta.rpartition("/")
+        return any(f.get("name") == nombre for f in self.bucket.list(carpeta, {"search": nombre}) or [])
+
+    def _escribir(self, ruta, ruta_origen, tipo):
+        # Sin upsert: el contenido es el mismo, si otra sesion lo subio antes basta con el suyo.
+        try:
+            self.bucket.upload(ruta, ruta_origen, {"content-type": tipo, "upsert": "false"})
+        except Exception:
+            if not self._existe(ruta):
+                raise
+
+    def _leer(self, ruta):
+        try:
+            return self.bucket.download(ruta)
+        except Exception:
+            return None
+
+
+def crear_almacen(backend=None):
+    """Almacen local con el backend SQLite; Supabase Storage en otro caso."""
+    backend = (backend or os.getenv("HAYLEX_BACKEND", "supabase")).lower()
+    if backend == "sqlite" or not SUPABASE_AVAILABLE:
+        return AlmacenLocal()
+    # Las politicas del bucket solo admiten service_role (ver sql/supabase_storage.sql).
+    return AlmacenSupabase(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY"))
+
+
+# --- IMAGENES DE DISCO (LOGO) ---
+_CACHE_DISCO = CacheBytes(8 * 2**20)
+
+
+def imagen_disco(ruta):
+    """Bytes de una imagen local, releidos solo si cambia el archivo; ``None`` si no existe."""
+    try:
+        info = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    clave = (ruta, info.st_mtime_ns, info.st_size)
+    datos = _CACHE_DISCO.obtener(clave)
+    if datos is None:
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        _CACHE_DISCO.guardar(clave, datos)
+    return datos
+
+
+def reemplazar_si_cambia(ruta, datos):
+    """Escribe ``datos`` en ``ruta`` solo si difieren del contenido actual. Devuelve si escribio."""
+    actual = imagen_disco(ruta)
+    if actual == datos:
+        return False
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+    return True
@@ -1,16 +1,26 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import plotly.express as px
-from datetime import datetime
+from datetime import date, datetime
 import os
-from supabase import create_client, Client
-
-# --- IMPORTACIÓN PARA PDF ---
-try:
-    from fpdf import FPDF
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+import time
+from repositorio import crear_repositorio, leer_en_paralelo
+from cache import CACHE, RepositorioCacheado, tablas_de_evento
+from bandeja import Bandeja
+from notificaciones import BUS, INTERVALO_NOTIFICACIONES, enviada_a_revision, iniciar_realtime
+from documentos import PDF_AVAILABLE, ErrorPDF, PDFNoDisponible, guia_pdf, precalentar_guias
+from metricas import (VENTANA_PERSONALIZADA, VENTANA_SEMANAS_ISO, VENTANAS, rango_semanas_iso,
+                      rango_ultimos_dias, tablero)
+from exportacion import EXPORTACIONES, ExportacionesOcupadas, formatos_disponibles
+from adjuntos import (AdjuntoInvalido, crear_almacen, es_adjunto, es_imagen, imagen_disco, mime,
+                      reemplazar_si_cambia)
+from importacion import (CSVInvalido, importar_clientes, importar_reasignaciones, importar_usuarios,
+                         reporte_errores_csv)
+from instrumentacion import REGISTRO, RepositorioInstrumentado, iniciar_servidor_metricas, tramo
+from estado import BORRADORES
+from sesiones import COOKIE_SESION, REVALIDAR_SESION, SESIONES, script_cookie
+from credenciales import DemasiadosIntentos, iniciar_sesion
+from autoguardado import ColaAutoguardado
 
 # --- CONFIGURACION ---
 st.set_page_config(page_title="HAYLEX CLOUD PRO", layout="wide")
@@ -18,158 +28,244 @@ st.set_page_config(page_title="HAYLEX CLOUD PRO", layout="wide")
 LOGO_PATH = "logo_pers.png"
 DEVELOPER_LOGO = "MM.png"  # Asegúrate de tener este archivo en tu repo
 
-# --- SUPABASE ---
+# --- BASE DE DATOS ---
+# HAYLEX_BACKEND=sqlite usa haylex_data.db local; por defecto se usa Supabase.
+BACKEND = os.getenv("HAYLEX_BACKEND", "supabase").lower()
 SUPABASE_URL = os.getenv("SUPABASE_URL", "TU_URL_DE_SUPABASE")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "TU_CLAVE_ANON_DE_SUPABASE")
+# Si se define, /metrics (formato Prometheus) se sirve en este puerto, solo en
+# 127.0.0.1 salvo que HAYLEX_HOST_METRICAS indique otra interfaz.
+PUERTO_METRICAS = os.getenv("HAYLEX_PUERTO_METRICAS")
 
-if "TU_URL" in SUPABASE_URL or "TU_CLAVE" in SUPABASE_KEY:
+if BACKEND != "sqlite" and ("TU_URL" in SUPABASE_URL or "TU_CLAVE" in SUPABASE_KEY):
     st.error("❌ Debes configurar las variables de entorno SUPABASE_URL y SUPABASE_KEY.")
     st.stop()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def inicializar_db(repo):
+    """Asegura que el usuario GERENCIA exista en la base de datos."""
+    if repo.obtener_usuario("GERENCIA") is None:
+        repo.crear_usuario("GERENCIA", "admin123", "admin")
 
-def inicializar_db():
-    """Asegura que el usuario GERENCIA exista en Supabase."""
-    try:
-        res = supabase.table("usuarios").select("*").eq("usuario", "GERENCIA").execute()
-        if not res.data:
-            supabase.table("usuarios").insert({
-                "usuario": "GERENCIA",
-                "pass": "admin123",
-                "rol": "admin"
-            }).execute()
-    except Exception as e:
-        st.error(f"Error al inicializar Supabase: {e}")
+@st.cache_resource(show_spinner=False)
+def arrancar_sistema(backend):
+    """Arranque único por proceso, compartido por todas las sesiones.
+
+    Crea un solo cliente de base de datos (Supabase reutiliza su sesión HTTP
+    keep-alive; SQLite su conexión WAL), comprueba el usuario GERENCIA y
+    conecta el bus de notificaciones. Si falla no queda en caché y se reintenta.
+    """
+    # Las lecturas pasan por la cache compartida; las escrituras la invalidan.
+    # Debajo de la cache se mide cada consulta que llega realmente al backend.
+    repo = RepositorioCacheado(RepositorioInstrumentado(crear_repositorio(backend), REGISTRO), CACHE)
+    inicializar_db(repo)
+    # Cambios hechos por otras sesiones o procesos llegan por el bus e invalidan la cache.
+    BUS.suscribir("cache", lambda evento: [CACHE.invalidar(tabla) for tabla in tablas_de_evento(evento)])
+    if backend != "sqlite":
+        iniciar_realtime(SUPABASE_URL, SUPABASE_KEY)
+    precalentar_guias()
+    if PUERTO_METRICAS:
+        iniciar_servidor_metricas(PUERTO_METRICAS, CACHE)
+    return repo
 
-inicializar_db()
+@st.cache_resource(show_spinner=False)
+def obtener_almacen(backend):
+    """Almacen de evidencias (disco local o Supabase Storage), uno por proceso."""
+    return crear_almacen(backend)
+
+@st.cache_resource(show_spinner=False)
+def obtener_autoguardado(backend):
+    """Cola de autoguardado de borradores, una por proceso (escribe por el repo cacheado)."""
+    return ColaAutoguardado(arrancar_sistema(backend))
+
+try:
+    repo = arrancar_sistema(BACKEND)
+    almacen = obtener_almacen(BACKEND)
+    autoguardado = obtener_autoguardado(BACKEND)
+except Exception as e:
+    st.error(f"Error al inicializar la base de datos: {e}")
+    st.stop()
 
 def mostrar_cabecera(titulo):
     col_img, col_txt = st.columns([1, 7])
-    if os.path.exists(LOGO_PATH):
-        col_img.image(LOGO_PATH, width=100)
+    logo = imagen_disco(LOGO_PATH)
+    if logo:
+        col_img.image(logo, width=100)
     col_txt.title(titulo)
     st.divider()
 
+def formatear_fecha(valor):
+    """Muestra una fecha ISO de tareas como dd/mm/aaaa."""
+    try:
+        return datetime.strptime(str(valor)[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        return valor or "Fecha no disponible"
+
+def miniatura_evidencia(evidencia, etiqueta="VER EVIDENCIA ADJUNTA"):
+    """Enlace o miniatura de la evidencia; nunca descarga el archivo original."""
+    if not evidencia:
+        return
+    if es_adjunto(evidencia):
+        if not es_imagen(evidencia):
+            st.caption("📎 Documento PDF adjunto")
+            return
+        datos = almacen.miniatura(evidencia)
+        if datos:
+            st.image(datos, width=240)
+        else:
+            st.warning("No se encontró la evidencia adjunta.")
+    elif evidencia.startswith("http"):
+        st.link_button(etiqueta, evidencia)
+    else:
+        st.warning("Evidencia local no disponible en la nube.")
+
+def evidencia_original(evidencia, clave):
+    """Imagen completa o descarga del PDF; se carga solo cuando se pide."""
+    datos = almacen.leer(evidencia)
+    if datos is None:
+        st.warning("No se encontró la evidencia adjunta.")
+    elif es_imagen(evidencia):
+        st.image(datos, use_container_width=True)
+    else:
+        st.download_button("⬇️ Descargar evidencia", datos, file_name="evidencia.pdf",
+                           mime=mime(evidencia), key=f"desc_{clave}")
+
 def reiniciar_sistema():
     """Borra todos los datos excepto GERENCIA (solo en desarrollo local)."""
     try:
-        supabase.table("tareas").delete().execute()
-        supabase.table("clientes").delete().execute()
-        supabase.table("mensajes").delete().execute()
-        supabase.table("usuarios").delete().neq("usuario", "GERENCIA").execute()
+        repo.reiniciar()
         st.success("✅ Sistema reiniciado exitosamente.")
     except Exception as e:
         st.error(f"Error al reiniciar: {e}")
 
-def generar_pdf_ayuda(rol):
-    if not PDF_AVAILABLE:
-        return None
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    try:
-        pdf.set_font("Arial", size=12)
-    except:
-        pdf.set_font("Helvetica", size=12)
-
-    pdf.set_font_size(16)
-    if rol == 'admin':
-        pdf.cell(0, 10, 'Guía del Administrador - HAYLEX CLOUD PRO', ln=True, align='C')
-    else:
-        pdf.cell(0, 10, 'Guía del Ejecutivo - HAYLEX CLOUD PRO', ln=True, align='C')
-    
-    pdf.ln(10)
-    pdf.set_font_size(12)
-
-    if rol == 'admin':
-        contenido = """
-PANEL DE ADMINISTRACIÓN
-
-1. Evaluación de Tareas
-   - Revise las tareas enviadas por los ejecutivos.
-   - Asigne una calificación (%) y deje comentarios.
-   - Al guardar, la tarea se marca como Finalizado.
-
-2. Gestión de Clientes
-   - Registre nuevos clientes y asígneles un ejecutivo.
-   - Edite o elimine clientes existentes.
+# Funciones para mensajería
+def enviar_mensaje(remitente, destinatario, mensaje):
+    repo.enviar_mensaje(remitente, destinatario, mensaje, datetime.now().strftime("%d/%m/%Y %H:%M"))
 
-3. Gestión de Usuarios
-   - Cree nuevas cuentas para ejecutivos.
-   - Actualice contraseñas o elimine usuarios.
+@st.fragment(run_every=INTERVALO_NOTIFICACIONES)
+def aviso_notificaciones(usuario, rol):
+    """Avisos en vivo a partir del bus de notificaciones, sin consultar la base de datos."""
+    desde = st.session_state.get('aviso_secuencia', BUS.secuencia)
+    eventos = BUS.eventos_desde(desde)
+    st.session_state.aviso_secuencia = eventos[-1].secuencia if eventos else desde
+    for evento in eventos:
+        if evento.tabla == "mensajes" and evento.fila.get("destinatario") == usuario:
+            st.toast(f"✉️ Nuevo mensaje de {evento.fila.get('remitente')}")
+        elif rol == 'admin' and enviada_a_revision(evento):
+            st.session_state.revisiones_nuevas = st.session_state.get('revisiones_nuevas', 0) + 1
+            st.toast("📥 Nueva tarea enviada a revisión")
 
-4. Métricas de Desempeño
-   - Visualice el avance individual y por cliente/proyecto.
-   - Use filtros para analizar periodos específicos.
+    if st.session_state.get('revisiones_nuevas'):
+        col_aviso, col_btn = st.columns([4, 1])
+        col_aviso.info(f"🔔 {st.session_state.revisiones_nuevas} tarea(s) nueva(s) en revisión.")
+        if col_btn.button("Actualizar", use_container_width=True):
+            st.session_state.revisiones_nuevas = 0
+            st.rerun()
 
-5. Reiniciar Sistema
-   - Borre todos los datos (excepto su cuenta) si es necesario.
-        """
-    else:
-        contenido = """
-PORTAL DEL EJECUTIVO
+@st.fragment(run_every=INTERVALO_NOTIFICACIONES)
+def mostrar_bandeja(usuario):
+    """Bandeja de entrada incremental; se refresca sola cuando el bus avisa de mensajes nuevos."""
+    bandeja = st.session_state.get('bandeja')
+    if bandeja is None or bandeja.usuario != usuario:
+        bandeja = st.session_state.bandeja = Bandeja(usuario)
+    # En una ejecución completa siempre se consulta; en los ciclos del fragmento, solo si hay eventos.
+    refrescar = st.session_state.pop('bandeja_refrescar', False)
+    secuencia = BUS.secuencia
+    eventos = BUS.eventos_desde(bandeja.secuencia, "mensajes")
+    bandeja.secuencia = secuencia
+    if refrescar or any(bandeja.es_relevante(e) for e in eventos):
+        bandeja.no_leidos = leer_en_paralelo(
+            repo,
+            mensajes=(bandeja.actualizar, repo),
+            no_leidos=(repo.contar_no_leidos, usuario),
+        )["no_leidos"]
 
-1. Trabajo Actual
-   - Seleccione un cliente asignado.
-   - Escriba hasta 6 tareas (puede agregar más).
-   - Adjunte evidencia como imagen (formatos: PNG, JPG).
+    no_leidos = bandeja.no_leidos
+    st.subheader(f"Bandeja de Entrada ({no_leidos} sin leer)" if no_leidos else "Bandeja de Entrada")
+    if not bandeja.mensajes:
+        st.info("No tienes mensajes.")
+        return
+    for msg in bandeja.mensajes:
+        if msg['remitente'] == usuario:
+            st.info(f"**Tú** a {msg['destinatario']} ({msg['fecha']}): {msg['mensaje']}")
+        else:
+            st.success(f"**{msg['remitente']}** ({msg['fecha']}): {msg['mensaje']}")
+    bandeja.marcar_leidos(repo)
 
-2. Guardar vs Enviar
-   - 💾 Guardar progreso: Guarda sus cambios sin enviarlos a revisión.
-   - 📤 Enviar a revisión: Envía sus tareas al administrador para evaluación.
+    if bandeja.hay_anteriores and st.button("Cargar mensajes anteriores", key="bandeja_anteriores"):
+        bandeja.cargar_anteriores(repo)
+        st.rerun(scope="fragment")
 
-3. Editar Tareas Enviadas
-   - Puede seguir editando tareas que ya envió, mientras no estén Finalizadas.
-   - Las tareas Finalizadas solo se ven en el historial.
+# --- BARRA LATERAL ---
+def sello_sesion(usuario):
+    """Hash de clave vigente: los tokens emitidos antes de cambiar la clave dejan de validar."""
+    fila = repo.credencial(usuario)
+    return fila['pass'] if fila is not None else None
 
-4. Historial
-   - Revise sus tareas evaluadas, calificaciones y comentarios del admin.
-        """
+def restaurar_sesion():
+    """Sesion nueva en esta replica: si la cookie trae un token valido se retoma sin pedir la clave."""
+    token = st.context.cookies.get(COOKIE_SESION)
+    sesion = SESIONES.validar(token, sello_sesion)
+    if sesion is not None:
+        usuario_db = repo.obtener_usuario(sesion['user'])
+        if usuario_db is not None and usuario_db['rol'] == sesion['rol']:
+            st.session_state.token_sesion = token
+            return {'conectado': True, 'user': sesion['user'], 'rol': sesion['rol']}
+    return {'conectado': False, 'user': None, 'rol': None}
 
-    for line in contenido.strip().split('\n'):
-        pdf.multi_cell(0, 8, line.strip())
-    
-    return pdf.output(dest='S')
+def cerrar_sesion_local():
+    """Olvida la sesion en esta pestana y borra la cookie del navegador."""
+    st.session_state.auth = {'conectado': False, 'user': None, 'rol': None}
+    st.session_state.pop('token_sesion', None)
+    st.session_state.pop('sesion_validada', None)
+    st.session_state.cookie_pendiente = None
+    st.session_state.pop('borrador', None)
+    st.session_state.pop('autoguardado_ultimo', None)
 
-# Funciones para mensajería
-def enviar_mensaje(remitente, destinatario, mensaje):
-    supabase.table("mensajes").insert({
-        "remitente": remitente,
-        "destinatario": destinatario,
-        "mensaje": mensaje,
-        "fecha": datetime.now().strftime("%d/%m/%Y %H:%M")
-    }).execute()
+def sesion_vigente():
+    """Vuelve a validar el token cada ``REVALIDAR_SESION`` s (clave cambiada, salida en otra pestana)."""
+    ahora = time.monotonic()
+    ultima = st.session_state.get('sesion_validada')
+    if ultima is not None and ahora - ultima < REVALIDAR_SESION:
+        return True
+    sesion = SESIONES.validar(st.session_state.get('token_sesion'), sello_sesion)
+    auth = st.session_state.auth
+    if sesion is None or (sesion['user'], sesion['rol']) != (auth['user'], auth['rol']):
+        return False
+    st.session_state.sesion_validada = ahora
+    return True
 
-def obtener_mensajes(usuario):
-    res = supabase.table("mensajes").select("*").or_(f"destinatario.eq.{usuario},remitente.eq.{usuario}").order("id", desc=True).execute()
-    return pd.DataFrame(res.data)
+if 'auth' not in st.session_state:
+    st.session_state.auth = restaurar_sesion()
+elif st.session_state.auth['conectado'] and not sesion_vigente():
+    cerrar_sesion_local()
+    st.warning("Su sesión terminó (clave cambiada o sesión cerrada en otra pestaña). Ingrese nuevamente.")
 
-def marcar_como_leido(mensaje_id):
-    supabase.table("mensajes").update({"leido": 1}).eq("id", mensaje_id).execute()
+# Cookie pendiente (ingreso, salida o sesion vencida): se escribe una sola vez.
+if 'cookie_pendiente' in st.session_state:
+    components.html(script_cookie(st.session_state.pop('cookie_pendiente')), height=0)
 
-# --- BARRA LATERAL ---
-if 'auth' not in st.session_state:
-    st.session_state.auth = {'conectado': False, 'user': None, 'rol': None}
+REGISTRO.iniciar_rerun()
 
-with st.sidebar:
+with st.sidebar, tramo("sidebar"):
     st.header("CONFIGURACION")
     # Solo permitir subida de logo en desarrollo local (no en Streamlit Cloud)
     if "STREAMLIT_RUNTIME" not in os.environ:
         with st.expander("Imagen de Empresa"):
             logo_file = st.file_uploader("Subir imagen institucional", type=["png", "jpg", "jpeg"])
-            if logo_file:
-                with open(LOGO_PATH, "wb") as f:
-                    f.write(logo_file.getbuffer())
+            # El archivo sigue en el widget tras el rerun: solo se escribe si cambió.
+            if logo_file and reemplazar_si_cambia(LOGO_PATH, logo_file.getvalue()):
                 st.rerun()
     
-    if os.path.exists(LOGO_PATH):
-        st.image(LOGO_PATH, use_container_width=True)
+    logo = imagen_disco(LOGO_PATH)
+    if logo:
+        st.image(logo, use_container_width=True)
     
     st.divider()
     if st.session_state.auth['conectado']:
         st.write(f"Usuario: {st.session_state.auth['user']}")
         if st.button("SALIR DEL SISTEMA", use_container_width=True):
-            st.session_state.auth = {'conectado': False}
+            SESIONES.revocar(st.session_state.get('token_sesion'), sello_sesion)
+            cerrar_sesion_local()
             st.rerun()
         
         if st.session_state.auth['rol'] == 'admin':
@@ -190,6 +286,18 @@ with st.sidebar:
                         if st.button("❌ Cancelar", use_container_width=True):
                             st.session_state.show_confirmation = False
                             st.rerun()
+
+                stats = CACHE.estadisticas()
+                st.caption(
+                    f"Cache de consultas: {stats['aciertos']} aciertos / {stats['fallos']} fallos "
+                    f"({stats['tasa_aciertos']:.0%}), {stats['entradas']} entradas"
+                )
+                cola = autoguardado.estadisticas()
+                st.caption(
+                    f"Autoguardado: {cola['pendientes']} pendientes, {cola['escritos']} escritos, "
+                    f"{cola['errores']} errores" + (f" (último: {cola['ultimo_error']})" if cola['ultimo_error'] else "")
+                )
+                st.toggle("🩺 Panel de diagnóstico", key="panel_diagnostico")
         
         st.divider()
         with st.expander("ℹ️ Ayuda y Guía de Uso"):
@@ -214,7 +322,7 @@ with st.sidebar:
                     **1. Evaluación de Tareas**  
                     - Revise las tareas en la pestaña **"EVALUACION"**.  
                     - Asigne calificación (%) y comentarios.  
-                    - Haga clic en **"GUARDAR EVALUACION"** para finalizar.
+                    - Marque las tareas revisadas y haga clic en **"GUARDAR EVALUACIONES"** para finalizarlas juntas.
 
                     **2. Gestión de Usuarios**  
                     - Cree nuevos ejecutivos en la pestaña **"USUARIOS"**.  
@@ -249,14 +357,22 @@ with st.sidebar:
                     """)
                 
                 if PDF_AVAILABLE:
-                    if st.button("📥 Descargar Guía Completa en PDF", use_container_width=True):
-                        pdf_data = generar_pdf_ayuda(st.session_state.auth['rol'])
+                    try:
+                        pdf_data = guia_pdf(st.session_state.auth['rol'])
+                    except PDFNoDisponible:
+                        pdf_data = None
+                        st.caption("⏳ Generando la guía en PDF… estará lista en unos segundos.")
+                    except ErrorPDF as e:
+                        pdf_data = None
+                        st.error(f"{e} Intente de nuevo más tarde.")
+                    if pdf_data:
                         filename = "Guia_Admin_HAYLEX_CLOUD_PRO.pdf" if st.session_state.auth['rol'] == 'admin' else "Guia_Ejecutivo_HAYLEX_CLOUD_PRO.pdf"
                         st.download_button(
-                            label="📄 Descargar PDF",
+                            label="📥 Descargar Guía Completa en PDF",
                             data=pdf_data,
                             file_name=filename,
-                            mime="application/pdf"
+                            mime="application/pdf",
+                            use_container_width=True
                         )
             
             elif seccion_ayuda == "Preguntas Frecuentes":
@@ -290,17 +406,511 @@ with st.sidebar:
                 - Si los campos no se limpian al cambiar de cliente, recargue la página (F5).
                 """)
 
+# --- SECCIONES DEL PANEL DE ADMINISTRACION ---
+# Solo se ejecuta la seccion activa; las demas no consultan nada hasta que se visitan.
+def seccion_evaluacion(user):
+    """Cola de tareas en Revision, paginada por id y con calificacion en lote."""
+    col_e, col_c, col_n = st.columns([2, 2, 1])
+    listas = leer_en_paralelo(repo, usuarios=(repo.listar_usuarios, "user"), clientes=(repo.listar_clientes,))
+    ejecutivos = ["TODOS"] + [u["usuario"] for u in listas["usuarios"]]
+    filtro_ejecutivo = col_e.selectbox("Ejecutivo", ejecutivos, key="cola_ejecutivo")
+    clientes = ["TODOS"] + [c["nombre_cliente"] for c in listas["clientes"]]
+    filtro_cliente = col_c.selectbox("Cliente", clientes, key="cola_cliente")
+    tamano = col_n.selectbox("Por página", [10, 25, 50], key="cola_tamano")
+
+    # Pila de cursores (ultimo id de la pagina anterior); se reinicia al cambiar filtros.
+    filtros = (filtro_ejecutivo, filtro_cliente, tamano)
+    if st.session_state.get('cola_filtros') != filtros:
+        st.session_state.cola_filtros = filtros
+        st.session_state.cola_cursores = [None]
+    cursores = st.session_state.cola_cursores
+
+    ejecutivo = None if filtro_ejecutivo == "TODOS" else filtro_ejecutivo
+    cliente = None if filtro_cliente == "TODOS" else filtro_cliente
+    cola = leer_en_paralelo(
+        repo,
+        filas=(repo.cola_revision, ejecutivo, cliente, cursores[-1], tamano + 1),
+        pendientes=(repo.contar_revision, ejecutivo, cliente),
+    )
+    filas = cola["filas"]
+    hay_siguiente = len(filas) > tamano
+    pends = filas[:tamano]
+
+    if not pends:
+        if len(cursores) > 1:
+            cursores.pop()
+            st.rerun()
+        st.info("No hay tareas para calificar.")
+        return
+
+    st.caption(f"{cola['pendientes']} tareas pendientes · página {len(cursores)}")
+    with st.form("evaluacion_lote"):
+        for r in pends:
+            with st.expander(f"REVISAR: {r['ejecutivo']} - {r['cliente']}"):
+                fecha = formatear_fecha(r.get('fecha'))
+                st.write(f"Fecha: {fecha}")
+                for i, t in enumerate(r['tareas_json'] or [], 1):
+                    st.write(f"Tarea {i}: {t}")
+                miniatura_evidencia(r['evidencia_link'])
+
+                st.text_area("Comentarios para el user", value=r.get('notas_admin') or '', key=f"fb_{r['id']}")
+                st.slider("Avance %", 0, 100, int(r.get('calificacion') or 0), key=f"pts_{r['id']}")
+                st.checkbox("Finalizar esta evaluación", key=f"sel_{r['id']}")
+        guardar = st.form_submit_button("GUARDAR EVALUACIONES", type="primary")
+
+    con_adjunto = [r for r in pends if es_adjunto(r.get('evidencia_link'))]
+    if con_adjunto:
+        with st.expander("🖼️ Evidencia original"):
+            elegida = st.selectbox("Tarea", con_adjunto, index=None, key="cola_original",
+                                   format_func=lambda r: f"{r['ejecutivo']} - {r['cliente']}")
+            if elegida is not None:
+                evidencia_original(elegida['evidencia_link'], f"cola_{elegida['id']}")
+
+    if guardar:
+        lote = [
+            (r['id'], st.session_state[f"fb_{r['id']}"], st.session_state[f"pts_{r['id']}"])
+            for r in pends if st.session_state.get(f"sel_{r['id']}")
+        ]
+        if lote:
+            repo.evaluar_tareas(lote)
+            st.rerun()
+        else:
+            st.warning("Marque al menos una tarea para finalizar.")
+
+    col_ant, col_sig = st.columns(2)
+    if col_ant.button("◀ Anterior", disabled=len(cursores) == 1, use_container_width=True):
+        cursores.pop()
+        st.rerun()
+    if col_sig.button("Siguiente ▶", disabled=not hay_siguiente, use_container_width=True):
+        cursores.append(pends[-1]['id'])
+        st.rerun()
+
+TAMANO_PAGINA_DIRECTORIO = 25
+TAMANO_PAGINA_HISTORIAL = 10
+
+def cursores_pagina(clave, filtros):
+    """Pila de cursores (ultimo id/nombre de la pagina anterior); se reinicia al cambiar ``filtros``."""
+    if st.session_state.get(f"{clave}_filtros") != filtros:
+        st.session_state[f"{clave}_filtros"] = filtros
+        st.session_state[f"{clave}_cursores"] = [None]
+    return st.session_state[f"{clave}_cursores"]
+
+def botones_pagina(clave, cursores, siguiente):
+    """Anterior / Siguiente; ``siguiente`` es el cursor de la proxima pagina (None si no hay)."""
+    col_ant, col_sig = st.columns(2)
+    if col_ant.button("◀ Anterior", key=f"{clave}_ant", disabled=len(cursores) == 1, use_container_width=True):
+        cursores.pop()
+        st.rerun()
+    if col_sig.button("Siguiente ▶", key=f"{clave}_sig", disabled=siguiente is None, use_container_width=True):
+        cursores.append(siguiente)
+        st.rerun()
+
+def importacion_csv(clave, titulo, ayuda, importar, opcion=None):
+    """Carga de un CSV con ``importar(repo, bytes)`` y su reporte (persiste tras el rerun).
+
+    ``opcion = (etiqueta, argumento)`` agrega una casilla (desmarcada) cuyo valor se pasa a ``importar``.
+    """
+    with st.expander(titulo):
+        st.caption(ayuda)
+        archivo = st.file_uploader("Archivo CSV", type=["csv"], key=f"csv_{clave}")
+        extra = {}
+        if opcion is not None:
+            etiqueta, argumento = opcion
+            extra[argumento] = st.checkbox(etiqueta, value=False, key=f"opcion_{clave}")
+        if st.button("PROCESAR", key=f"btn_{clave}", disabled=archivo is None):
+            try:
+                st.session_state[f"reporte_{clave}"] = importar(repo, archivo.getvalue(), **extra)
+                st.rerun()
+            except CSVInvalido as e:
+                st.error(str(e))
+
+        resultado = st.session_state.get(f"reporte_{clave}")
+        if resultado is None:
+            return
+        st.success(f"✅ {resultado.escritas} aplicadas de {resultado.total} filas · "
+                   f"{len(resultado.existentes)} sin cambios · {len(resultado.errores)} con error")
+        if resultado.errores:
+            st.dataframe(pd.DataFrame(resultado.errores), use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Reporte de errores", reporte_errores_csv(resultado.errores),
+                               file_name=f"errores_{clave}.csv", mime="text/csv", key=f"err_{clave}")
+
+def seccion_clientes(user):
+    """Alta, edicion y baja de clientes."""
+    st.subheader("Control de Clientes")
+    # Solo se consulta y se dibuja la pagina visible del directorio.
+    busqueda = st.session_state.get("buscar_cliente", "").strip() or None
+    cursores = cursores_pagina("directorio_clientes", busqueda)
+    datos = leer_en_paralelo(
+        repo,
+        usuarios=(repo.listar_usuarios, "user"),
+        filas=(repo.buscar_clientes, busqueda, cursores[-1], TAMANO_PAGINA_DIRECTORIO + 1),
+        total=(repo.contar_clientes, busqueda),
+    )
+    u_list = [u["usuario"] for u in datos["usuarios"]]
+    indice_ejecutivos = {u: i for i, u in enumerate(u_list)}
+    pagina = datos["filas"][:TAMANO_PAGINA_DIRECTORIO]
+    hay_siguiente = len(datos["filas"]) > TAMANO_PAGINA_DIRECTORIO
+    with st.form("new_cli"):
+        n_c = st.text_input("Nombre de Cliente").upper()
+        if u_list:
+            n_e = st.selectbox("Asignar Ejecutivo", u_list)
+        else:
+            st.warning("⚠️ No hay usuarios disponibles.")
+            n_e = None
+        if st.form_submit_button("REGISTRAR"):
+            if n_c and n_e:
+                try:
+                    repo.crear_cliente(n_c, n_e)
+                    st.rerun()
+                except Exception as e:
+                    st.error("El cliente ya existe o error en inserción.")
+
+    importacion_csv("clientes", "📥 Importar clientes (CSV)",
+                    "Columnas: nombre_cliente, ejecutivo_asignado. Los clientes que ya existen se omiten.",
+                    importar_clientes)
+    importacion_csv("reasignacion", "🔁 Reasignar clientes desde CSV",
+                    "Columnas: nombre_cliente, ejecutivo_asignado (nuevo ejecutivo).",
+                    importar_reasignaciones)
+
+    with st.expander("🔁 Reasignación masiva"):
+        with st.form("reasignar_clientes"):
+            st.caption("Clientes de la página visible (use la búsqueda o el CSV para otros).")
+            seleccion = st.multiselect("Clientes", [c["nombre_cliente"] for c in pagina])
+            nuevo = st.selectbox("Nuevo ejecutivo", u_list)
+            if st.form_submit_button("REASIGNAR") and seleccion and nuevo:
+                n = repo.reasignar_clientes(seleccion, nuevo)
+                st.session_state.aviso_reasignacion = f"✅ {n} clientes reasignados a {nuevo}."
+                st.rerun()
+        aviso = st.session_state.pop('aviso_reasignacion', None)
+        if aviso:
+            st.success(aviso)
+
+    st.divider()
+    st.text_input("🔍 Buscar cliente", key="buscar_cliente")
+    st.caption(f"{datos['total']} clientes · página {len(cursores)}")
+    if not pagina and len(cursores) > 1:
+        cursores.pop()
+        st.rerun()
+    for c in pagina:
+        with st.expander(f"CLIENTE: {c['nombre_cliente']}"):
+            edit_n = st.text_input("Nombre", c['nombre_cliente'], key=f"cn_{c['id']}")
+            edit_e = st.selectbox("Ejecutivo", u_list, index=indice_ejecutivos.get(c['ejecutivo_asignado'], 0), key=f"ce_{c['id']}")
+            c1, c2 = st.columns(2)
+            if c1.button("GUARDAR", key=f"sv_{c['id']}"):
+                repo.actualizar_cliente(c["id"], edit_n, edit_e)
+                st.rerun()
+            if c2.button("ELIMINAR", key=f"dl_{c['id']}"):
+                repo.borrar_cliente(c["id"])
+                st.rerun()
+    botones_pagina("directorio_clientes", cursores, pagina[-1]["id"] if hay_siguiente else None)
+
+def seccion_usuarios(user):
+    """Alta, cambio de clave y baja de ejecutivos."""
+    st.subheader("Control de Usuarios")
+    with st.form("new_u"):
+        nu = st.text_input("Usuario").upper()
+        np = st.text_input("Password", type="password")
+        if st.form_submit_button("CREAR"):
+            if nu and np:
+                try:
+                    repo.crear_usuario(nu, np, "user")
+                    st.rerun()
+                except Exception as e:
+                    st.error("El usuario ya existe.")
+    importacion_csv("usuarios", "📥 Importar usuarios (CSV)",
+                    "Columnas: usuario, clave y opcionalmente rol (user/admin). Los usuarios que ya existen se omiten. "
+                    "Las filas con rol admin se rechazan salvo que marque la casilla.",
+                    importar_usuarios,
+                    opcion=("⚠️ Permitir crear administradores (rol admin)", "permitir_admin"))
+    st.divider()
+    busqueda = st.text_input("🔍 Buscar usuario", key="buscar_usuario").strip() or None
+    cursores = cursores_pagina("directorio_usuarios", busqueda)
+    datos = leer_en_paralelo(
+        repo,
+        filas=(repo.buscar_usuarios, busqueda, "user", cursores[-1], TAMANO_PAGINA_DIRECTORIO + 1),
+        total=(repo.contar_usuarios, busqueda, "user"),
+    )
+    pagina = datos["filas"][:TAMANO_PAGINA_DIRECTORIO]
+    hay_siguiente = len(datos["filas"]) > TAMANO_PAGINA_DIRECTORIO
+    st.caption(f"{datos['total']} usuarios · página {len(cursores)}")
+    if not pagina and len(cursores) > 1:
+        cursores.pop()
+        st.rerun()
+    for u in pagina:
+        with st.expander(f"USER: {u['usuario']}"):
+            up_p = st.text_input("Nueva clave", type="password", key=f"up_{u['usuario']}")
+            if st.button("ACTUALIZAR CLAVE", key=f"btnu_{u['usuario']}", disabled=not up_p):
+                repo.actualizar_clave(u["usuario"], up_p)
+                st.success("Actualizado")
+            if st.button("BORRAR USUARIO", key=f"delu_{u['usuario']}"):
+                repo.borrar_usuario(u["usuario"])
+                st.rerun()
+    botones_pagina("directorio_usuarios", cursores, pagina[-1]["usuario"] if hay_siguiente else None)
+
+def seccion_metricas(user):
+    """Tablero de avance sobre tareas Finalizadas (agregado en la base de datos)."""
+    st.subheader("📊 Sistema de Evaluación de Avance")
+    clientes_evaluados = repo.clientes_evaluados()
+
+    if not clientes_evaluados:
+        st.info("No hay datos de evaluación suficientes.")
+    else:
+        col_f1, col_f2 = st.columns(2)
+        with col_f1:
+            clientes_unicos = ["TODOS"] + list(clientes_evaluados)
+            filtro_cliente = st.selectbox("🔍 Filtrar por Cliente", clientes_unicos)
+        with col_f2:
+            ventana = st.selectbox("🗓️ Periodo", [VENTANA_PERSONALIZADA, *VENTANAS, VENTANA_SEMANAS_ISO])
+            if ventana in VENTANAS:
+                fecha_inicio, fecha_fin = rango_ultimos_dias(VENTANAS[ventana])
+            elif ventana == VENTANA_SEMANAS_ISO:
+                hoy = date.today()
+                anio_iso, semana_iso, _ = hoy.isocalendar()
+                anio = int(st.number_input("Año", min_value=2000, max_value=hoy.year + 1, value=anio_iso))
+                max_semana = date(anio, 12, 28).isocalendar()[1]
+                semana_desde = int(st.number_input("Semana desde", 1, max_semana, min(semana_iso, max_semana)))
+                semana_hasta = int(st.number_input("Semana hasta", semana_desde, max_semana, max(semana_desde, min(semana_iso, max_semana))))
+                fecha_inicio, fecha_fin = rango_semanas_iso(anio, semana_desde, semana_hasta)
+            else:
+                fecha_inicio = st.date_input("📅 Desde", value=pd.to_datetime("2024-01-01").date())
+                fecha_fin = st.date_input("📅 Hasta", value=datetime.today().date())
+            if ventana != VENTANA_PERSONALIZADA:
+                st.caption(f"{formatear_fecha(fecha_inicio.isoformat())} - {formatear_fecha(fecha_fin.isoformat())}")
+
+        datos = tablero(repo, CACHE.version("metricas_rollup"),
+                        None if filtro_cliente == "TODOS" else filtro_cliente, fecha_inicio, fecha_fin)
+
+        if datos is None:
+            st.warning("No hay datos para los filtros seleccionados.")
+        else:
+            figuras = datos["figuras"]
+            st.markdown("### 👤 Avance Individual por Usuario")
+            st.dataframe(datos["df_usuario"], use_container_width=True,
+                         column_config={"Promedio (%)": st.column_config.NumberColumn(format="%.2f")})
+            st.plotly_chart(figuras["usuario"], use_container_width=True)
+
+            st.markdown("### 📂 Avance por Cliente / Proyecto")
+            st.dataframe(datos["df_equipo"], use_container_width=True,
+                         column_config={"Promedio Equipo (%)": st.column_config.NumberColumn(format="%.2f")})
+            st.plotly_chart(figuras["equipo"], use_container_width=True)
+
+            st.markdown("### 📈 Resumen General del Sistema")
+            col_r1, col_r2, col_r3 = st.columns(3)
+            col_r1.metric("🎯 Promedio General", f"{datos['promedio_general']:.1f}%")
+            col_r2.metric("👥 Usuarios Activos", datos["total_usuarios"])
+            col_r3.metric("🏢 Clientes Atendidos", datos["total_clientes"])
+
+            if figuras["tendencia"] is not None:
+                st.plotly_chart(figuras["tendencia"], use_container_width=True)
+
+        with st.expander("📤 Exportar reporte de evaluaciones"):
+            formato = st.selectbox("Formato", formatos_disponibles(), key="exp_formato")
+            if st.button("Generar reporte", key="exp_generar"):
+                try:
+                    trabajo = EXPORTACIONES.lanzar(
+                        repo, formato, estado="Finalizado", desde=fecha_inicio, hasta=fecha_fin,
+                        cliente=None if filtro_cliente == "TODOS" else filtro_cliente)
+                    st.session_state.exportacion_id = trabajo.id
+                except ExportacionesOcupadas as e:
+                    st.warning(str(e))
+            mostrar_exportacion()
+
+@st.cache_resource(max_entries=2, ttl=600, show_spinner=False)
+def contenido_exportacion(ruta):
+    """Bytes del archivo exportado, leidos una vez por trabajo (no en cada re-ejecucion)."""
+    with open(ruta, "rb") as f:
+        return f.read()
+
+def mostrar_exportacion():
+    """Progreso de la exportacion en curso o boton de descarga cuando termina."""
+    trabajo = EXPORTACIONES.obtener(st.session_state.get("exportacion_id"))
+    if trabajo is None:
+        return
+    if not trabajo.terminado:
+        progreso_exportacion(trabajo.id)
+    elif trabajo.error:
+        st.error(f"La exportación falló: {trabajo.error}")
+    else:
+        st.download_button("⬇️ Descargar reporte", contenido_exportacion(trabajo.ruta),
+                           file_name=trabajo.nombre_archivo, mime=trabajo.mime, key="exp_descargar")
+
+@st.fragment(run_every="1s")
+def progreso_exportacion(trabajo_id):
+    """Sondea el trabajo sin re-ejecutar la pagina; al terminar refresca una vez."""
+    trabajo = EXPORTACIONES.obtener(trabajo_id)
+    if trabajo is None or trabajo.terminado:
+        st.rerun()
+    st.progress(trabajo.progreso, text=f"{trabajo.estado}: {trabajo.procesadas}/{trabajo.total} tareas")
+
+def seccion_mensajes(user):
+    """Envio de mensajes y bandeja de entrada del admin."""
+    st.subheader("✉️ Mensajes")
+    usuarios = [u["usuario"] for u in repo.listar_usuarios("user")]
+
+    if usuarios:
+        destinatario = st.selectbox("Enviar mensaje a:", usuarios)
+        mensaje = st.text_area("Mensaje:")
+        if st.button("Enviar Mensaje", type="primary"):
+            if mensaje.strip():
+                enviar_mensaje(user, destinatario, mensaje.strip())
+                st.success("Mensaje enviado!")
+                st.rerun()
+            else:
+                st.warning("El mensaje no puede estar vacío.")
+
+    st.divider()
+    st.session_state.bandeja_refrescar = True
+    mostrar_bandeja(user)
+
+SECCIONES_ADMIN = {
+    "EVALUACION": seccion_evaluacion,
+    "CLIENTES": seccion_clientes,
+    "USUARIOS": seccion_usuarios,
+    "METRICAS": seccion_metricas,
+    "MENSAJES": seccion_mensajes,
+}
+
+# --- PORTAL DEL EJECUTIVO ---
+TAREAS_MINIMAS = 6
+
+def cargar_borrador(ejecutivo, cliente):
+    """Lee la tarea activa una sola vez por cliente y la deja como borrador local."""
+    tarea = repo.obtener_tarea_activa(ejecutivo, cliente)
+    tareas = list(tarea['tareas_json'] or []) if tarea is not None else []
+    return {
+        'ejecutivo': ejecutivo,
+        'cliente': cliente,
+        'tareas': tareas,
+        'evidencia': (tarea.get('evidencia_link') or "") if tarea is not None else "",
+        'total': max(TAREAS_MINIMAS, len(tareas)),
+    }
+
+def agregar_tarea_borrador():
+    st.session_state.borrador['total'] += 1
+
+@st.fragment
+def editor_trabajo(user, clis_u):
+    """TRABAJO ACTUAL: editar tareas solo re-ejecuta este fragmento; lo escrito se autoguarda en segundo plano."""
+    aviso = st.session_state.pop('aviso_guardado', None)
+    if aviso:
+        st.success(aviso)
+    # Referencia del adjunto recien almacenado: se escribe antes de crear el widget.
+    if 'evidencia_guardada' in st.session_state:
+        st.session_state.link_ev = st.session_state.pop('evidencia_guardada')
+
+    if 'borrador' not in st.session_state:
+        # Sesion nueva (o retomada en otra replica): se sigue el borrador compartido.
+        st.session_state.borrador = BORRADORES.obtener(user)
+        if st.session_state.borrador and st.session_state.borrador['cliente'] in clis_u:
+            st.session_state.select_cliente = st.session_state.borrador['cliente']
+
+    cl_sel = st.selectbox("Seleccione Cliente", clis_u, key="select_cliente")
+
+    borrador = st.session_state.get('borrador')
+    if borrador is None or borrador['ejecutivo'] != user or borrador['cliente'] != cl_sel:
+        for k in [k for k in st.session_state.keys() if k.startswith('tx_') or k == 'link_ev']:
+            del st.session_state[k]
+        st.session_state.pop('evidencia_guardada', None)
+        st.session_state.pop('autoguardado_ultimo', None)
+        if autoguardado.pendiente(user, cl_sel):
+            autoguardado.vaciar()
+        borrador = st.session_state.borrador = cargar_borrador(user, cl_sel)
+
+    inputs = []
+    for i in range(borrador['total']):
+        valor_previo = borrador['tareas'][i] if i < len(borrador['tareas']) else ""
+        inputs.append(st.text_input(f"Tarea {i+1}", value=valor_previo, key=f"tx_{i}"))
+
+    st.subheader("Adjuntar Evidencia")
+    archivo_ev = st.file_uploader("Subir imagen o PDF (opcional)", type=["png", "jpg", "jpeg", "pdf"], key="archivo_ev")
+    # Solo por Session State (sin ``value=``): tambien se escribe al guardar un adjunto.
+    if 'link_ev' not in st.session_state:
+        st.session_state.link_ev = borrador['evidencia']
+    link_ev = st.text_input("O enlace URL (ej. Google Drive, Dropbox)", key="link_ev")
+    if archivo_ev is None:
+        miniatura_evidencia(link_ev)
+
+    # Lo escrito se copia al estado compartido solo cuando cambia y, si difiere
+    # de lo ultimo encolado (o de lo leido de la base), se encola para el autoguardado.
+    tareas_lista = [t.strip() for t in inputs if t.strip()]
+    escrito = dict(borrador, tareas=inputs, evidencia=link_ev)
+    if escrito != st.session_state.get('borrador_compartido'):
+        BORRADORES.guardar(user, escrito)
+        st.session_state.borrador_compartido = escrito
+        ultimo = st.session_state.get('autoguardado_ultimo') or \
+            [[t.strip() for t in borrador['tareas'] if t.strip()], borrador['evidencia']]
+        if tareas_lista and [tareas_lista, link_ev] != ultimo:
+            autoguardado.encolar(user, cl_sel, tareas_lista, link_ev)
+            st.session_state.autoguardado_ultimo = [tareas_lista, link_ev]
+    if autoguardado.fallido(user, cl_sel):
+        st.warning("⚠️ Sus cambios todavía no se pudieron guardar; se reintentará automáticamente.")
+    elif autoguardado.pendiente(user, cl_sel):
+        st.caption("💾 Cambios pendientes de autoguardado…")
+
+    c1, c2 = st.columns(2)
+    guardar = c1.button("💾 Guardar progreso", use_container_width=True)
+    enviar = c2.button("📤 Enviar a revisión", use_container_width=True)
+
+    if guardar or enviar:
+        if not tareas_lista:
+            st.warning("Debe ingresar al menos una tarea.")
+        else:
+            if archivo_ev is not None:
+                try:
+                    link_ev = almacen.guardar(archivo_ev, archivo_ev.name)
+                except AdjuntoInvalido as e:
+                    st.error(str(e))
+                    return
+
+            if guardar:
+                # Sin esperar a la base: la cola lo escribe en el proximo volcado.
+                autoguardado.encolar(user, cl_sel, tareas_lista, link_ev, estado="En progreso")
+                autoguardado.guardar_pronto()
+                st.session_state.autoguardado_ultimo = [tareas_lista, link_ev]
+                st.session_state.evidencia_guardada = link_ev
+                st.session_state.aviso_guardado = "💾 Cambios en cola de guardado; se escribirán en unos segundos."
+                st.rerun(scope="fragment")
+            else:
+                # El envio a revision se confirma en la base antes de avisar;
+                # si falla, lo escrito queda en la cola de autoguardado.
+                try:
+                    autoguardado.escribir_ya(user, cl_sel, tareas_lista, link_ev, estado="Revision")
+                except Exception as e:
+                    st.session_state.autoguardado_ultimo = [tareas_lista, link_ev]
+                    st.error(f"No se pudo enviar a revisión ({e}). Tus cambios se guardarán como borrador; intenta de nuevo.")
+                    return
+                st.session_state.aviso_guardado = "✅ Tarea enviada a revisión correctamente!"
+                # Se recarga el borrador desde la base y el historial en una ejecución completa.
+                st.session_state.borrador = None
+                st.session_state.borrador_compartido = None
+                BORRADORES.borrar(user)
+                st.rerun()
+
+    st.button("➕ Agregar nueva tarea", on_click=agregar_tarea_borrador)
+
 # --- LOGIN ---
+def ip_cliente():
+    """IP del navegador: la que agrega el balanceador al final de X-Forwarded-For (las previas las pone el cliente)."""
+    reenviada = st.context.headers.get("X-Forwarded-For")
+    if reenviada:
+        return reenviada.split(",")[-1].strip()
+    return getattr(st.context, "ip_address", None)
+
 if not st.session_state.auth['conectado']:
     mostrar_cabecera("HAYLEX CLOUD - ACCESO")
     with st.form("login_form"):
         u = st.text_input("USUARIO").upper().strip()
         p = st.text_input("CLAVE", type="password")
         if st.form_submit_button("INGRESAR", use_container_width=True):
-            res = supabase.table("usuarios").select("*").eq("usuario", u).eq("pass", p).execute()
-            df = pd.DataFrame(res.data)
-            if not df.empty:
-                st.session_state.auth = {'conectado': True, 'user': u, 'rol': df.iloc[0]['rol']}
+            try:
+                usuario_db = iniciar_sesion(repo, u, p, ip_cliente())
+            except DemasiadosIntentos as e:
+                st.error(str(e))
+                st.stop()
+            if usuario_db is not None:
+                st.session_state.auth = {'conectado': True, 'user': u, 'rol': usuario_db['rol']}
+                st.session_state.token_sesion = SESIONES.emitir(u, usuario_db['rol'], sello_sesion(u))
+                st.session_state.cookie_pendiente = st.session_state.token_sesion
                 st.rerun()
             else:
                 st.error("Acceso incorrecto")
@@ -310,317 +920,66 @@ else:
 
     if rol == 'admin':
         mostrar_cabecera("PANEL DE ADMINISTRACION")
-        t1, t2, t3, t4, t5 = st.tabs(["EVALUACION", "CLIENTES", "USUARIOS", "METRICAS", "MENSAJES"])
-
-        with t1:
-            res = supabase.table("tareas").select("*").eq("estado", "Revision").execute()
-            pends = pd.DataFrame(res.data)
-            if pends.empty:
-                st.info("No hay tareas para calificar.")
-            else:
-                for _, r in pends.iterrows():
-                    with st.expander(f"REVISAR: {r['ejecutivo']} - {r['cliente']}"):
-                        fecha = r.get('fecha', 'Fecha no disponible')
-                        st.write(f"Fecha: {fecha}")
-                        tasks = r['tareas_json'].split('||') if r['tareas_json'] else []
-                        for i, t in enumerate(tasks, 1):
-                            st.write(f"Tarea {i}: {t}")
-                        if r['evidencia_link']:
-                            if r['evidencia_link'].startswith("http"):
-                                st.link_button("VER EVIDENCIA ADJUNTA", r['evidencia_link'])
-                            else:
-                                st.warning("Evidencia local no disponible en la nube.")
-                        
-                        fb = st.text_area("Comentarios para el user", value=r.get('notas_admin', ''), key=f"fb_{r['id']}")
-                        pts = st.slider("Avance %", 0, 100, int(r.get('calificacion', 0)), key=f"pts_{r['id']}")
-                        if st.button("GUARDAR EVALUACION", key=f"btn_{r['id']}", type="primary"):
-                            supabase.table("tareas").update({
-                                "notas_admin": fb,
-                                "calificacion": pts,
-                                "estado": "Finalizado"
-                            }).eq("id", r["id"]).execute()
-                            st.rerun()
-
-        with t2:
-            st.subheader("Control de Clientes")
-            res_u = supabase.table("usuarios").select("usuario").eq("rol", "user").execute()
-            u_list = [u["usuario"] for u in res_u.data] if res_u.data else []
-            with st.form("new_cli"):
-                n_c = st.text_input("Nombre de Cliente").upper()
-                if u_list:
-                    n_e = st.selectbox("Asignar Ejecutivo", u_list)
-                else:
-                    st.warning("⚠️ No hay usuarios disponibles.")
-                    n_e = None
-                if st.form_submit_button("REGISTRAR"):
-                    if n_c and n_e:
-                        try:
-                            supabase.table("clientes").insert({
-                                "nombre_cliente": n_c,
-                                "ejecutivo_asignado": n_e
-                            }).execute()
-                            st.rerun()
-                        except Exception as e:
-                            st.error("El cliente ya existe o error en inserción.")
-
-            res_clis = supabase.table("clientes").select("*").execute()
-            clis = pd.DataFrame(res_clis.data)
-            for _, c in clis.iterrows():
-                with st.expander(f"CLIENTE: {c['nombre_cliente']}"):
-                    edit_n = st.text_input("Nombre", c['nombre_cliente'], key=f"cn_{c['id']}")
-                    edit_e = st.selectbox("Ejecutivo", u_list, index=u_list.index(c['ejecutivo_asignado']) if c['ejecutivo_asignado'] in u_list else 0, key=f"ce_{c['id']}")
-                    c1, c2 = st.columns(2)
-                    if c1.button("GUARDAR", key=f"sv_{c['id']}"):
-                        supabase.table("clientes").update({
-                            "nombre_cliente": edit_n,
-                            "ejecutivo_asignado": edit_e
-                        }).eq("id", c["id"]).execute()
-                        st.rerun()
-                    if c2.button("ELIMINAR", key=f"dl_{c['id']}"):
-                        supabase.table("clientes").delete().eq("id", c["id"]).execute()
-                        st.rerun()
-
-        with t3:
-            st.subheader("Control de Usuarios")
-            with st.form("new_u"):
-                nu = st.text_input("Usuario").upper()
-                np = st.text_input("Password")
-                if st.form_submit_button("CREAR"):
-                    if nu and np:
-                        try:
-                            supabase.table("usuarios").insert({
-                                "usuario": nu,
-                                "pass": np,
-                                "rol": "user"
-                            }).execute()
-                            st.rerun()
-                        except Exception as e:
-                            st.error("El usuario ya existe.")
-            res_us = supabase.table("usuarios").select("*").eq("rol", "user").execute()
-            us_data = pd.DataFrame(res_us.data)
-            for _, u in us_data.iterrows():
-                with st.expander(f"USER: {u['usuario']}"):
-                    up_p = st.text_input("Password", u['pass'], key=f"up_{u['usuario']}")
-                    if st.button("ACTUALIZAR CLAVE", key=f"btnu_{u['usuario']}"):
-                        supabase.table("usuarios").update({"pass": up_p}).eq("usuario", u["usuario"]).execute()
-                        st.success("Actualizado")
-                    if st.button("BORRAR USUARIO", key=f"delu_{u['usuario']}"):
-                        supabase.table("usuarios").delete().eq("usuario", u["usuario"]).execute()
-                        st.rerun()
-
-        with t4:
-            st.subheader("📊 Sistema de Evaluación de Avance")
-            res_tareas = supabase.table("tareas").select("*").eq("estado", "Finalizado").execute()
-            df_tareas = pd.DataFrame(res_tareas.data)
-            
-            if df_tareas.empty:
-                st.info("No hay datos de evaluación suficientes.")
-            else:
-                df_tareas['fecha_dt'] = pd.to_datetime(df_tareas['fecha'], format='%d/%m/%Y', errors='coerce')
-                df_avance = df_tareas.groupby(['ejecutivo', 'cliente']).agg(
-                    promedio_usuario=('calificacion', 'mean'),
-                    tareas_evaluadas=('calificacion', 'count'),
-                    ultima_evaluacion=('fecha', 'max')
-                ).reset_index()
-
-                col_f1, col_f2 = st.columns(2)
-                with col_f1:
-                    clientes_unicos = ["TODOS"] + list(df_avance['cliente'].unique())
-                    filtro_cliente = st.selectbox("🔍 Filtrar por Cliente", clientes_unicos)
-                with col_f2:
-                    fecha_inicio = st.date_input("📅 Desde", value=pd.to_datetime("2024-01-01").date())
-                    fecha_fin = st.date_input("📅 Hasta", value=datetime.today().date())
-                
-                df_filtrado = df_avance if filtro_cliente == "TODOS" else df_avance[df_avance['cliente'] == filtro_cliente]
-                df_tareas_filtrado = df_tareas[
-                    (df_tareas['fecha_dt'] >= pd.Timestamp(fecha_inicio)) & 
-                    (df_tareas['fecha_dt'] <= pd.Timestamp(fecha_fin))
-                ]
-                if not df_tareas_filtrado.empty:
-                    usuarios_filtrados = df_tareas_filtrado['ejecutivo'].unique()
-                    df_filtrado = df_filtrado[df_filtrado['ejecutivo'].isin(usuarios_filtrados)]
-                
-                if df_filtrado.empty:
-                    st.warning("No hay datos para los filtros seleccionados.")
-                else:
-                    st.markdown("### 👤 Avance Individual por Usuario")
-                    df_usuario = df_filtrado.groupby('ejecutivo').agg({
-                        'promedio_usuario': 'mean',
-                        'tareas_evaluadas': 'sum'
-                    }).round(2).reset_index()
-                    df_usuario = df_usuario.rename(columns={'promedio_usuario': 'Promedio (%)', 'tareas_evaluadas': 'Tareas'})
-                    df_usuario = df_usuario.sort_values('Promedio (%)', ascending=False)
-                    st.dataframe(df_usuario.style.format({"Promedio (%)": "{:.2f}"}), use_container_width=True)
-                    
-                    fig_user = px.bar(df_usuario, x='Promedio (%)', y='ejecutivo', orientation='h', title='Rendimiento Individual', color='Promedio (%)', color_continuous_scale='Blues', text='Promedio (%)')
-                    fig_user.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                    fig_user.update_layout(yaxis={'categoryorder':'total ascending'})
-                    st.plotly_chart(fig_user, use_container_width=True)
-                    
-                    st.markdown("### 📂 Avance por Cliente / Proyecto")
-                    df_equipo = df_filtrado.groupby('cliente').agg({
-                        'promedio_usuario': 'mean',
-                        'ejecutivo': 'count'
-                    }).round(2).reset_index()
-                    df_equipo = df_equipo.rename(columns={'promedio_usuario': 'Promedio Equipo (%)', 'ejecutivo': 'Miembros'})
-                    st.dataframe(df_equipo.style.format({"Promedio Equipo (%)": "{:.2f}"}), use_container_width=True)
-                    
-                    fig_team = px.pie(df_equipo, values='Promedio Equipo (%)', names='cliente', title='Rendimiento por Cliente / Proyecto', hole=0.4)
-                    st.plotly_chart(fig_team, use_container_width=True)
-                    
-                    st.markdown("### 📈 Resumen General del Sistema")
-                    promedio_general = df_filtrado['promedio_usuario'].mean()
-                    total_usuarios = df_filtrado['ejecutivo'].nunique()
-                    total_clientes = df_filtrado['cliente'].nunique()
-                    col_r1, col_r2, col_r3 = st.columns(3)
-                    col_r1.metric("🎯 Promedio General", f"{promedio_general:.1f}%")
-                    col_r2.metric("👥 Usuarios Activos", total_usuarios)
-                    col_r3.metric("🏢 Clientes Atendidos", total_clientes)
-                    
-                    if len(df_tareas_filtrado) > 1:
-                        df_tareas_filtrado['semana'] = df_tareas_filtrado['fecha_dt'].dt.to_period('W').dt.start_time
-                        tendencia = df_tareas_filtrado.groupby('semana')['calificacion'].mean().reset_index()
-                        if len(tendencia) > 1:
-                            fig_trend = px.line(tendencia, x='semana', y='calificacion', title='Tendencia de Calificaciones en el Tiempo', markers=True)
-                            fig_trend.update_yaxes(range=[0, 100])
-                            st.plotly_chart(fig_trend, use_container_width=True)
-
-        with t5:
-            st.subheader("✉️ Mensajes")
-            res_us = supabase.table("usuarios").select("usuario").eq("rol", "user").execute()
-            usuarios = [u["usuario"] for u in res_us.data] if res_us.data else []
-            
-            if usuarios:
-                destinatario = st.selectbox("Enviar mensaje a:", usuarios)
-                mensaje = st.text_area("Mensaje:")
-                if st.button("Enviar Mensaje", type="primary"):
-                    if mensaje.strip():
-                        enviar_mensaje(user, destinatario, mensaje.strip())
-                        st.success("Mensaje enviado!")
-                        st.rerun()
-                    else:
-                        st.warning("El mensaje no puede estar vacío.")
-            
-            st.divider()
-            st.subheader("Bandeja de Entrada")
-            mensajes = obtener_mensajes(user)
-            if mensajes.empty:
-                st.info("No tienes mensajes.")
-            else:
-                for _, msg in mensajes.iterrows():
-                    if msg['remitente'] == user:
-                        st.info(f"**Tú** a {msg['destinatario']} ({msg['fecha']}): {msg['mensaje']}")
-                    else:
-                        st.success(f"**{msg['remitente']}** ({msg['fecha']}): {msg['mensaje']}")
-                        if msg['leido'] == 0:
-                            marcar_como_leido(msg['id'])
+        aviso_notificaciones(user, rol)
+        seccion = st.radio(
+            "Sección", list(SECCIONES_ADMIN), horizontal=True,
+            key="seccion_admin", label_visibility="collapsed"
+        )
+        with tramo(f"admin.{seccion}"):
+            SECCIONES_ADMIN[seccion](user)
 
     else:
         mostrar_cabecera(f"TAREAS DE: {user}")
+        aviso_notificaciones(user, rol)
         t_work, t_history, t_messages = st.tabs(["TRABAJO ACTUAL", "HISTORIAL", "MENSAJES"])
+        # Las tres pestañas se dibujan en cada ejecución: sus lecturas van juntas.
+        # contar_no_leidos queda en la cache para la bandeja.
+        cursores_historial = cursores_pagina("historial", user)
+        datos_ejecutivo = leer_en_paralelo(
+            repo,
+            clientes=(repo.listar_clientes, user),
+            historial=(repo.historial_ejecutivo, user, cursores_historial[-1], TAMANO_PAGINA_HISTORIAL + 1),
+            resumen=(repo.resumen_ejecutivo, user),
+            no_leidos=(repo.contar_no_leidos, user),
+        )
 
-        with t_work:
-            res_clis = supabase.table("clientes").select("nombre_cliente").eq("ejecutivo_asignado", user).execute()
-            clis_u = [c["nombre_cliente"] for c in res_clis.data] if res_clis.data else []
+        with t_work, tramo("ejecutivo.trabajo"):
+            clis_u = [c["nombre_cliente"] for c in datos_ejecutivo["clientes"]]
             if not clis_u:
                 st.warning("No tiene clientes asignados.")
             else:
-                cliente_anterior = st.session_state.get('cliente_seleccionado', None)
-                cl_sel = st.selectbox("Seleccione Cliente", clis_u, key="select_cliente")
-                
-                if cliente_anterior is not None and cliente_anterior != cl_sel:
-                    keys_to_clear = [k for k in st.session_state.keys() if k.startswith('tx_')]
-                    for k in keys_to_clear:
-                        del st.session_state[k]
-                    st.session_state.total_t = 6
-                    st.session_state['cliente_seleccionado'] = cl_sel
-                    st.rerun()
-                
-                st.session_state['cliente_seleccionado'] = cl_sel
-
-                res_tarea = supabase.table("tareas").select("*").eq("ejecutivo", user).eq("cliente", cl_sel).neq("estado", "Finalizado").order("id", desc=True).limit(1).execute()
-                df_tarea = pd.DataFrame(res_tarea.data)
-                tarea_activa = df_tarea.iloc[0] if not df_tarea.empty else None
-
-                if 'total_t' not in st.session_state:
-                    st.session_state.total_t = 6
-
-                tareas_existentes = []
-                evidencia_existente = ""
-                estado_actual = "En progreso"
-                if tarea_activa is not None:
-                    tareas_existentes = tarea_activa['tareas_json'].split('||') if tarea_activa['tareas_json'] else []
-                    evidencia_existente = tarea_activa['evidencia_link']
-                    estado_actual = tarea_activa['estado']
-                    st.session_state.total_t = max(6, len(tareas_existentes))
-
-                inputs = []
-                for i in range(st.session_state.total_t):
-                    valor_previo = tareas_existentes[i] if i < len(tareas_existentes) else ""
-                    inp = st.text_input(f"Tarea {i+1}", value=valor_previo, key=f"tx_{i}")
-                    inputs.append(inp)
-
-                st.subheader("Adjuntar Evidencia")
-                st.info("En la versión en la nube, solo se admiten enlaces URL (ej. Google Drive, Dropbox).")
-                link_ev = st.text_input("URL de evidencia (opcional)", value=evidencia_existente)
-
-                c1, c2 = st.columns(2)
-                guardar = c1.button("💾 Guardar progreso", use_container_width=True)
-                enviar = c2.button("📤 Enviar a revisión", use_container_width=True)
-
-                if guardar or enviar:
-                    tasks_str = "||".join([t.strip() for t in inputs if t.strip()])
-                    if not tasks_str:
-                        st.warning("Debe ingresar al menos una tarea.")
-                    else:
-                        fecha_actual = datetime.now().strftime("%d/%m/%Y")
-                        nuevo_estado = "Revision" if enviar else "En progreso"
-
-                        if tarea_activa is not None:
-                            supabase.table("tareas").update({
-                                "tareas_json": tasks_str,
-                                "evidencia_link": link_ev,
-                                "estado": nuevo_estado,
-                                "fecha": fecha_actual
-                            }).eq("id", tarea_activa["id"]).execute()
-                        else:
-                            supabase.table("tareas").insert({
-                                "fecha": fecha_actual,
-                                "ejecutivo": user,
-                                "cliente": cl_sel,
-                                "tareas_json": tasks_str,
-                                "evidencia_link": link_ev,
-                                "estado": nuevo_estado,
-                                "calificacion": 0
-                            }).execute()
-                        
-                        accion = "enviada a revisión" if enviar else "guardada"
-                        st.success(f"✅ Tarea {accion} correctamente!")
-                        st.rerun()
-
-                if st.button("➕ Agregar nueva tarea"):
-                    st.session_state.total_t += 1
-                    st.rerun()
+                editor_trabajo(user, clis_u)
 
-        with t_history:
+        with t_history, tramo("ejecutivo.historial"):
             st.subheader("Evolución de Avance")
-            res_u = supabase.table("tareas").select("*").eq("ejecutivo", user).order("id", desc=True).execute()
-            df_u = pd.DataFrame(res_u.data)
-            if df_u.empty:
+            resumen = datos_ejecutivo["resumen"]
+            pagina = datos_ejecutivo["historial"][:TAMANO_PAGINA_HISTORIAL]
+            hay_siguiente = len(datos_ejecutivo["historial"]) > TAMANO_PAGINA_HISTORIAL
+            if not pagina and len(cursores_historial) == 1:
                 st.info("Aún no tiene registros.")
             else:
-                for _, r in df_u.iterrows():
+                por_estado = resumen["por_estado"]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Promedio", f"{resumen['promedio']:.1f}%" if resumen["promedio"] is not None else "—")
+                m2.metric("Finalizadas", por_estado.get("Finalizado", 0))
+                m3.metric("En revisión", por_estado.get("Revision", 0))
+                m4.metric("En progreso", por_estado.get("En progreso", 0))
+                if len(resumen["tendencia"]) > 1:
+                    st.line_chart(pd.DataFrame(resumen["tendencia"]).set_index("semana")["calificacion"])
+                for r in pagina:
                     with st.container(border=True):
                         st.write(f"CLIENTE: {r['cliente']} | ESTADO: {r['estado']}")
                         if r['estado'] == 'Finalizado':
-                            calif = r.get('calificacion', 0)
+                            calif = r.get('calificacion') or 0
                             st.success(f"CALIFICACIÓN: {calif}%")
                             st.info(f"COMENTARIO ADMIN: {r.get('notas_admin', '')}")
                             st.progress(calif / 100)
-                        if r['evidencia_link']:
-                            st.link_button("Ver evidencia", r['evidencia_link'])
+                        miniatura_evidencia(r['evidencia_link'], "Ver evidencia")
+                        if es_adjunto(r['evidencia_link']) and st.toggle("Ver original", key=f"orig_{r['id']}"):
+                            evidencia_original(r['evidencia_link'], f"hist_{r['id']}")
+                botones_pagina("historial", cursores_historial, pagina[-1]['id'] if hay_siguiente else None)
 
-        with t_messages:
+        with t_messages, tramo("ejecutivo.mensajes"):
             st.subheader("✉️ Mensajes")
             destinatario = "GERENCIA"
             mensaje = st.text_area("Mensaje para Gerencia:")
@@ -633,18 +992,27 @@ else:
                     st.warning("El mensaje no puede estar vacío.")
             
             st.divider()
-            st.subheader("Bandeja de Entrada")
-            mensajes = obtener_mensajes(user)
-            if mensajes.empty:
-                st.info("No tienes mensajes.")
-            else:
-                for _, msg in mensajes.iterrows():
-                    if msg['remitente'] == user:
-                        st.info(f"**Tú** a {msg['destinatario']} ({msg['fecha']}): {msg['mensaje']}")
-                    else:
-                        st.success(f"**{msg['remitente']}** ({msg['fecha']}): {msg['mensaje']}")
-                        if msg['leido'] == 0:
-                            marcar_como_leido(msg['id'])
+            st.session_state.bandeja_refrescar = True
+            mostrar_bandeja(user)
+
+# --- DIAGNOSTICO (solo admin) ---
+if st.session_state.auth.get('rol') == 'admin' and st.session_state.get('panel_diagnostico'):
+    with st.expander("🩺 Diagnóstico de esta ejecución", expanded=True):
+        consultas = REGISTRO.consultas_del_rerun()
+        tramos = REGISTRO.tramos_del_rerun()
+        c_d1, c_d2, c_d3 = st.columns(3)
+        c_d1.metric("Consultas al backend", len(consultas))
+        c_d2.metric("Tiempo en backend", f"{sum(c['ms'] for c in consultas):.0f} ms")
+        c_d3.metric("Bytes recibidos", f"{sum(c['bytes'] for c in consultas) / 1024:.1f} KB")
+        if tramos:
+            st.dataframe(pd.DataFrame(tramos), use_container_width=True, hide_index=True)
+        if consultas:
+            st.dataframe(pd.DataFrame(consultas).sort_values("ms", ascending=False),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.caption("Todas las lecturas de esta ejecución salieron de la cache.")
+        st.download_button("⬇️ Métricas (Prometheus)", REGISTRO.texto_prometheus(CACHE),
+                           file_name="haylex_metricas.txt", mime="text/plain")
 
 # --- PIE DE PÁGINA MEJORADO ---
 st.divider()
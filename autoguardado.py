@@ -0,0 +1,162 @@
+"""Autoguardado diferido de los borradores de TRABAJO ACTUAL.
+
+El editor encola lo escrito en lugar de escribir en la base en cada cambio.
+La cola guarda solo la ultima version por ``(ejecutivo, cliente)`` y un hilo
+la vuelca cada ``INTERVALO_AUTOGUARDADO`` segundos con ``guardar_borradores``
+(un upsert por lote). Si el backend falla, lo no escrito vuelve a la cola (sin
+pisar ediciones mas nuevas) y se reintenta con espera exponencial; ``fallido``
+indica al editor que su borrador todavia no llego a la base. Al cerrar el
+proceso se vacia lo pendiente.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from repositorio import LOTE_ESCRITURA
+
+log = logging.getLogger(__name__)
+
+INTERVALO_AUTOGUARDADO = float(os.getenv("HAYLEX_INTERVALO_AUTOGUARDADO", "5"))
+ESPERA_MAXIMA = 300.0
+
+
+class ColaAutoguardado:
+    def __init__(self, repo, intervalo=INTERVALO_AUTOGUARDADO, lote=LOTE_ESCRITURA):
+        self.repo = repo
+        self.intervalo = intervalo
+        self.lote = lote
+        self._pendientes = OrderedDict()
+        # Claves cuyo ultimo intento de escritura fallo (hasta que una escritura funcione).
+        self._fallidos = set()
+        self._lock = threading.Lock()
+        # Solo un volcado a la vez (el hilo o ``vaciar``).
+        self._lock_volcado = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self.espera = intervalo
+        self.escritos = 0
+        self.errores = 0
+        self.ultimo_error = None
+        atexit.register(self.vaciar)
+
+    def encolar(self, ejecutivo, cliente, tareas, evidencia, estado=None):
+        """Reemplaza lo pendiente de ``(ejecutivo, cliente)``; ``estado`` pendiente se conserva si no se indica."""
+        borrador = {
+            "ejecutivo": ejecutivo,
+            "cliente": cliente,
+            "tareas_json": list(tareas),
+            "evidencia_link": evidencia,
+            "fecha": date.today().isoformat(),
+            "estado": estado,
+        }
+        with self._lock:
+            anterior = self._pendientes.get((ejecutivo, cliente))
+            if estado is None and anterior is not None:
+                borrador["estado"] = anterior["estado"]
+            self._pendientes[(ejecutivo, cliente)] = borrador
+            self._iniciar()
+
+    def guardar_pronto(self):
+        """Adelanta el proximo volcado sin esperarlo."""
+        self._despertar.set()
+
+    def escribir_ya(self, ejecutivo, cliente, tareas, evidencia, estado):
+        """Escribe ``(ejecutivo, cliente)`` sin pasar por la cola y, si funciona, quita lo pendiente.
+
+        Si falla, las ediciones quedan encoladas como borrador (sin ``estado``) y se relanza el error.
+        """
+        borrador = {
+            "ejecutivo": ejecutivo,
+            "cliente": cliente,
+            "tareas_json": list(tareas),
+            "evidencia_link": evidencia,
+            "fecha": date.today().isoformat(),
+            "estado": estado,
+        }
+        # Sin volcados en curso: uno con lo pendiente anterior no puede pisar esta escritura.
+        with self._lock_volcado:
+            try:
+                self.repo.guardar_borradores([borrador])
+            except Exception:
+                self.encolar(ejecutivo, cliente, tareas, evidencia)
+                raise
+            with self._lock:
+                self._pendientes.pop((ejecutivo, cliente), None)
+                self._fallidos.discard((ejecutivo, cliente))
+
+    def descartar(self, ejecutivo, cliente):
+        """Quita lo pendiente de ``(ejecutivo, cliente)`` (se va a escribir directamente)."""
+        with self._lock_volcado, self._lock:
+            self._pendientes.pop((ejecutivo, cliente), None)
+            self._fallidos.discard((ejecutivo, cliente))
+
+    def pendiente(self, ejecutivo, cliente):
+        with self._lock:
+            return (ejecutivo, cliente) in self._pendientes
+
+    def fallido(self, ejecutivo, cliente):
+        """``True`` si lo pendiente de ``(ejecutivo, cliente)`` ya fallo al escribirse."""
+        with self._lock:
+            return (ejecutivo, cliente) in self._fallidos
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "pendientes": len(self._pendientes),
+                "escritos": self.escritos,
+                "errores": self.errores,
+                "ultimo_error": self.ultimo_error,
+            }
+
+    def _iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._correr, daemon=True, name="haylex-autoguardado")
+            self._hilo.start()
+
+    def _correr(self):
+        while True:
+            self._despertar.wait(self.espera)
+            self._despertar.clear()
+            if self.vaciar():
+                self.espera = self.intervalo
+            else:
+                self.espera = min(self.espera * 2, ESPERA_MAXIMA)
+
+    def vaciar(self):
+        """Escribe todo lo pendiente. Devuelve ``False`` si algun lote fallo (queda en la cola)."""
+        with self._lock_volcado:
+            with self._lock:
+                tomados, self._pendientes = self._pendientes, OrderedDict()
+            if not tomados:
+                return True
+            pares = list(tomados.items())
+            lotes = [pares[i:i + self.lote] for i in range(0, len(pares), self.lote)]
+            for i, lote in enumerate(lotes):
+                try:
+                    self.repo.guardar_borradores([b for _, b in lote])
+                except Exception as e:
+                    restantes = [par for resto in lotes[i:] for par in resto]
+                    with self._lock:
+                        self.errores += 1
+                        self.ultimo_error = f"{time.strftime('%H:%M:%S')} {type(e).__name__}: {e}"
+                        self._fallidos.update(clave for clave, _ in restantes)
+                        # Las ediciones llegadas mientras tanto son mas nuevas: no se pisan
+                        # (salvo para heredar el estado pedido, como en ``encolar``).
+                        for clave, borrador in reversed(restantes):
+                            nuevo = self._pendientes.get(clave)
+                            if nuevo is None:
+                                self._pendientes[clave] = borrador
+                                self._pendientes.move_to_end(clave, last=False)
+                            elif nuevo["estado"] is None:
+                                nuevo["estado"] = borrador["estado"]
+                    log.warning("Autoguardado fallido (%s borradores); reintento en %.0fs",
+                                len(restantes), min(self.espera * 2, ESPERA_MAXIMA))
+                    return False
+                with self._lock:
+                    self.escritos += len(lote)
+                    self._fallidos.difference_update(clave for clave, _ in lote)
+            return True
@@ -0,0 +1,54 @@
+"""Bandeja de mensajes incremental.
+
+Una ``Bandeja`` vive en ``st.session_state`` y recuerda los mensajes ya
+descargados. En cada ejecucion solo pide los que tienen id mayor al ultimo
+visto; el historial mas antiguo se carga por paginas bajo demanda y los
+mensajes recibidos se marcan como leidos en una sola actualizacion.
+``es_relevante`` indica si un evento del bus de notificaciones le afecta.
+"""
+
+TAMANO_PAGINA = 20
+
+
+class Bandeja:
+    def __init__(self, usuario, tamano_pagina=TAMANO_PAGINA):
+        self.usuario = usuario
+        self.tamano_pagina = tamano_pagina
+        self.mensajes = []  # id descendente
+        self.hay_anteriores = True
+        self.no_leidos = 0
+        self.secuencia = 0  # ultimo evento del bus ya reflejado
+
+    @property
+    def ultimo_id(self):
+        return self.mensajes[0]["id"] if self.mensajes else None
+
+    def actualizar(self, repo):
+        """Agrega los mensajes nuevos desde la ultima consulta."""
+        if self.ultimo_id is None:
+            self.mensajes = list(repo.mensajes_nuevos(self.usuario, None, self.tamano_pagina))
+            self.hay_anteriores = len(self.mensajes) == self.tamano_pagina
+        else:
+            nuevos = repo.mensajes_nuevos(self.usuario, self.ultimo_id)
+            self.mensajes = list(nuevos) + self.mensajes
+
+    def es_relevante(self, evento):
+        return evento.tabla == "mensajes" and self.usuario in (
+            evento.fila.get("destinatario"), evento.fila.get("remitente"))
+
+    def cargar_anteriores(self, repo):
+        if not self.mensajes:
+            self.hay_anteriores = False
+            return
+        pagina = repo.mensajes_anteriores(self.usuario, self.mensajes[-1]["id"], self.tamano_pagina)
+        self.mensajes.extend(pagina)
+        self.hay_anteriores = len(pagina) == self.tamano_pagina
+
+    def marcar_leidos(self, repo):
+        """Marca como leidos los mensajes recibidos y pendientes, en un solo viaje."""
+        pendientes = [m for m in self.mensajes if m["destinatario"] == self.usuario and not m["leido"]]
+        if pendientes:
+            repo.marcar_leidos([m["id"] for m in pendientes])
+            # Copias locales: las filas de la cache compartida no se modifican.
+            ids = {m["id"] for m in pendientes}
+            self.mensajes = [dict(m, leido=1) if m["id"] in ids else m for m in self.mensajes]
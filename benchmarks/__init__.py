@@ -0,0 +1,5 @@
+"""Pruebas de carga y benchmarks de HAYLEX CLOUD PRO.
+
+Corren contra el backend SQLite sobre una base sintetica (nunca contra la
+base de trabajo). Ver ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,79 @@
+"""Linea de comandos de los benchmarks.
+
+Uso:
+    python -m benchmarks repositorio [--tareas 100000] [--ejecutivos 200] [--admins 5]
+    python -m benchmarks app [--tareas 1000] [--iteraciones 5]
+    python -m benchmarks datos --tareas 1000000 --ruta /tmp/haylex_bench.db
+
+- ``repositorio``: flujos de ejecutivos y admins concurrentes sobre la capa de datos.
+- ``app``: flujos completos de agenda.py con ``streamlit.testing`` (AppTest).
+- ``datos``: solo genera la base sintetica (para reutilizarla con ``--reutilizar``).
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.datos import poblar
+from benchmarks.escenarios import escenario_app, escenario_repositorio
+from benchmarks.medicion import imprimir, medir_memoria
+
+RUTA_DEFECTO = os.path.join(tempfile.gettempdir(), "haylex_bench.db")
+
+
+def _preparar(args):
+    if args.reutilizar and os.path.exists(args.ruta):
+        return
+    inicio = time.perf_counter()
+    poblar(args.ruta, args.tareas, args.ejecutivos, args.clientes, args.admins, semilla=args.semilla)
+    print(f"Base sintetica: {args.tareas} tareas en {time.perf_counter() - inicio:.1f}s ({args.ruta})")
+
+
+def cmd_datos(args):
+    args.reutilizar = False
+    _preparar(args)
+
+
+def cmd_repositorio(args):
+    _preparar(args)
+    memoria = {}
+    with medir_memoria(memoria):
+        inicio = time.perf_counter()
+        medidor = escenario_repositorio(args.ruta, args.ejecutivos, args.admins, args.clientes, args.iteraciones)
+        total = time.perf_counter() - inicio
+    imprimir(medidor.resumen(), memoria)
+    print(f"Duracion total: {total:.1f}s")
+
+
+def cmd_app(args):
+    _preparar(args)
+    memoria = {}
+    with medir_memoria(memoria):
+        medidor = escenario_app(args.ruta, args.iteraciones)
+    imprimir(medidor.resumen(), memoria)
+
+
+COMANDOS = {
+    "datos": cmd_datos,
+    "repositorio": cmd_repositorio,
+    "app": cmd_app,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de HAYLEX CLOUD PRO")
+    parser.add_argument("comando", choices=list(COMANDOS))
+    parser.add_argument("--ruta", default=RUTA_DEFECTO, help="base SQLite sintetica (se reemplaza)")
+    parser.add_argument("--reutilizar", action="store_true", help="usar --ruta si ya existe")
+    parser.add_argument("--tareas", type=int, default=10000)
+    parser.add_argument("--ejecutivos", type=int, default=200)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--iteraciones", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+    COMANDOS[args.comando](args)
+
+
+if __name__ == "__main__":
+    main()
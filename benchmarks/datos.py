@@ -0,0 +1,93 @@
+"""Generacion de bases SQLite sinteticas para los benchmarks."""
+import json
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from credenciales import hashear
+from repositorio import ESQUEMA_SQLITE, SQL_RECONSTRUIR_ROLLUP
+
+ESTADOS = [("Finalizado", 0.8), ("Revision", 0.1), ("En progreso", 0.1)]
+LOTE = 10000
+CLAVE = "bench"
+
+
+def nombre_ejecutivo(i):
+    return f"EJEC{i:04d}"
+
+
+def nombre_admin(i):
+    return "GERENCIA" if i == 0 else f"ADMIN{i:02d}"
+
+
+def nombre_cliente(i):
+    return f"CLIENTE{i:03d}"
+
+
+def _estado(azar):
+    x = azar.random()
+    for estado, peso in ESTADOS:
+        if x < peso:
+            return estado
+        x -= peso
+    return ESTADOS[-1][0]
+
+
+def _filas_tareas(azar, n_tareas, n_ejecutivos, n_clientes, dias):
+    hoy = date.today()
+    for _ in range(n_tareas):
+        ejecutivo = azar.randrange(n_ejecutivos)
+        estado = _estado(azar)
+        finalizada = estado == "Finalizado"
+        yield (
+            (hoy - timedelta(days=azar.randrange(dias))).isoformat(),
+            nombre_ejecutivo(ejecutivo),
+            nombre_cliente(ejecutivo % n_clientes),
+            json.dumps([f"Tarea {k + 1}" for k in range(azar.randint(1, 8))]),
+            "",
+            "",
+            "Buen avance" if finalizada else None,
+            azar.randint(40, 100) if finalizada else 0,
+            estado,
+        )
+
+
+def poblar(ruta, n_tareas=1000, n_ejecutivos=200, n_clientes=50, n_admins=5,
+           n_mensajes=None, dias=730, semilla=0):
+    """Crea (o reemplaza) la base ``ruta`` con datos sinteticos reproducibles."""
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    azar = random.Random(semilla)
+    n_mensajes = n_tareas // 10 if n_mensajes is None else n_mensajes
+
+    con = sqlite3.connect(ruta, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(ESQUEMA_SQLITE)
+    con.execute("BEGIN")
+    # Un solo hash para todos: calcular uno por usuario solo alarga la preparacion.
+    clave = hashear(CLAVE)
+    con.executemany("INSERT INTO usuarios (usuario, pass, rol) VALUES (?, ?, ?)",
+                    [(nombre_admin(i), clave, "admin") for i in range(n_admins)]
+                    + [(nombre_ejecutivo(i), clave, "user") for i in range(n_ejecutivos)])
+    con.executemany("INSERT INTO clientes (nombre_cliente, ejecutivo_asignado) VALUES (?, ?)",
+                    [(nombre_cliente(i), nombre_ejecutivo(i)) for i in range(n_clientes)])
+
+    filas = _filas_tareas(azar, n_tareas, n_ejecutivos, n_clientes, dias)
+    while True:
+        lote = [f for _, f in zip(range(LOTE), filas)]
+        if not lote:
+            break
+        con.executemany(
+            "INSERT INTO tareas (fecha, ejecutivo, cliente, tareas_json, evidencia_link, notas_ejecutivo,"
+            " notas_admin, calificacion, estado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", lote)
+
+    con.executemany(
+        "INSERT INTO mensajes (remitente, destinatario, mensaje, fecha, leido) VALUES (?, ?, ?, ?, ?)",
+        [(nombre_ejecutivo(azar.randrange(n_ejecutivos)), "GERENCIA", f"Mensaje {k}",
+          date.today().strftime("%d/%m/%Y 09:00"), azar.randint(0, 1)) for k in range(n_mensajes)])
+    con.execute(SQL_RECONSTRUIR_ROLLUP)
+    con.execute("COMMIT")
+    con.close()
+    return ruta
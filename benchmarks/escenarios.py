@@ -0,0 +1,126 @@
+"""Escenarios de carga.
+
+- ``escenario_repositorio``: ejecutivos y admins concurrentes, cada uno en su
+  hilo, llamando al repositorio (con la cache de la app) como lo hacen los
+  flujos de agenda.py. Mide la capa de datos sin el costo de Streamlit.
+- ``escenario_app``: recorre agenda.py de forma headless con ``AppTest``
+  (login, guardar/enviar tarea, evaluacion, bandeja y METRICAS) y mide cada
+  re-ejecucion completa del script.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.datos import CLAVE, nombre_admin, nombre_cliente, nombre_ejecutivo
+from benchmarks.medicion import ContadorConsultas, Medidor
+from cache import CacheConsultas, RepositorioCacheado
+from credenciales import LIMITADOR
+from repositorio import RepositorioSQLite
+
+# --- IMPORTACIÓN PARA APPTEST ---
+try:
+    from streamlit.testing.v1 import AppTest
+    APPTEST_AVAILABLE = True
+except ImportError:
+    APPTEST_AVAILABLE = False
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agenda.py")
+
+
+def _ejecutivo(repo, medidor, i, n_clientes, iteraciones):
+    usuario, cliente = nombre_ejecutivo(i), nombre_cliente(i % n_clientes)
+    for k in range(iteraciones):
+        with medidor.medir("cargar_borrador"):
+            tarea = repo.obtener_tarea_activa(usuario, cliente)
+        datos = {"tareas_json": [f"Tarea {j + 1} v{k}" for j in range(6)], "evidencia_link": "",
+                 "estado": "En progreso", "fecha": date.today().isoformat()}
+        with medidor.medir("guardar_tarea"):
+            if tarea is None:
+                repo.crear_tarea(dict(datos, ejecutivo=usuario, cliente=cliente, calificacion=0))
+                tarea = repo.obtener_tarea_activa(usuario, cliente)
+            else:
+                repo.actualizar_tarea(tarea["id"], datos)
+        if k == iteraciones - 1 and tarea is not None:
+            with medidor.medir("enviar_revision"):
+                repo.actualizar_tarea(tarea["id"], dict(datos, estado="Revision"))
+        with medidor.medir("bandeja"):
+            repo.mensajes_nuevos(usuario)
+            repo.contar_no_leidos(usuario)
+
+
+def _admin(repo, medidor, i, iteraciones):
+    hasta = date.today()
+    for k in range(iteraciones):
+        with medidor.medir("cola_revision"):
+            cola = repo.cola_revision(limite=20)
+            repo.contar_revision()
+        if cola:
+            with medidor.medir("evaluar_lote"):
+                repo.evaluar_tareas([(t["id"], "Revisado", 80) for t in cola[:5]])
+        with medidor.medir("metricas"):
+            repo.clientes_evaluados()
+            repo.metricas_avance(hasta - timedelta(days=[7, 30, 90, 365][k % 4]), hasta, None)
+        with medidor.medir("bandeja"):
+            repo.mensajes_nuevos(nombre_admin(i))
+
+
+def escenario_repositorio(ruta, n_ejecutivos=200, n_admins=5, n_clientes=50, iteraciones=10):
+    base = RepositorioSQLite(ruta)
+    medidor = Medidor(ContadorConsultas(base.con))
+    repo = RepositorioCacheado(base, CacheConsultas())
+    with ThreadPoolExecutor(max_workers=n_ejecutivos + n_admins) as pool:
+        trabajos = [pool.submit(_ejecutivo, repo, medidor, i, n_clientes, iteraciones) for i in range(n_ejecutivos)]
+        trabajos += [pool.submit(_admin, repo, medidor, i, iteraciones) for i in range(n_admins)]
+        for trabajo in trabajos:
+            trabajo.result()
+    return medidor
+
+
+def _boton(at, etiqueta):
+    return next(b for b in at.button if b.label == etiqueta)
+
+
+def escenario_app(ruta, iteraciones=5, timeout=60):
+    """Sesiones AppTest sucesivas sobre ``ruta``. Requiere streamlit instalado."""
+    if not APPTEST_AVAILABLE:
+        raise RuntimeError("streamlit.testing no esta disponible; instale streamlit.")
+    os.environ["HAYLEX_BACKEND"] = "sqlite"
+    os.environ["HAYLEX_DB_PATH"] = ruta
+    base = RepositorioSQLite(ruta)
+    medidor = Medidor(ContadorConsultas(base.con), por_hilo=False)
+
+    for k in range(iteraciones):
+        # Ejecutivo: login, guardar progreso, enviar a revision, mensajes.
+        at = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+        with medidor.medir("primera_carga"):
+            at.run()
+        # Cada iteracion ingresa con el mismo usuario: sin limite de intentos.
+        LIMITADOR.reiniciar()
+        at.text_input[0].input(nombre_ejecutivo(0))
+        at.text_input[1].input(CLAVE)
+        with medidor.medir("login"):
+            _boton(at, "INGRESAR").click().run()
+        at.text_input(key="tx_0").input(f"Tarea benchmark {k}")
+        with medidor.medir("guardar_tarea"):
+            _boton(at, "💾 Guardar progreso").click().run()
+        with medidor.medir("enviar_revision"):
+            _boton(at, "📤 Enviar a revisión").click().run()
+        with medidor.medir("rerun_ejecutivo"):
+            at.run()
+
+        # Admin: cola de evaluacion, guardar evaluaciones, METRICAS y MENSAJES.
+        at = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+        at.session_state["auth"] = {"conectado": True, "user": nombre_admin(0), "rol": "admin"}
+        with medidor.medir("evaluacion"):
+            at.run()
+        for casilla in [c for c in at.checkbox if str(c.key).startswith("sel_")][:5]:
+            casilla.check()
+        with medidor.medir("evaluar_lote"):
+            _boton(at, "GUARDAR EVALUACIONES").click().run()
+        with medidor.medir("metricas"):
+            at.radio(key="seccion_admin").set_value("METRICAS").run()
+        with medidor.medir("metricas_rerun"):
+            at.run()
+        with medidor.medir("bandeja"):
+            at.radio(key="seccion_admin").set_value("MENSAJES").run()
+    return medidor
@@ -0,0 +1,108 @@
+"""Registro de latencias, consultas por interaccion y memoria."""
+import math
+import resource
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) por rango mas cercano; ``valores`` ya ordenados."""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class ContadorConsultas:
+    """Cuenta las sentencias ejecutadas en una conexion SQLite, en total y por hilo."""
+
+    def __init__(self, con):
+        self._lock = threading.Lock()
+        self._por_hilo = defaultdict(int)
+        self.total = 0
+        con.set_trace_callback(self._registrar)
+
+    def _registrar(self, sentencia):
+        with self._lock:
+            self.total += 1
+            self._por_hilo[threading.get_ident()] += 1
+
+    def del_hilo(self):
+        with self._lock:
+            return self._por_hilo[threading.get_ident()]
+
+
+class Medidor:
+    """Acumula muestras por interaccion: ``with medidor.medir("guardar"): ...``.
+
+    ``por_hilo`` cuenta solo las consultas del hilo que mide (escenarios
+    concurrentes); si no, las de todo el proceso (AppTest ejecuta el script en
+    otro hilo).
+    """
+
+    def __init__(self, contador=None, por_hilo=True):
+        self.contador = contador
+        self.por_hilo = por_hilo
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.consultas = defaultdict(list)
+
+    def _consultas(self):
+        if self.contador is None:
+            return 0
+        return self.contador.del_hilo() if self.por_hilo else self.contador.total
+
+    @contextmanager
+    def medir(self, nombre):
+        consultas = self._consultas()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            hechas = self._consultas() - consultas
+            with self._lock:
+                self.latencias[nombre].append(duracion)
+                self.consultas[nombre].append(hechas)
+
+    def resumen(self):
+        filas = []
+        with self._lock:
+            for nombre, muestras in sorted(self.latencias.items()):
+                ordenadas = sorted(muestras)
+                consultas = self.consultas[nombre]
+                filas.append({
+                    "interaccion": nombre,
+                    "n": len(ordenadas),
+                    "p50_ms": percentil(ordenadas, 50) * 1000,
+                    "p95_ms": percentil(ordenadas, 95) * 1000,
+                    "p99_ms": percentil(ordenadas, 99) * 1000,
+                    "max_ms": ordenadas[-1] * 1000,
+                    "consultas": sum(consultas) / len(consultas),
+                })
+        return filas
+
+
+@contextmanager
+def medir_memoria(resultado):
+    """Guarda en ``resultado`` el pico de memoria Python (tracemalloc) y el RSS maximo."""
+    tracemalloc.start()
+    try:
+        yield resultado
+    finally:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultado["pico_python_mb"] = pico / 2**20
+        # ru_maxrss esta en KiB en Linux.
+        resultado["rss_max_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def imprimir(filas, memoria=None):
+    print(f"{'interaccion':<24}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'consultas':>11}")
+    for f in filas:
+        print(f"{f['interaccion']:<24}{f['n']:>7}{f['p50_ms']:>10.2f}{f['p95_ms']:>10.2f}"
+              f"{f['p99_ms']:>10.2f}{f['max_ms']:>10.2f}{f['consultas']:>11.1f}")
+    if memoria:
+        print(f"Memoria: pico Python {memoria['pico_python_mb']:.1f} MB | RSS maximo {memoria['rss_max_mb']:.1f} MB")
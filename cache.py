@@ -0,0 +1,247 @@
+"""Cache compartida de consultas para HAYLEX CLOUD PRO.
+
+Streamlit vuelve a ejecutar todo el script en cada interaccion, por lo que las
+mismas lecturas se repiten muchas veces por minuto. ``RepositorioCacheado``
+envuelve cualquier ``Repositorio`` y guarda sus lecturas en una cache con TTL y
+tamano maximo, indexada por tabla + metodo + filtros. Las escrituras de la
+propia aplicacion invalidan en el acto las tablas afectadas, asi que un usuario
+nunca ve datos viejos despues de sus propios cambios.
+
+Con varias replicas, ``CacheCompartida`` guarda las mismas entradas en el
+estado compartido (ver estado.py): las invalidaciones de una replica valen para
+todas y una replica nueva no arranca en frio.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from estado import ESTADO
+
+# Segundos que vive una lectura por tabla. Solo cubren cambios hechos por
+# otros procesos; los de este proceso invalidan la cache inmediatamente.
+TTL_POR_TABLA = {
+    "usuarios": 300,
+    "clientes": 300,
+    "tareas": 60,
+    "metricas_rollup": 60,
+    "mensajes": 30,
+}
+TTL_DEFECTO = 60
+MAX_ENTRADAS = 512
+
+# metodo de lectura -> tabla de la que depende
+LECTURAS = {
+    "obtener_usuario": "usuarios",
+    "listar_usuarios": "usuarios",
+    "buscar_usuarios": "usuarios",
+    "contar_usuarios": "usuarios",
+    "listar_clientes": "clientes",
+    "buscar_clientes": "clientes",
+    "contar_clientes": "clientes",
+    "listar_tareas": "tareas",
+    "obtener_tarea_activa": "tareas",
+    "historial_ejecutivo": "tareas",
+    "resumen_ejecutivo": "tareas",
+    "cola_revision": "tareas",
+    "contar_revision": "tareas",
+    # Solo tareas Finalizadas: dominio propio para que el autoguardado no lo invalide.
+    "vista_avance": "metricas_rollup",
+    "clientes_evaluados": "metricas_rollup",
+    "metricas_avance": "metricas_rollup",
+    "mensajes_nuevos": "mensajes",
+    "mensajes_anteriores": "mensajes",
+    "contar_no_leidos": "mensajes",
+}
+
+# metodo de escritura -> tablas que invalida
+ESCRITURAS = {
+    "crear_usuario": ("usuarios",),
+    "actualizar_clave": ("usuarios",),
+    "borrar_usuario": ("usuarios",),
+    "crear_usuarios": ("usuarios",),
+    "migrar_claves": ("usuarios",),
+    "crear_cliente": ("clientes",),
+    "actualizar_cliente": ("clientes",),
+    "borrar_cliente": ("clientes",),
+    "crear_clientes": ("clientes",),
+    "reasignar_clientes": ("clientes",),
+    # Escrituras genericas: pueden tocar tareas Finalizadas.
+    "crear_tarea": ("tareas", "metricas_rollup"),
+    "actualizar_tarea": ("tareas", "metricas_rollup"),
+    # El autoguardado nunca toca tareas Finalizadas.
+    "guardar_borradores": ("tareas",),
+    "evaluar_tarea": ("tareas", "metricas_rollup"),
+    "evaluar_tareas": ("tareas", "metricas_rollup"),
+    "reconstruir_rollup": ("tareas", "metricas_rollup"),
+    "migrar_tareas": ("tareas", "metricas_rollup"),
+    "enviar_mensaje": ("mensajes",),
+    "marcar_leidos": ("mensajes",),
+    "reiniciar": ("usuarios", "clientes", "tareas", "metricas_rollup", "mensajes"),
+}
+
+
+def tablas_de_evento(evento):
+    """Tablas a invalidar por un evento del bus (cambio hecho por otra sesion o proceso).
+
+    Solo las tareas que entran o salen de Finalizado (o se borran) cambian ``metricas_rollup``.
+    """
+    fila = evento.fila or {}
+    if evento.tabla == "tareas" and (evento.tipo == "DELETE" or "Finalizado" in (fila.get("estado"), fila.get("estado_anterior"))):
+        return ("tareas", "metricas_rollup")
+    return (evento.tabla,)
+
+
+class CacheConsultas:
+    """Cache LRU con TTL por entrada, segura entre hilos."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._versiones = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Devuelve ``(True, valor)`` si la clave esta vigente, si no ``(False, None)``."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                expira, valor = entrada
+                if expira > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, tabla):
+        """Elimina todas las lecturas de ``tabla`` y sube su numero de version."""
+        with self._lock:
+            for clave in [k for k in self._datos if k[0] == tabla]:
+                del self._datos[clave]
+            self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def version(self, tabla):
+        """Contador que cambia cada vez que ``tabla`` se modifica desde la app."""
+        with self._lock:
+            return self._versiones.get(tabla, 0)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "entradas": len(self._datos),
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+            }
+
+
+class CacheCompartida:
+    """Misma interfaz que ``CacheConsultas`` sobre un ``EstadoCompartido``.
+
+    Las claves quedan como ``cache:<tabla>:<repr(clave)>``, asi invalidar una
+    tabla es borrar un rango de claves. Los aciertos y fallos son de este proceso.
+    """
+
+    def __init__(self, estado):
+        self.estado = estado
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def _clave(clave):
+        return f"cache:{clave[0]}:{clave!r}"
+
+    def obtener(self, clave):
+        encontrado, valor = self.estado.obtener(self._clave(clave))
+        with self._lock:
+            if encontrado:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        return encontrado, valor
+
+    def guardar(self, clave, valor, ttl):
+        try:
+            self.estado.guardar(self._clave(clave), valor, ttl)
+        except (TypeError, ValueError):
+            pass  # no serializable: se vuelve a leer la proxima vez
+
+    def invalidar(self, tabla):
+        self.estado.borrar_prefijo(f"cache:{tabla}:")
+        self.estado.incrementar(f"version:{tabla}")
+
+    def version(self, tabla):
+        return self.estado.obtener(f"version:{tabla}")[1] or 0
+
+    def limpiar(self):
+        self.estado.borrar_prefijo("cache:")
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "entradas": self.estado.contar_prefijo("cache:"),
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+            }
+
+
+class RepositorioCacheado:
+    """Envuelve un ``Repositorio`` cacheando lecturas e invalidando en escrituras.
+
+    Los valores cacheados se comparten entre sesiones: quien los recibe no debe
+    modificarlos en sitio.
+    """
+
+    def __init__(self, repo, cache=None):
+        self.repo = repo
+        self.cache = cache if cache is not None else CacheConsultas()
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.repo, nombre)
+        if nombre in LECTURAS:
+            tabla = LECTURAS[nombre]
+
+            def leer(*args, **kwargs):
+                clave = (tabla, nombre, args, tuple(sorted(kwargs.items())))
+                encontrado, valor = self.cache.obtener(clave)
+                if encontrado:
+                    return valor
+                version = self.cache.version(tabla)
+                valor = metodo(*args, **kwargs)
+                # Si la tabla se invalido durante la lectura el valor puede ser viejo: no se guarda.
+                if self.cache.version(tabla) == version:
+                    self.cache.guardar(clave, valor, TTL_POR_TABLA.get(tabla, TTL_DEFECTO))
+                return valor
+            return leer
+        if nombre in ESCRITURAS:
+            def escribir(*args, **kwargs):
+                try:
+                    return metodo(*args, **kwargs)
+                finally:
+                    for tabla in ESCRITURAS[nombre]:
+                        self.cache.invalidar(tabla)
+            return escribir
+        return metodo
+
+
+# Cache unica del proceso, compartida por todas las sesiones de Streamlit (y
+# por todas las replicas del host si se configuro HAYLEX_ESTADO_COMPARTIDO).
+CACHE = CacheCompartida(ESTADO) if ESTADO.compartido else CacheConsultas()
@@ -0,0 +1,186 @@
+"""Claves con hash y control de intentos de ingreso.
+
+Las claves se guardan en ``usuarios.pass`` como ``scrypt$n$r$p$sal$hash`` (o
+``pbkdf2_sha256$iteraciones$sal$hash`` si el Python no trae scrypt). El ingreso
+lee la credencial por la clave primaria del usuario (sin cache, para que el
+hash no quede en la cache compartida) y verifica localmente en tiempo
+constante; si el usuario no existe se verifica igual contra un hash ficticio,
+asi la respuesta tarda lo mismo.
+
+Las filas antiguas con la clave en texto plano se siguen aceptando y se pasan a
+hash al primer ingreso correcto (o todas juntas con
+``python mantenimiento.py claves``).
+
+``LIMITADOR`` corta las rafagas de intentos fallidos por usuario y por IP con
+cubetas de fichas en memoria, antes de tocar la base de datos. Cada intento
+reserva una ficha y un ingreso correcto la devuelve.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRYPT_AVAILABLE = hasattr(hashlib, "scrypt")
+
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+PBKDF2_ITERACIONES = 600000
+LARGO_SAL = 16
+LARGO_HASH = 32
+
+# Cubetas: (capacidad, segundos por ficha). 5 intentos seguidos por usuario y
+# luego uno cada 30 s; 20 por IP y luego uno cada 5 s.
+CUBETA_USUARIO = (5, 30.0)
+CUBETA_IP = (20, 5.0)
+MAX_CUBETAS = 10000
+
+
+def _b64(datos):
+    return base64.b64encode(datos).decode("ascii")
+
+
+def hashear(clave):
+    """Hash con sal aleatoria de ``clave``, listo para guardar en ``usuarios.pass``."""
+    sal = secrets.token_bytes(LARGO_SAL)
+    datos = clave.encode("utf-8")
+    if SCRYPT_AVAILABLE:
+        h = hashlib.scrypt(datos, salt=sal, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=LARGO_HASH)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(sal)}${_b64(h)}"
+    h = hashlib.pbkdf2_hmac("sha256", datos, sal, PBKDF2_ITERACIONES, LARGO_HASH)
+    return f"pbkdf2_sha256${PBKDF2_ITERACIONES}${_b64(sal)}${_b64(h)}"
+
+
+def hashear_varias(claves):
+    """``hashear`` en paralelo (el calculo libera el GIL) para las altas masivas."""
+    claves = list(claves)
+    if len(claves) < 2:
+        return [hashear(c) for c in claves]
+    with ThreadPoolExecutor(max_workers=min(len(claves), os.cpu_count() or 1)) as pool:
+        return list(pool.map(hashear, claves))
+
+
+def es_hash(valor):
+    return isinstance(valor, str) and valor.startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def _calcular(clave, guardado):
+    partes = guardado.split("$")
+    datos = clave.encode("utf-8")
+    if partes[0] == "scrypt" and len(partes) == 6:
+        n, r, p = (int(x) for x in partes[1:4])
+        sal, h = base64.b64decode(partes[4]), base64.b64decode(partes[5])
+        return hashlib.scrypt(datos, salt=sal, n=n, r=r, p=p, dklen=len(h), maxmem=256 * 2**20), h
+    if partes[0] == "pbkdf2_sha256" and len(partes) == 4:
+        sal, h = base64.b64decode(partes[2]), base64.b64decode(partes[3])
+        return hashlib.pbkdf2_hmac("sha256", datos, sal, int(partes[1]), len(h)), h
+    raise ValueError("Formato de hash desconocido")
+
+
+def necesita_rehash(guardado):
+    """Texto plano o parametros distintos de los actuales."""
+    if not es_hash(guardado):
+        return True
+    if SCRYPT_AVAILABLE:
+        return not guardado.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+    return not guardado.startswith(f"pbkdf2_sha256${PBKDF2_ITERACIONES}$")
+
+
+_FICTICIO = None
+
+
+def verificar(clave, guardado):
+    """``True`` si ``clave`` corresponde a ``guardado`` (hash o texto plano antiguo)."""
+    global _FICTICIO
+    if not guardado:
+        # Mismo trabajo que con un usuario real.
+        if _FICTICIO is None:
+            _FICTICIO = hashear(secrets.token_hex(8))
+        _calcular(clave, _FICTICIO)
+        return False
+    if not es_hash(guardado):
+        return hmac.compare_digest(clave.encode("utf-8"), str(guardado).encode("utf-8"))
+    try:
+        calculado, esperado = _calcular(clave, guardado)
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(calculado, esperado)
+
+
+def autenticar(repo, usuario, clave):
+    """Fila del usuario (sin ``pass``) si la clave es correcta; si no ``None``.
+
+    Pasa a hash las claves en texto plano o con parametros viejos.
+    """
+    fila = repo.credencial(usuario)
+    guardado = fila.get("pass") if fila is not None else None
+    if not verificar(clave, guardado):
+        return None
+    if necesita_rehash(guardado):
+        repo.actualizar_clave(usuario, clave)
+    return {k: v for k, v in fila.items() if k != "pass"}
+
+
+# --- LIMITE DE INTENTOS ---
+class DemasiadosIntentos(Exception):
+    def __init__(self, espera):
+        super().__init__(f"Demasiados intentos. Espere {espera:.0f} s.")
+        self.espera = espera
+
+
+class LimitadorIntentos:
+    """Cubetas de fichas por clave (``("usuario", u)``, ``("ip", ip)``), seguras entre hilos."""
+
+    def __init__(self, max_cubetas=MAX_CUBETAS):
+        self.max_cubetas = max_cubetas
+        self._cubetas = {}
+        self._lock = threading.Lock()
+
+    def reiniciar(self):
+        with self._lock:
+            self._cubetas.clear()
+
+    def _tomar(self, clave, capacidad, segundos, ahora):
+        fichas, ultimo = self._cubetas.pop(clave, (capacidad, ahora))
+        fichas = min(capacidad, fichas + (ahora - ultimo) / segundos)
+        if fichas < 1:
+            self._cubetas[clave] = (fichas, ahora)
+            return (1 - fichas) * segundos
+        self._cubetas[clave] = (fichas - 1, ahora)
+        return 0.0
+
+    def consumir(self, usuario, ip=None):
+        """Gasta una ficha de cada cubeta; si alguna esta vacia lanza ``DemasiadosIntentos``."""
+        ahora = time.monotonic()
+        with self._lock:
+            espera = self._tomar(("usuario", usuario), *CUBETA_USUARIO, ahora)
+            if ip:
+                espera = max(espera, self._tomar(("ip", ip), *CUBETA_IP, ahora))
+            # Las cubetas mas viejas salen primero (se reinsertan al usarse).
+            while len(self._cubetas) > self.max_cubetas:
+                del self._cubetas[next(iter(self._cubetas))]
+        if espera:
+            raise DemasiadosIntentos(espera)
+
+    def devolver(self, usuario, ip=None):
+        """Reintegra la ficha de un intento correcto (no cuenta para el limite)."""
+        with self._lock:
+            for clave, (capacidad, _) in ((("usuario", usuario), CUBETA_USUARIO), (("ip", ip), CUBETA_IP)):
+                if clave[1] and clave in self._cubetas:
+                    fichas, ultimo = self._cubetas[clave]
+                    self._cubetas[clave] = (min(capacidad, fichas + 1), ultimo)
+
+
+# Limitador unico del proceso.
+LIMITADOR = LimitadorIntentos()
+
+
+def iniciar_sesion(repo, usuario, clave, ip=None):
+    """Ingreso completo: limite de intentos fallidos y luego ``autenticar``."""
+    LIMITADOR.consumir(usuario, ip)
+    fila = autenticar(repo, usuario, clave)
+    if fila is not None:
+        LIMITADOR.devolver(usuario, ip)
+    return fila
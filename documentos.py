@@ -0,0 +1,207 @@
+"""Motor de documentos PDF de HAYLEX CLOUD PRO.
+
+Los PDF se generan en un grupo de hilos con cola acotada, de modo que una
+rafaga de descargas nunca bloquea el hilo de una sesion de Streamlit. Los
+bytes se guardan en memoria por (tipo, rol, hash del contenido): las guias de
+ayuda solo tienen dos variantes y se pre-generan al arrancar el proceso.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as EsperaAgotada
+
+# --- IMPORTACIÓN PARA PDF ---
+try:
+    from fpdf import FPDF
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+TRABAJADORES_PDF = int(os.getenv("HAYLEX_TRABAJADORES_PDF", "2"))
+MAX_COLA_PDF = int(os.getenv("HAYLEX_MAX_COLA_PDF", "16"))
+# Segundos que una sesion espera un PDF en curso; despues sigue con "generando..."
+# y lo retoma en la proxima ejecucion (el trabajo sigue en el grupo de hilos).
+ESPERA_PDF = float(os.getenv("HAYLEX_ESPERA_PDF", "0.5"))
+
+log = logging.getLogger(__name__)
+
+GUIAS = {
+    'admin': (
+        'Guía del Administrador - HAYLEX CLOUD PRO',
+        """
+PANEL DE ADMINISTRACIÓN
+
+1. Evaluación de Tareas
+   - Revise las tareas enviadas por los ejecutivos.
+   - Asigne una calificación (%) y deje comentarios.
+   - Marque "Finalizar esta evaluación" en cada tarea revisada.
+   - Al guardar, las tareas marcadas pasan a Finalizado en un solo paso.
+
+2. Gestión de Clientes
+   - Registre nuevos clientes y asígneles un ejecutivo.
+   - Edite o elimine clientes existentes.
+
+3. Gestión de Usuarios
+   - Cree nuevas cuentas para ejecutivos.
+   - Actualice contraseñas o elimine usuarios.
+
+4. Métricas de Desempeño
+   - Visualice el avance individual y por cliente/proyecto.
+   - Use filtros para analizar periodos específicos.
+
+5. Reiniciar Sistema
+   - Borre todos los datos (excepto su cuenta) si es necesario.
+"""
+    ),
+    'user': (
+        'Guía del Ejecutivo - HAYLEX CLOUD PRO',
+        """
+PORTAL DEL EJECUTIVO
+
+1. Trabajo Actual
+   - Seleccione un cliente asignado.
+   - Escriba hasta 6 tareas (puede agregar más).
+   - Adjunte evidencia como imagen (formatos: PNG, JPG).
+
+2. Guardar vs Enviar
+   - 💾 Guardar progreso: Guarda sus cambios sin enviarlos a revisión.
+   - 📤 Enviar a revisión: Envía sus tareas al administrador para evaluación.
+
+3. Editar Tareas Enviadas
+   - Puede seguir editando tareas que ya envió, mientras no estén Finalizadas.
+   - Las tareas Finalizadas solo se ven en el historial.
+
+4. Historial
+   - Revise sus tareas evaluadas, calificaciones y comentarios del admin.
+"""
+    ),
+}
+
+
+class PDFNoDisponible(RuntimeError):
+    """La cola de PDF esta llena o el documento aun se esta generando."""
+
+
+class ErrorPDF(RuntimeError):
+    """El documento no se pudo generar (el siguiente intento lo vuelve a encolar)."""
+
+
+def texto_pdf(texto):
+    """Las fuentes base de FPDF son latin-1: se descartan emojis y otros simbolos."""
+    return texto.encode("latin-1", "ignore").decode("latin-1")
+
+
+def nuevo_pdf():
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    try:
+        pdf.set_font("Arial", size=12)
+    except Exception:
+        pdf.set_font("Helvetica", size=12)
+    return pdf
+
+
+def bytes_pdf(pdf):
+    """``output`` devuelve str en pyfpdf y bytearray en fpdf2."""
+    salida = pdf.output(dest='S')
+    return salida.encode("latin-1") if isinstance(salida, str) else bytes(salida)
+
+
+def renderizar_guia(titulo, contenido):
+    pdf = nuevo_pdf()
+    pdf.set_font_size(16)
+    pdf.cell(0, 10, texto_pdf(titulo), ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font_size(12)
+    for line in contenido.strip().split('\n'):
+        pdf.multi_cell(0, 8, texto_pdf(line.strip()))
+    return bytes_pdf(pdf)
+
+
+class MotorPDF:
+    """Genera PDF en segundo plano con cola acotada y cache de bytes en memoria."""
+
+    def __init__(self, trabajadores=TRABAJADORES_PDF, max_cola=MAX_COLA_PDF):
+        self._pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="haylex-pdf")
+        self._cupos = threading.BoundedSemaphore(max_cola)
+        self._lock = threading.Lock()
+        self._listos = {}
+        self._en_curso = {}
+
+    def enviar(self, clave, funcion, *args):
+        """Encola ``funcion(*args)`` bajo ``clave``; reutiliza resultados y trabajos en curso.
+
+        Devuelve un ``Future`` con los bytes. Lanza ``PDFNoDisponible`` si no hay cupo.
+        """
+        with self._lock:
+            if clave in self._listos:
+                return _Resuelto(self._listos[clave])
+            if clave in self._en_curso:
+                return self._en_curso[clave]
+            if not self._cupos.acquire(blocking=False):
+                raise PDFNoDisponible("Hay demasiados documentos en preparación.")
+            futuro = self._pool.submit(funcion, *args)
+            self._en_curso[clave] = futuro
+        futuro.add_done_callback(lambda f: self._terminar(clave, f))
+        return futuro
+
+    def _terminar(self, clave, futuro):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+            if futuro.exception() is None:
+                self._listos[clave] = futuro.result()
+        self._cupos.release()
+
+    def obtener(self, clave, funcion, *args, espera=ESPERA_PDF):
+        try:
+            return self.enviar(clave, funcion, *args).result(timeout=espera)
+        except EsperaAgotada:
+            raise PDFNoDisponible("El documento aún se está generando.") from None
+        except PDFNoDisponible:
+            raise
+        except Exception as e:
+            log.exception("Fallo al generar el PDF %s", clave)
+            raise ErrorPDF("No se pudo generar el documento.") from e
+
+
+class _Resuelto:
+    """Future ya resuelto para resultados en cache."""
+
+    def __init__(self, valor):
+        self._valor = valor
+
+    def result(self, timeout=None):
+        return self._valor
+
+    def done(self):
+        return True
+
+
+# Motor unico del proceso.
+MOTOR = MotorPDF()
+
+
+def clave_guia(rol):
+    titulo, contenido = GUIAS['admin' if rol == 'admin' else 'user']
+    huella = hashlib.sha256(f"{titulo}\n{contenido}".encode("utf-8")).hexdigest()[:16]
+    return ("guia", rol, huella), titulo, contenido
+
+
+def guia_pdf(rol):
+    """Bytes de la guia de ``rol`` (admin o ejecutivo), desde memoria si ya existe."""
+    if not PDF_AVAILABLE:
+        return None
+    clave, titulo, contenido = clave_guia(rol)
+    return MOTOR.obtener(clave, renderizar_guia, titulo, contenido)
+
+
+def precalentar_guias():
+    """Encola las dos variantes de la guia sin esperar a que terminen."""
+    if not PDF_AVAILABLE:
+        return
+    for rol in ('admin', 'user'):
+        clave, titulo, contenido = clave_guia(rol)
+        MOTOR.enviar(clave, renderizar_guia, titulo, contenido)
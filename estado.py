@@ -0,0 +1,259 @@
+"""Estado compartido entre replicas de HAYLEX CLOUD PRO.
+
+Un almacen clave -> valor con TTL donde viven la cache de consultas
+(``cache.CacheCompartida``), los borradores del portal del ejecutivo y las
+sesiones revocadas. Asi una sesion puede pasar de una replica a otra sin perder
+su borrador y una replica nueva arranca con la cache ya caliente.
+
+- ``EstadoMemoria``: dentro del proceso (una sola replica; es el defecto).
+- ``EstadoSQLite``: archivo SQLite en WAL que comparten todos los procesos del
+  mismo host. Se activa con ``HAYLEX_ESTADO_COMPARTIDO=/ruta/estado.db``.
+
+Los valores se guardan como JSON: solo admite tipos JSON (las tuplas vuelven
+como listas).
+
+Con el almacen lleno solo se descartan antes de vencer las claves de cache
+(``PREFIJO_DESCARTABLE``): borradores, sesiones revocadas y la clave de firma
+viven hasta su TTL aunque se supere ``MAX_CLAVES``.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RUTA_ESTADO = os.getenv("HAYLEX_ESTADO_COMPARTIDO")
+MAX_CLAVES = 20000
+# Cada cuantas escrituras se borran las claves vencidas.
+PURGAR_CADA = 500
+TTL_BORRADOR = 12 * 3600
+# Unicas claves que se pueden descartar antes de vencer (se vuelven a leer de la base).
+PREFIJO_DESCARTABLE = "cache:"
+
+
+class EstadoCompartido:
+    """Interfaz comun. ``ttl`` en segundos; ``None`` no vence."""
+
+    compartido = False
+
+    def obtener(self, clave):
+        """Devuelve ``(True, valor)`` si la clave existe y no vencio, si no ``(False, None)``."""
+        raise NotImplementedError
+
+    def guardar(self, clave, valor, ttl=None):
+        raise NotImplementedError
+
+    def agregar(self, clave, valor, ttl=None):
+        """Guarda ``valor`` solo si la clave no existe; devuelve el valor vigente."""
+        raise NotImplementedError
+
+    def borrar(self, clave):
+        raise NotImplementedError
+
+    def borrar_prefijo(self, prefijo):
+        raise NotImplementedError
+
+    def contar_prefijo(self, prefijo):
+        raise NotImplementedError
+
+    def incrementar(self, clave):
+        """Suma 1 al contador ``clave`` (0 si no existe) y devuelve el nuevo valor."""
+        raise NotImplementedError
+
+
+def _expira(ttl):
+    return time.time() + ttl if ttl is not None else None
+
+
+class EstadoMemoria(EstadoCompartido):
+    def __init__(self, max_claves=MAX_CLAVES):
+        self.max_claves = max_claves
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def _vigente(self, clave):
+        entrada = self._datos.get(clave)
+        if entrada is not None and entrada[0] is not None and entrada[0] <= time.time():
+            del self._datos[clave]
+            return None
+        return entrada
+
+    def _purgar(self):
+        if len(self._datos) < self.max_claves:
+            return
+        ahora = time.time()
+        for clave in [k for k, (expira, _) in self._datos.items() if expira is not None and expira <= ahora]:
+            del self._datos[clave]
+        # Si sigue lleno se descartan las entradas de cache mas antiguas (orden de insercion).
+        sobrantes = len(self._datos) - self.max_claves + 1
+        if sobrantes > 0:
+            descartables = (k for k in self._datos if k.startswith(PREFIJO_DESCARTABLE))
+            for clave in [k for _, k in zip(range(sobrantes), descartables)]:
+                del self._datos[clave]
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._vigente(clave)
+            return (True, entrada[1]) if entrada is not None else (False, None)
+
+    def guardar(self, clave, valor, ttl=None):
+        with self._lock:
+            self._purgar()
+            self._datos[clave] = (_expira(ttl), valor)
+
+    def agregar(self, clave, valor, ttl=None):
+        with self._lock:
+            entrada = self._vigente(clave)
+            if entrada is not None:
+                return entrada[1]
+            self._purgar()
+            self._datos[clave] = (_expira(ttl), valor)
+            return valor
+
+    def borrar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def borrar_prefijo(self, prefijo):
+        with self._lock:
+            for clave in [k for k in self._datos if k.startswith(prefijo)]:
+                del self._datos[clave]
+
+    def contar_prefijo(self, prefijo):
+        with self._lock:
+            return sum(1 for k in self._datos if k.startswith(prefijo))
+
+    def incrementar(self, clave):
+        with self._lock:
+            entrada = self._vigente(clave)
+            valor = (entrada[1] if entrada is not None else 0) + 1
+            self._datos[clave] = (None, valor)
+            return valor
+
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS estado (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL,
+    expira REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_estado_expira ON estado (expira) WHERE expira IS NOT NULL;
+"""
+
+
+def _fin_prefijo(prefijo):
+    # Cota superior del rango de claves que empiezan con ``prefijo`` (usa la PK).
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+class EstadoSQLite(EstadoCompartido):
+    """Una conexion por proceso; WAL permite lectores concurrentes de varios procesos."""
+
+    compartido = True
+
+    def __init__(self, ruta, max_claves=MAX_CLAVES):
+        self.ruta = ruta
+        self.max_claves = max_claves
+        self.con = sqlite3.connect(ruta, check_same_thread=False, timeout=5, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(_ESQUEMA)
+        self.lock = threading.RLock()
+        self._escrituras = 0
+
+    def _purgar(self):
+        self._escrituras += 1
+        if self._escrituras % PURGAR_CADA:
+            return
+        self.con.execute("DELETE FROM estado WHERE expira <= ?", (time.time(),))
+        sobrantes = self.con.execute("SELECT COUNT(*) FROM estado").fetchone()[0] - self.max_claves
+        if sobrantes > 0:
+            self.con.execute(
+                "DELETE FROM estado WHERE clave IN (SELECT clave FROM estado WHERE clave >= ? AND clave < ? "
+                "ORDER BY expira LIMIT ?)",
+                (PREFIJO_DESCARTABLE, _fin_prefijo(PREFIJO_DESCARTABLE), sobrantes))
+
+    def obtener(self, clave):
+        with self.lock:
+            fila = self.con.execute(
+                "SELECT valor FROM estado WHERE clave = ? AND (expira IS NULL OR expira > ?)",
+                (clave, time.time())).fetchone()
+        return (True, json.loads(fila[0])) if fila is not None else (False, None)
+
+    def guardar(self, clave, valor, ttl=None):
+        texto = json.dumps(valor)
+        with self.lock:
+            self.con.execute("INSERT OR REPLACE INTO estado (clave, valor, expira) VALUES (?, ?, ?)",
+                             (clave, texto, _expira(ttl)))
+            self._purgar()
+
+    def agregar(self, clave, valor, ttl=None):
+        texto = json.dumps(valor)
+        with self.lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                self.con.execute("DELETE FROM estado WHERE clave = ? AND expira <= ?", (clave, time.time()))
+                self.con.execute("INSERT OR IGNORE INTO estado (clave, valor, expira) VALUES (?, ?, ?)",
+                                 (clave, texto, _expira(ttl)))
+                fila = self.con.execute("SELECT valor FROM estado WHERE clave = ?", (clave,)).fetchone()
+                self.con.execute("COMMIT")
+            except BaseException:
+                self.con.execute("ROLLBACK")
+                raise
+        return json.loads(fila[0])
+
+    def borrar(self, clave):
+        with self.lock:
+            self.con.execute("DELETE FROM estado WHERE clave = ?", (clave,))
+
+    def borrar_prefijo(self, prefijo):
+        with self.lock:
+            self.con.execute("DELETE FROM estado WHERE clave >= ? AND clave < ?", (prefijo, _fin_prefijo(prefijo)))
+
+    def contar_prefijo(self, prefijo):
+        with self.lock:
+            return self.con.execute(
+                "SELECT COUNT(*) FROM estado WHERE clave >= ? AND clave < ? AND (expira IS NULL OR expira > ?)",
+                (prefijo, _fin_prefijo(prefijo), time.time())).fetchone()[0]
+
+    def incrementar(self, clave):
+        with self.lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                fila = self.con.execute("SELECT valor FROM estado WHERE clave = ?", (clave,)).fetchone()
+                valor = (json.loads(fila[0]) if fila is not None else 0) + 1
+                self.con.execute("INSERT OR REPLACE INTO estado (clave, valor, expira) VALUES (?, ?, NULL)",
+                                 (clave, json.dumps(valor)))
+                self.con.execute("COMMIT")
+            except BaseException:
+                self.con.execute("ROLLBACK")
+                raise
+        return valor
+
+
+def crear_estado(ruta=None):
+    """``EstadoSQLite`` si hay ruta (o ``HAYLEX_ESTADO_COMPARTIDO``); si no, ``EstadoMemoria``."""
+    ruta = ruta or RUTA_ESTADO
+    return EstadoSQLite(ruta) if ruta else EstadoMemoria()
+
+
+class Borradores:
+    """Borrador del portal del ejecutivo (cliente elegido, tareas escritas, evidencia)."""
+
+    def __init__(self, estado, ttl=TTL_BORRADOR):
+        self.estado = estado
+        self.ttl = ttl
+
+    def obtener(self, ejecutivo):
+        return self.estado.obtener(f"borrador:{ejecutivo}")[1]
+
+    def guardar(self, ejecutivo, borrador):
+        self.estado.guardar(f"borrador:{ejecutivo}", borrador, self.ttl)
+
+    def borrar(self, ejecutivo):
+        self.estado.borrar(f"borrador:{ejecutivo}")
+
+
+# Estado unico del proceso.
+ESTADO = crear_estado()
+BORRADORES = Borradores(ESTADO)
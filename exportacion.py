@@ -0,0 +1,197 @@
+"""Exportacion en segundo plano de reportes de evaluacion.
+
+Un ``TrabajoExportacion`` recorre las tareas por paginas (``iterar_tareas``) y
+escribe el archivo a medida que avanza, asi que la memoria usada no depende del
+tamano del historial. Los trabajos corren en un grupo de hilos propio y
+publican su progreso para que la pestana METRICAS lo muestre.
+
+Formatos: CSV, Parquet (si ``pyarrow`` esta instalado) y un ZIP con un PDF por
+ejecutivo.
+"""
+import csv
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from documentos import PDF_AVAILABLE, bytes_pdf, nuevo_pdf, texto_pdf
+
+# --- IMPORTACIÓN PARA PARQUET ---
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DIR_EXPORTACIONES = os.getenv(
+    "HAYLEX_DIR_EXPORTACIONES", os.path.join(tempfile.gettempdir(), "haylex_exportaciones"))
+TRABAJADORES_EXPORTACION = int(os.getenv("HAYLEX_TRABAJADORES_EXPORTACION", "2"))
+MAX_PENDIENTES = 8      # trabajos en cola o en proceso a la vez
+MAX_TRABAJOS = 50       # trabajos terminados que se conservan (con su archivo)
+TAMANO_PAGINA = 1000
+
+COLUMNAS = ["id", "fecha", "ejecutivo", "cliente", "estado", "calificacion",
+            "notas_admin", "tareas", "evidencia_link"]
+
+EN_COLA, PROCESANDO, LISTO, ERROR = "En cola", "Procesando", "Listo", "Error"
+
+
+def _fila_exportable(tarea):
+    fila = {c: tarea.get(c) for c in COLUMNAS if c != "tareas"}
+    fila["tareas"] = " | ".join(tarea.get("tareas_json") or [])
+    return fila
+
+
+class TrabajoExportacion:
+    def __init__(self, formato, filtros):
+        self.id = uuid.uuid4().hex[:12]
+        self.formato = formato
+        self.filtros = filtros
+        self.estado = EN_COLA
+        self.procesadas = 0
+        self.total = 0
+        self.ruta = None
+        self.error = None
+        self.creado = time.time()
+
+    @property
+    def terminado(self):
+        return self.estado in (LISTO, ERROR)
+
+    @property
+    def progreso(self):
+        if self.estado == LISTO:
+            return 1.0
+        return min(self.procesadas / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def nombre_archivo(self):
+        return f"reporte_evaluaciones_{self.id}{FORMATOS[self.formato][0]}"
+
+    @property
+    def mime(self):
+        return FORMATOS[self.formato][1]
+
+
+def _exportar_csv(repo, trabajo):
+    with open(trabajo.ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUMNAS)
+        escritor.writeheader()
+        for tarea in repo.iterar_tareas(TAMANO_PAGINA, **trabajo.filtros):
+            escritor.writerow(_fila_exportable(tarea))
+            trabajo.procesadas += 1
+
+
+def _exportar_parquet(repo, trabajo):
+    esquema = pa.schema([
+        ("id", pa.int64()), ("fecha", pa.string()), ("ejecutivo", pa.string()),
+        ("cliente", pa.string()), ("estado", pa.string()), ("calificacion", pa.int64()),
+        ("notas_admin", pa.string()), ("tareas", pa.string()), ("evidencia_link", pa.string()),
+    ])
+    with pq.ParquetWriter(trabajo.ruta, esquema) as escritor:
+        lote = []
+        for tarea in repo.iterar_tareas(TAMANO_PAGINA, **trabajo.filtros):
+            lote.append(_fila_exportable(tarea))
+            if len(lote) == TAMANO_PAGINA:
+                escritor.write_table(pa.Table.from_pylist(lote, schema=esquema))
+                trabajo.procesadas += len(lote)
+                lote = []
+        if lote or not trabajo.procesadas:
+            escritor.write_table(pa.Table.from_pylist(lote, schema=esquema))
+            trabajo.procesadas += len(lote)
+
+
+def _exportar_pdf(repo, trabajo):
+    # Un PDF por ejecutivo: solo uno esta en memoria a la vez.
+    filtros = dict(trabajo.filtros)
+    metricas = repo.metricas_avance(filtros.get("desde"), filtros.get("hasta"), filtros.get("cliente"))
+    ejecutivos = [u["ejecutivo"] for u in metricas["por_usuario"]]
+    with zipfile.ZipFile(trabajo.ruta, "w", zipfile.ZIP_DEFLATED) as archivo:
+        for ejecutivo in ejecutivos:
+            pdf = nuevo_pdf()
+            pdf.set_font_size(16)
+            pdf.cell(0, 10, texto_pdf(f"Reporte de Evaluación - {ejecutivo}"), ln=True, align='C')
+            pdf.set_font_size(10)
+            suma, conteo = 0, 0
+            for tarea in repo.iterar_tareas(TAMANO_PAGINA, **dict(filtros, ejecutivo=ejecutivo)):
+                calificacion = tarea.get("calificacion") or 0
+                suma += calificacion
+                conteo += 1
+                pdf.multi_cell(0, 6, texto_pdf(
+                    f"{tarea.get('fecha')} | {tarea.get('cliente')} | {calificacion}% | "
+                    f"{tarea.get('notas_admin') or ''}"))
+                trabajo.procesadas += 1
+            if not conteo:
+                continue
+            pdf.ln(4)
+            pdf.set_font_size(12)
+            pdf.cell(0, 8, texto_pdf(f"Tareas evaluadas: {conteo} | Promedio: {suma / conteo:.1f}%"), ln=True)
+            archivo.writestr(f"reporte_{ejecutivo}.pdf", bytes_pdf(pdf))
+
+
+# formato -> (extension, mime, funcion, disponible)
+FORMATOS = OrderedDict([
+    ("CSV", (".csv", "text/csv", _exportar_csv, True)),
+    ("Parquet", (".parquet", "application/octet-stream", _exportar_parquet, PARQUET_AVAILABLE)),
+    ("PDF por ejecutivo", (".zip", "application/zip", _exportar_pdf, PDF_AVAILABLE)),
+])
+
+
+def formatos_disponibles():
+    return [nombre for nombre, (_, _, _, disponible) in FORMATOS.items() if disponible]
+
+
+class ExportacionesOcupadas(RuntimeError):
+    """Se alcanzo el maximo de exportaciones simultaneas."""
+
+
+class GestorExportaciones:
+    def __init__(self, trabajadores=TRABAJADORES_EXPORTACION, directorio=DIR_EXPORTACIONES):
+        self._pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="haylex-export")
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self.directorio = directorio
+
+    def lanzar(self, repo, formato, **filtros):
+        """Encola una exportacion de las tareas que cumplen ``filtros`` (ver ``pagina_tareas``)."""
+        trabajo = TrabajoExportacion(formato, filtros)
+        with self._lock:
+            pendientes = sum(1 for t in self._trabajos.values() if not t.terminado)
+            if pendientes >= MAX_PENDIENTES:
+                raise ExportacionesOcupadas("Hay demasiadas exportaciones en curso.")
+            self._trabajos[trabajo.id] = trabajo
+            self._purgar()
+        self._pool.submit(self._ejecutar, repo, trabajo)
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def _purgar(self):
+        terminados = [t for t in self._trabajos.values() if t.terminado]
+        for trabajo in terminados[:max(0, len(terminados) - MAX_TRABAJOS)]:
+            del self._trabajos[trabajo.id]
+            if trabajo.ruta and os.path.exists(trabajo.ruta):
+                os.remove(trabajo.ruta)
+
+    def _ejecutar(self, repo, trabajo):
+        trabajo.estado = PROCESANDO
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            trabajo.ruta = os.path.join(self.directorio, trabajo.nombre_archivo)
+            trabajo.total = repo.contar_tareas(**trabajo.filtros)
+            FORMATOS[trabajo.formato][2](repo, trabajo)
+            trabajo.estado = LISTO
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = ERROR
+
+
+# Gestor unico del proceso.
+EXPORTACIONES = GestorExportaciones()
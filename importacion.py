@@ -0,0 +1,198 @@
+"""Importacion masiva de clientes y usuarios desde CSV.
+
+El archivo se valida completo en memoria antes de escribir nada: cada fila
+valida se deduplica contra un indice (dict/set) de los nombres ya existentes y
+contra las filas anteriores del mismo archivo. Las filas validas se insertan por
+lotes (``crear_clientes`` / ``crear_usuarios``) y las demas quedan en un reporte
+de errores por linea que se puede descargar como CSV.
+
+Tambien valida la reasignacion masiva de ``ejecutivo_asignado``.
+"""
+import csv
+import io
+from collections import namedtuple
+
+MAX_BYTES_CSV = 5 * 2**20
+ROLES = ("user", "admin")
+
+# Nombres de columna aceptados -> nombre interno.
+ALIAS_COLUMNAS = {
+    "nombre_cliente": "nombre_cliente", "cliente": "nombre_cliente", "nombre": "nombre_cliente",
+    "ejecutivo_asignado": "ejecutivo_asignado", "ejecutivo": "ejecutivo_asignado",
+    "usuario": "usuario", "user": "usuario",
+    "clave": "clave", "pass": "clave", "password": "clave", "contraseña": "clave",
+    "rol": "rol",
+}
+COLUMNAS_CLIENTES = ("nombre_cliente", "ejecutivo_asignado")
+COLUMNAS_USUARIOS = ("usuario", "clave")
+
+ErrorFila = namedtuple("ErrorFila", ["linea", "valor", "motivo"])
+
+
+class CSVInvalido(ValueError):
+    """El archivo no se puede leer o le faltan columnas obligatorias."""
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.validas = []       # filas listas para escribir
+        self.existentes = []    # nombres que ya estaban en la base (se omiten)
+        self.errores = []       # ErrorFila
+        self.escritas = 0       # filas que la base acepto
+
+    @property
+    def total(self):
+        return len(self.validas) + len(self.existentes) + len(self.errores)
+
+
+def leer_csv(contenido, obligatorias):
+    """Filas del CSV (``bytes``) como dicts con columnas normalizadas y la linea de origen."""
+    if len(contenido) > MAX_BYTES_CSV:
+        raise CSVInvalido(f"El archivo supera {MAX_BYTES_CSV // 2**20} MB.")
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = contenido.decode("latin-1")
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(io.StringIO(texto), dialecto)
+    try:
+        encabezado = next(lector, None)
+        if not encabezado:
+            raise CSVInvalido("El archivo está vacío.")
+        columnas = [ALIAS_COLUMNAS.get(c.strip().lower(), c.strip().lower()) for c in encabezado]
+        faltantes = [c for c in obligatorias if c not in columnas]
+        if faltantes:
+            raise CSVInvalido(f"Faltan columnas: {', '.join(faltantes)}.")
+        filas = []
+        for linea, valores in enumerate(lector, start=2):
+            if not any(v.strip() for v in valores):
+                continue
+            fila = {c: v.strip() for c, v in zip(columnas, valores)}
+            fila["_linea"] = linea
+            filas.append(fila)
+    except csv.Error as e:
+        # Comillas sin cerrar, caracteres nulos, campos enormes: el archivo entero es invalido.
+        raise CSVInvalido(f"CSV mal formado cerca de la línea {lector.line_num}: {e}.") from None
+    return filas
+
+
+def validar_clientes(filas, usuarios, clientes):
+    """``usuarios``: nombres de ejecutivos existentes; ``clientes``: filas actuales de la tabla."""
+    usuarios = set(usuarios)
+    existentes = {c["nombre_cliente"] for c in clientes}
+    vistos = {}
+    resultado = ResultadoImportacion()
+    for fila in filas:
+        linea = fila["_linea"]
+        nombre = fila.get("nombre_cliente", "").upper()
+        ejecutivo = fila.get("ejecutivo_asignado", "").upper()
+        if not nombre:
+            resultado.errores.append(ErrorFila(linea, "", "Nombre de cliente vacío"))
+        elif nombre in vistos:
+            resultado.errores.append(ErrorFila(linea, nombre, f"Repetido en la línea {vistos[nombre]}"))
+        elif nombre in existentes:
+            resultado.existentes.append(nombre)
+        elif ejecutivo not in usuarios:
+            resultado.errores.append(ErrorFila(linea, nombre, f"Ejecutivo inexistente: '{ejecutivo}'"))
+        else:
+            resultado.validas.append((nombre, ejecutivo))
+        vistos.setdefault(nombre, linea)
+    return resultado
+
+
+def validar_usuarios(filas, usuarios, permitir_admin=False):
+    """``usuarios``: nombres existentes de cualquier rol.
+
+    Las filas con rol ``admin`` se rechazan salvo ``permitir_admin`` (confirmacion explicita).
+    """
+    existentes = set(usuarios)
+    vistos = {}
+    resultado = ResultadoImportacion()
+    for fila in filas:
+        linea = fila["_linea"]
+        usuario = fila.get("usuario", "").upper()
+        clave = fila.get("clave", "")
+        rol = (fila.get("rol") or "user").lower()
+        if not usuario:
+            resultado.errores.append(ErrorFila(linea, "", "Usuario vacío"))
+        elif usuario in vistos:
+            resultado.errores.append(ErrorFila(linea, usuario, f"Repetido en la línea {vistos[usuario]}"))
+        elif usuario in existentes:
+            resultado.existentes.append(usuario)
+        elif not clave:
+            resultado.errores.append(ErrorFila(linea, usuario, "Clave vacía"))
+        elif rol not in ROLES:
+            resultado.errores.append(ErrorFila(linea, usuario, f"Rol inválido: '{rol}'"))
+        elif rol == "admin" and not permitir_admin:
+            resultado.errores.append(ErrorFila(linea, usuario, "Rol admin sin confirmar"))
+        else:
+            resultado.validas.append((usuario, clave, rol))
+        vistos.setdefault(usuario, linea)
+    return resultado
+
+
+def validar_reasignaciones(filas, usuarios, clientes):
+    """``validas = [(cliente, ejecutivo)]``, una por fila a reasignar.
+
+    Los clientes que ya tienen ese ejecutivo se cuentan en ``existentes``.
+    """
+    usuarios = set(usuarios)
+    actuales = {c["nombre_cliente"]: c["ejecutivo_asignado"] for c in clientes}
+    vistos = {}
+    resultado = ResultadoImportacion()
+    for fila in filas:
+        linea = fila["_linea"]
+        nombre = fila.get("nombre_cliente", "").upper()
+        ejecutivo = fila.get("ejecutivo_asignado", "").upper()
+        if nombre in vistos:
+            resultado.errores.append(ErrorFila(linea, nombre, f"Repetido en la línea {vistos[nombre]}"))
+        elif nombre not in actuales:
+            resultado.errores.append(ErrorFila(linea, nombre, "Cliente inexistente"))
+        elif ejecutivo not in usuarios:
+            resultado.errores.append(ErrorFila(linea, nombre, f"Ejecutivo inexistente: '{ejecutivo}'"))
+        elif actuales[nombre] == ejecutivo:
+            resultado.existentes.append(nombre)
+        else:
+            resultado.validas.append((nombre, ejecutivo))
+        vistos.setdefault(nombre, linea)
+    return resultado
+
+
+def importar_clientes(repo, contenido):
+    usuarios = [u["usuario"] for u in repo.listar_usuarios("user")]
+    resultado = validar_clientes(leer_csv(contenido, COLUMNAS_CLIENTES), usuarios, repo.listar_clientes())
+    if resultado.validas:
+        resultado.escritas = repo.crear_clientes(resultado.validas)
+    return resultado
+
+
+def importar_usuarios(repo, contenido, permitir_admin=False):
+    usuarios = [u["usuario"] for rol in ROLES for u in repo.listar_usuarios(rol)]
+    resultado = validar_usuarios(leer_csv(contenido, COLUMNAS_USUARIOS), usuarios, permitir_admin)
+    if resultado.validas:
+        resultado.escritas = repo.crear_usuarios(resultado.validas)
+    return resultado
+
+
+def importar_reasignaciones(repo, contenido):
+    usuarios = [u["usuario"] for u in repo.listar_usuarios("user")]
+    resultado = validar_reasignaciones(leer_csv(contenido, COLUMNAS_CLIENTES), usuarios, repo.listar_clientes())
+    # Una escritura por ejecutivo destino.
+    por_ejecutivo = {}
+    for nombre, ejecutivo in resultado.validas:
+        por_ejecutivo.setdefault(ejecutivo, []).append(nombre)
+    for ejecutivo, nombres in por_ejecutivo.items():
+        resultado.escritas += repo.reasignar_clientes(nombres, ejecutivo)
+    return resultado
+
+
+def reporte_errores_csv(errores):
+    """Reporte descargable de las filas rechazadas."""
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(["linea", "valor", "motivo"])
+    escritor.writerows(errores)
+    return salida.getvalue().encode("utf-8-sig")
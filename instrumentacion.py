@@ -0,0 +1,285 @@
+"""Instrumentacion de consultas y secciones de HAYLEX CLOUD PRO.
+
+``RepositorioInstrumentado`` envuelve el backend (debajo de la cache, asi que
+solo cuenta consultas reales) y registra por llamada: metodo, tabla, filtros,
+filas, bytes aproximados (JSON) y latencia. ``tramo()`` mide secciones de la
+pagina. Todo se acumula en ``REGISTRO``, que ademas:
+
+- guarda lo ocurrido en la re-ejecucion actual de cada sesion (panel de
+  diagnostico del admin),
+- escribe en el log ``haylex.consultas_lentas`` las consultas que superan
+  ``UMBRAL_LENTA_MS`` (y en un archivo si se define ``HAYLEX_LOG_CONSULTAS_LENTAS``),
+- exporta contadores e histogramas en formato de texto de Prometheus, por
+  ``texto_prometheus()`` o por HTTP con ``iniciar_servidor_metricas()``.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import ESCRITURAS, LECTURAS
+from repositorio import Repositorio
+
+UMBRAL_LENTA_MS = float(os.getenv("HAYLEX_UMBRAL_CONSULTA_LENTA_MS", "500"))
+MAX_RECIENTES = 200
+MAX_FILTROS = 160
+# Filas que se serializan para estimar los bytes de un resultado largo.
+MUESTRA_BYTES = 20
+# /metrics solo escucha en la maquina local salvo que se indique otra interfaz.
+HOST_METRICAS = os.getenv("HAYLEX_HOST_METRICAS", "127.0.0.1")
+# Limites superiores (segundos) de las cubetas de los histogramas.
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Metodos que no pasan por la cache y por eso no figuran en LECTURAS/ESCRITURAS.
+TABLAS_EXTRA = {
+    "autenticar": "usuarios",
+    "credencial": "usuarios",
+    "pagina_tareas": "tareas",
+    "contar_tareas": "tareas",
+}
+# No se registran sus argumentos completos (contienen claves): metodo -> cuantos se conservan.
+METODOS_SENSIBLES = {"autenticar": 1, "crear_usuario": 1, "actualizar_clave": 1, "crear_usuarios": 0}
+
+log_lentas = logging.getLogger("haylex.consultas_lentas")
+if os.getenv("HAYLEX_LOG_CONSULTAS_LENTAS"):
+    _manejador = logging.FileHandler(os.getenv("HAYLEX_LOG_CONSULTAS_LENTAS"), encoding="utf-8")
+    _manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    log_lentas.addHandler(_manejador)
+    log_lentas.setLevel(logging.WARNING)
+
+
+def tabla_de(metodo):
+    if metodo in LECTURAS:
+        return LECTURAS[metodo]
+    if metodo in ESCRITURAS:
+        return ",".join(ESCRITURAS[metodo])
+    return TABLAS_EXTRA.get(metodo, "otras")
+
+
+def _filtros(metodo, args, kwargs):
+    if metodo in METODOS_SENSIBLES:
+        args, kwargs = args[:METODOS_SENSIBLES[metodo]], {}
+    partes = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in sorted(kwargs.items())]
+    texto = ", ".join(partes)
+    return texto if len(texto) <= MAX_FILTROS else texto[:MAX_FILTROS - 3] + "..."
+
+
+def _filas(resultado):
+    if resultado is None:
+        return 0
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, dict) and resultado and all(isinstance(v, list) for v in resultado.values()):
+        return sum(len(v) for v in resultado.values())
+    return 1
+
+
+def _bytes(resultado):
+    """Tamano JSON aproximado; en listas largas se serializa una muestra y se extrapola."""
+    if isinstance(resultado, dict) and resultado and all(isinstance(v, list) for v in resultado.values()):
+        return sum(_bytes(v) for v in resultado.values())
+    try:
+        if isinstance(resultado, list) and len(resultado) > MUESTRA_BYTES:
+            paso = len(resultado) / MUESTRA_BYTES
+            muestra = [resultado[int(i * paso)] for i in range(MUESTRA_BYTES)]
+            return round(len(json.dumps(muestra, default=str).encode("utf-8")) * paso)
+        return len(json.dumps(resultado, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Serie:
+    """Contador + histograma de latencias de una serie (metodo/tabla o seccion)."""
+
+    def __init__(self):
+        self.conteo = 0
+        self.errores = 0
+        self.segundos = 0.0
+        self.filas = 0
+        self.bytes = 0
+        self.cubetas = [0] * len(CUBETAS)
+
+    def agregar(self, segundos, filas=0, nbytes=0, error=False):
+        self.conteo += 1
+        self.errores += int(error)
+        self.segundos += segundos
+        self.filas += filas
+        self.bytes += nbytes
+        for i, limite in enumerate(CUBETAS):
+            if segundos <= limite:
+                self.cubetas[i] += 1
+                break
+
+
+class RegistroMetricas:
+    """Acumulado del proceso y detalle de la re-ejecucion actual (por contexto del script)."""
+
+    def __init__(self, max_recientes=MAX_RECIENTES):
+        self._lock = threading.Lock()
+        self._consultas = {}
+        self._tramos = {}
+        # Variable de contexto (no de hilo) para que las lecturas lanzadas con
+        # ``leer_en_paralelo`` se sumen a la re-ejecucion que las pidio.
+        self._rerun = contextvars.ContextVar("haylex_rerun", default=None)
+        self.recientes = deque(maxlen=max_recientes)
+
+    # --- RE-EJECUCION ACTUAL ---
+    def iniciar_rerun(self):
+        self._rerun.set({"consultas": [], "tramos": []})
+
+    def _del_rerun(self, clave):
+        rerun = self._rerun.get()
+        return rerun[clave] if rerun is not None else []
+
+    def consultas_del_rerun(self):
+        return list(self._del_rerun("consultas"))
+
+    def tramos_del_rerun(self):
+        return list(self._del_rerun("tramos"))
+
+    # --- REGISTRO ---
+    def registrar_consulta(self, metodo, tabla, filtros, filas, nbytes, segundos, error=None):
+        consulta = {
+            "metodo": metodo, "tabla": tabla, "filtros": filtros, "filas": filas,
+            "bytes": nbytes, "ms": segundos * 1000, "error": error,
+        }
+        with self._lock:
+            self._consultas.setdefault((metodo, tabla), _Serie()).agregar(segundos, filas, nbytes, error is not None)
+            self.recientes.append(consulta)
+        self._del_rerun("consultas").append(consulta)
+        if segundos * 1000 >= UMBRAL_LENTA_MS:
+            log_lentas.warning("%.1f ms %s[%s](%s) filas=%s bytes=%s",
+                               segundos * 1000, metodo, tabla, filtros, filas, nbytes)
+
+    def registrar_tramo(self, nombre, segundos):
+        with self._lock:
+            self._tramos.setdefault(nombre, _Serie()).agregar(segundos)
+        self._del_rerun("tramos").append({"seccion": nombre, "ms": segundos * 1000})
+
+    @contextmanager
+    def tramo(self, nombre):
+        """Mide el bloque como seccion ``nombre``: ``with REGISTRO.tramo("sidebar"): ...``."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tramo(nombre, time.perf_counter() - inicio)
+
+    # --- EXPORTACION ---
+    def texto_prometheus(self, cache=None):
+        """Metricas acumuladas en el formato de texto de Prometheus."""
+        with self._lock:
+            consultas = sorted(self._consultas.items())
+            tramos = sorted(self._tramos.items())
+        lineas = []
+
+        def serie_contador(nombre, ayuda, filas):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} counter")
+            lineas.extend(f"{nombre}{{{etiquetas}}} {valor}" for etiquetas, valor in filas)
+
+        def serie_histograma(nombre, ayuda, filas):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for etiquetas, serie in filas:
+                acumulado = 0
+                for limite, n in zip(CUBETAS, serie.cubetas):
+                    acumulado += n
+                    lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {serie.conteo}')
+                lineas.append(f"{nombre}_sum{{{etiquetas}}} {serie.segundos:.6f}")
+                lineas.append(f"{nombre}_count{{{etiquetas}}} {serie.conteo}")
+
+        etiquetadas = [(f'metodo="{m}",tabla="{t}"', s) for (m, t), s in consultas]
+        serie_contador("haylex_consultas_total", "Consultas al backend.", [(e, s.conteo) for e, s in etiquetadas])
+        serie_contador("haylex_consultas_errores_total", "Consultas al backend que fallaron.",
+                       [(e, s.errores) for e, s in etiquetadas])
+        serie_contador("haylex_consulta_filas_total", "Filas devueltas por el backend.",
+                       [(e, s.filas) for e, s in etiquetadas])
+        serie_contador("haylex_consulta_bytes_total", "Bytes (JSON aproximado) devueltos por el backend.",
+                       [(e, s.bytes) for e, s in etiquetadas])
+        serie_histograma("haylex_consulta_segundos", "Latencia de las consultas al backend.", etiquetadas)
+        serie_histograma("haylex_seccion_segundos", "Tiempo de render por seccion de la pagina.",
+                         [(f'seccion="{n}"', s) for n, s in tramos])
+        if cache is not None:
+            stats = cache.estadisticas()
+            serie_contador("haylex_cache_aciertos_total", "Lecturas servidas por la cache.", [("", stats["aciertos"])])
+            serie_contador("haylex_cache_fallos_total", "Lecturas que fueron al backend.", [("", stats["fallos"])])
+        return "\n".join(lineas).replace("{}", "") + "\n"
+
+
+class RepositorioInstrumentado:
+    """Envuelve un ``Repositorio`` midiendo cada llamada a sus metodos."""
+
+    def __init__(self, repo, registro):
+        self.repo = repo
+        self.registro = registro
+
+    def iterar_tareas(self, tamano_pagina=1000, **filtros):
+        # Usa la implementacion base para que cada pagina se mida por separado.
+        return Repositorio.iterar_tareas(self, tamano_pagina, **filtros)
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.repo, nombre)
+        if nombre.startswith("_") or not callable(metodo):
+            return metodo
+        tabla = tabla_de(nombre)
+
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                resultado = metodo(*args, **kwargs)
+            except Exception as e:
+                self.registro.registrar_consulta(nombre, tabla, _filtros(nombre, args, kwargs), 0, 0,
+                                                 time.perf_counter() - inicio, error=type(e).__name__)
+                raise
+            segundos = time.perf_counter() - inicio
+            self.registro.registrar_consulta(nombre, tabla, _filtros(nombre, args, kwargs),
+                                             _filas(resultado), _bytes(resultado), segundos)
+            return resultado
+        return medido
+
+
+# Registro unico del proceso.
+REGISTRO = RegistroMetricas()
+tramo = REGISTRO.tramo
+
+
+# --- EXPOSICION HTTP PARA PROMETHEUS ---
+_servidor = None
+_lock_servidor = threading.Lock()
+
+
+def iniciar_servidor_metricas(puerto, cache=None, host=HOST_METRICAS):
+    """Sirve ``/metrics`` en ``host:puerto`` (una vez por proceso) desde un hilo aparte.
+
+    No tiene autenticacion: por defecto solo escucha en ``127.0.0.1``
+    (``HAYLEX_HOST_METRICAS`` para exponerlo a un Prometheus en otra maquina).
+    """
+    global _servidor
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = REGISTRO.texto_prometheus(cache).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    with _lock_servidor:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer((host, int(puerto)), Manejador)
+            threading.Thread(target=_servidor.serve_forever, daemon=True, name="haylex-metricas").start()
+    return _servidor
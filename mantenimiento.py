@@ -0,0 +1,50 @@
+"""Tareas de mantenimiento de HAYLEX CLOUD PRO por linea de comandos.
+
+Uso:
+    python mantenimiento.py rollup [--backend sqlite|supabase]
+    python mantenimiento.py migrar [--backend sqlite|supabase]
+    python mantenimiento.py claves [--backend sqlite|supabase]
+
+- ``rollup``: recalcula ``metricas_rollup`` desde las tareas Finalizadas
+  (backfill inicial o reparacion tras cambios manuales en la base).
+- ``migrar``: pasa las tareas antiguas a fecha ISO y arreglo JSON de tareas.
+  En Supabase el cambio se hace con ``sql/supabase_migracion_tareas.sql``.
+- ``claves``: pasa a hash las claves de ``usuarios`` que siguen en texto plano.
+"""
+import argparse
+
+from repositorio import crear_repositorio
+
+
+def cmd_rollup(repo, args):
+    repo.reconstruir_rollup()
+    print("✅ metricas_rollup reconstruido.")
+
+
+def cmd_migrar(repo, args):
+    n = repo.migrar_tareas()
+    print(f"✅ {n} tareas migradas.")
+
+
+def cmd_claves(repo, args):
+    n = repo.migrar_claves()
+    print(f"✅ {n} claves pasadas a hash.")
+
+
+COMANDOS = {
+    "rollup": cmd_rollup,
+    "migrar": cmd_migrar,
+    "claves": cmd_claves,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de HAYLEX CLOUD PRO")
+    parser.add_argument("comando", choices=list(COMANDOS))
+    parser.add_argument("--backend", default=None, help="sqlite o supabase (por defecto HAYLEX_BACKEND)")
+    args = parser.parse_args(argv)
+    COMANDOS[args.comando](crear_repositorio(args.backend), args)
+
+
+if __name__ == "__main__":
+    main()
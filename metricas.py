@@ -0,0 +1,91 @@
+"""Construccion del tablero METRICAS.
+
+Todo el recorrido filtros -> agregados -> figuras se memoiza por
+(version de ``tareas``, cliente, desde, hasta). Mientras nadie evalue tareas,
+volver a la pestana o tocar otros widgets reutiliza las figuras ya armadas
+(como dicts JSON de Plotly) sin consultar ni recalcular nada.
+"""
+from datetime import date, timedelta
+
+import pandas as pd
+import plotly.express as px
+
+from cache import TTL_POR_TABLA, CacheConsultas
+
+# Ventanas rapidas del filtro de fechas: nombre -> dias hacia atras (incluye hoy).
+VENTANAS = {
+    "Últimos 7 días": 7,
+    "Últimos 30 días": 30,
+    "Últimos 90 días": 90,
+}
+VENTANA_SEMANAS_ISO = "Semanas ISO"
+VENTANA_PERSONALIZADA = "Personalizado"
+
+
+def rango_ultimos_dias(dias, hoy=None):
+    hoy = hoy or date.today()
+    return hoy - timedelta(days=dias - 1), hoy
+
+
+def rango_semanas_iso(anio, semana_desde, semana_hasta=None):
+    """Del lunes de ``semana_desde`` al domingo de ``semana_hasta`` (semanas ISO de ``anio``)."""
+    semana_hasta = semana_hasta or semana_desde
+    return date.fromisocalendar(anio, semana_desde, 1), date.fromisocalendar(anio, semana_hasta, 7)
+
+
+# Pocas combinaciones de filtros por version de datos; el TTL cubre cambios de otros procesos.
+FIGURAS = CacheConsultas(max_entradas=64)
+
+
+def _figuras(df_usuario, df_equipo, tendencia):
+    fig_user = px.bar(df_usuario, x='Promedio (%)', y='ejecutivo', orientation='h', title='Rendimiento Individual', color='Promedio (%)', color_continuous_scale='Blues', text='Promedio (%)')
+    fig_user.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+    fig_user.update_layout(yaxis={'categoryorder': 'total ascending'})
+
+    fig_team = px.pie(df_equipo, values='Promedio Equipo (%)', names='cliente', title='Rendimiento por Cliente / Proyecto', hole=0.4)
+
+    fig_trend = None
+    if len(tendencia) > 1:
+        fig_trend = px.line(tendencia, x='semana', y='calificacion', title='Tendencia de Calificaciones en el Tiempo', markers=True)
+        fig_trend.update_yaxes(range=[0, 100])
+
+    return {
+        "usuario": fig_user.to_dict(),
+        "equipo": fig_team.to_dict(),
+        "tendencia": fig_trend.to_dict() if fig_trend is not None else None,
+    }
+
+
+def _armar_tablero(repo, cliente, desde, hasta):
+    metricas = repo.metricas_avance(desde, hasta, cliente)
+    df_avance = pd.DataFrame(metricas["avance"])
+    if df_avance.empty:
+        return None
+
+    df_usuario = pd.DataFrame(metricas["por_usuario"]).rename(columns={'promedio': 'Promedio (%)', 'tareas': 'Tareas'})
+    df_equipo = pd.DataFrame(metricas["por_cliente"]).rename(columns={'promedio': 'Promedio Equipo (%)', 'miembros': 'Miembros'})
+    tendencia = pd.DataFrame(metricas["tendencia"])
+
+    return {
+        "df_usuario": df_usuario,
+        "df_equipo": df_equipo,
+        "promedio_general": float(df_avance['promedio_usuario'].mean()),
+        "total_usuarios": int(df_avance['ejecutivo'].nunique()),
+        "total_clientes": int(df_avance['cliente'].nunique()),
+        "figuras": _figuras(df_usuario, df_equipo, tendencia),
+    }
+
+
+def tablero(repo, version, cliente=None, desde=None, hasta=None):
+    """Datos y figuras del tablero, o ``None`` si no hay evaluaciones en el periodo.
+
+    ``version`` debe cambiar cuando cambian las evaluaciones (``CACHE.version("metricas_rollup")``).
+    El resultado se comparte entre sesiones: no modificarlo en sitio.
+    """
+    clave = ("metricas_rollup", version, cliente, desde, hasta)
+    encontrado, valor = FIGURAS.obtener(clave)
+    if encontrado:
+        return valor
+    valor = _armar_tablero(repo, cliente, desde, hasta)
+    FIGURAS.guardar(clave, valor, TTL_POR_TABLA["metricas_rollup"])
+    return valor
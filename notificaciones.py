@@ -0,0 +1,132 @@
+"""Notificaciones de cambios en mensajes y tareas.
+
+``BUS`` es un pub/sub en memoria, compartido por todas las sesiones del
+proceso. Lo alimentan:
+
+- En modo Supabase, un hilo suscrito a Supabase Realtime (inserciones y
+  actualizaciones de ``mensajes`` y ``tareas``).
+- En modo SQLite, el propio ``RepositorioSQLite`` al escribir.
+
+Las sesiones guardan la ultima ``secuencia`` vista y, desde un fragmento con
+``run_every``, preguntan por eventos nuevos sin tocar la base de datos.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque, namedtuple
+
+# --- IMPORTACIÓN PARA SUPABASE REALTIME ---
+try:
+    from supabase import acreate_client
+    REALTIME_AVAILABLE = True
+except ImportError:
+    REALTIME_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+INTERVALO_NOTIFICACIONES = os.getenv("HAYLEX_INTERVALO_NOTIFICACIONES", "3s")
+MAX_EVENTOS = 1000
+
+Evento = namedtuple("Evento", ["secuencia", "tabla", "tipo", "fila"])
+
+
+class BusEventos:
+    """Registro acotado de eventos recientes con numero de secuencia creciente."""
+
+    def __init__(self, max_eventos=MAX_EVENTOS):
+        self._eventos = deque(maxlen=max_eventos)
+        self._suscriptores = {}
+        self._lock = threading.Lock()
+        self.secuencia = 0
+
+    def publicar(self, tabla, tipo, fila):
+        with self._lock:
+            self.secuencia += 1
+            evento = Evento(self.secuencia, tabla, tipo, dict(fila or {}))
+            self._eventos.append(evento)
+            suscriptores = list(self._suscriptores.values())
+        for funcion in suscriptores:
+            try:
+                funcion(evento)
+            except Exception:
+                log.exception("Error en suscriptor de notificaciones")
+        return evento
+
+    def eventos_desde(self, secuencia, tabla=None):
+        """Eventos con secuencia mayor a ``secuencia`` (opcionalmente de una tabla)."""
+        with self._lock:
+            return [e for e in self._eventos
+                    if e.secuencia > secuencia and (tabla is None or e.tabla == tabla)]
+
+    def suscribir(self, nombre, funcion):
+        """Registra ``funcion(evento)``; un mismo ``nombre`` reemplaza al anterior."""
+        with self._lock:
+            self._suscriptores[nombre] = funcion
+
+
+# Bus unico del proceso.
+BUS = BusEventos()
+
+
+# --- SUPABASE REALTIME ---
+_hilo_realtime = None
+_lock_realtime = threading.Lock()
+
+
+def enviada_a_revision(evento):
+    """La tarea paso a Revision en este evento (no un guardado de una que ya lo estaba)."""
+    return (evento.tabla == "tareas" and evento.fila.get("estado") == "Revision"
+            and evento.fila.get("estado_anterior") != "Revision")
+
+
+def _publicar_cambio(tabla, payload):
+    datos = payload.get("data", payload)
+    fila = dict(datos.get("record") or datos.get("new") or {})
+    # Con REPLICA IDENTITY FULL (sql/supabase_realtime.sql) llega la fila anterior completa.
+    anterior = datos.get("old_record") or datos.get("old") or {}
+    if "estado" in anterior:
+        fila["estado_anterior"] = anterior["estado"]
+    tipo = datos.get("type") or datos.get("eventType") or "UPDATE"
+    BUS.publicar(tabla, str(tipo).upper(), fila)
+
+
+async def _escuchar(url, key):
+    cliente = await acreate_client(url, key)
+    canal = cliente.channel("haylex-cambios")
+    canal.on_postgres_changes("INSERT", schema="public", table="mensajes",
+                              callback=lambda p: _publicar_cambio("mensajes", p))
+    canal.on_postgres_changes("*", schema="public", table="tareas",
+                              callback=lambda p: _publicar_cambio("tareas", p))
+    await canal.subscribe()
+    # Segun la version de realtime-py la escucha es explicita o ya corre en segundo plano.
+    escuchar = getattr(cliente.realtime, "listen", None)
+    if escuchar is not None:
+        await escuchar()
+    else:
+        await asyncio.Event().wait()
+
+
+def _correr_realtime(url, key):
+    espera = 1
+    while True:
+        try:
+            asyncio.run(_escuchar(url, key))
+            espera = 1
+        except Exception:
+            log.exception("Conexion Realtime perdida; reintentando en %ss", espera)
+        threading.Event().wait(espera)
+        espera = min(espera * 2, 60)
+
+
+def iniciar_realtime(url, key):
+    """Arranca (una vez por proceso) el hilo suscrito a Supabase Realtime."""
+    global _hilo_realtime
+    if not REALTIME_AVAILABLE:
+        return False
+    with _lock_realtime:
+        if _hilo_realtime is None:
+            _hilo_realtime = threading.Thread(
+                target=_correr_realtime, args=(url, key), daemon=True, name="haylex-realtime")
+            _hilo_realtime.start()
+    return True
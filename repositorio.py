@@ -0,0 +1,1124 @@
+"""Capa de acceso a datos de HAYLEX CLOUD PRO.
+
+Todas las pantallas de agenda.py consultan a traves de un ``Repositorio``.
+Existen dos implementaciones con la misma interfaz:
+
+- ``RepositorioSupabase``: la base en la nube (comportamiento original).
+- ``RepositorioSQLite``: la base local ``haylex_data.db`` para trabajar sin
+  conexion, hacer pruebas de carga o despliegues pequenos.
+
+Se elige con la variable de entorno ``HAYLEX_BACKEND`` ("supabase" o "sqlite").
+"""
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from credenciales import autenticar, es_hash, hashear, hashear_varias
+from notificaciones import BUS
+
+# --- IMPORTACIÓN PARA SUPABASE ---
+try:
+    from supabase import create_client
+    SUPABASE_AVAILABLE = True
+except ImportError:
+    SUPABASE_AVAILABLE = False
+
+DB_PATH = os.getenv("HAYLEX_DB_PATH", "haylex_data.db")
+LECTURAS_PARALELAS = int(os.getenv("HAYLEX_LECTURAS_PARALELAS", "8"))
+LOTE_ESCRITURA = 500  # filas por sentencia en altas y cambios masivos
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS usuarios (usuario TEXT PRIMARY KEY, pass TEXT, rol TEXT);
+CREATE TABLE IF NOT EXISTS clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre_cliente TEXT UNIQUE, ejecutivo_asignado TEXT);
+CREATE INDEX IF NOT EXISTS idx_clientes_ejecutivo_asignado ON clientes (ejecutivo_asignado);
+CREATE TABLE IF NOT EXISTS tareas
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, fecha TEXT, ejecutivo TEXT, cliente TEXT,
+                  tareas_json TEXT, evidencia_link TEXT, notas_ejecutivo TEXT, notas_admin TEXT,
+                  calificacion INTEGER, estado TEXT);
+CREATE TABLE IF NOT EXISTS mensajes
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  remitente TEXT, destinatario TEXT,
+                  mensaje TEXT, fecha TEXT, leido INTEGER DEFAULT 0);
+CREATE INDEX IF NOT EXISTS idx_mensajes_destinatario_leido ON mensajes (destinatario, leido);
+CREATE INDEX IF NOT EXISTS idx_mensajes_destinatario_id ON mensajes (destinatario, id);
+CREATE INDEX IF NOT EXISTS idx_mensajes_remitente_id ON mensajes (remitente, id);
+CREATE VIEW IF NOT EXISTS vista_avance AS
+                SELECT
+                    ejecutivo,
+                    cliente,
+                    AVG(CAST(calificacion AS REAL)) as promedio_usuario,
+                    COUNT(*) as tareas_evaluadas,
+                    MAX(fecha) as ultima_evaluacion
+                FROM tareas
+                WHERE estado = 'Finalizado' AND calificacion IS NOT NULL
+                GROUP BY ejecutivo, cliente;
+DROP VIEW IF EXISTS vista_avance_fechas;
+CREATE VIEW vista_avance_fechas AS
+                SELECT
+                    id,
+                    ejecutivo,
+                    cliente,
+                    CAST(calificacion AS REAL) as calificacion,
+                    fecha as fecha_dia,
+                    date(fecha, 'weekday 0', '-6 days') as semana
+                FROM tareas
+                WHERE estado = 'Finalizado' AND calificacion IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_tareas_ejecutivo_cliente_estado ON tareas (ejecutivo, cliente, estado);
+CREATE INDEX IF NOT EXISTS idx_tareas_fecha ON tareas (fecha);
+CREATE INDEX IF NOT EXISTS idx_tareas_estado_id ON tareas (estado, id);
+CREATE INDEX IF NOT EXISTS idx_tareas_ejecutivo_id ON tareas (ejecutivo, id);
+CREATE TABLE IF NOT EXISTS metricas_rollup
+                 (ejecutivo TEXT NOT NULL, cliente TEXT NOT NULL, dia TEXT NOT NULL, semana TEXT NOT NULL,
+                  suma_calificacion REAL NOT NULL DEFAULT 0, conteo INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (ejecutivo, cliente, dia));
+CREATE INDEX IF NOT EXISTS idx_metricas_rollup_dia ON metricas_rollup (dia, cliente);
+"""
+
+# tareas.fecha se guarda como fecha ISO (aaaa-mm-dd) y tareas.tareas_json como
+# arreglo JSON. Las filas antiguas usaban dd/mm/aaaa y textos unidos con '||'.
+FORMATO_FECHA_ANTIGUO = "%d/%m/%Y"
+SEPARADOR_ANTIGUO = "||"
+
+
+def items_a_json(items):
+    return json.dumps([str(t) for t in items], ensure_ascii=False)
+
+
+def items_de_fila(valor):
+    """Lista de tareas de una fila; acepta el formato antiguo 'a||b'.
+
+    Un texto antiguo tambien puede empezar con '[' ('[URGENTE] llamar||enviar'):
+    solo se toma como JSON si es un arreglo valido.
+    """
+    if not valor:
+        return []
+    if isinstance(valor, list):
+        return valor
+    if valor.startswith("["):
+        try:
+            items = json.loads(valor)
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            return items
+    return valor.split(SEPARADOR_ANTIGUO)
+
+
+def fecha_a_iso(valor):
+    """Convierte 'dd/mm/aaaa' a 'aaaa-mm-dd'; deja intactos los valores ya migrados."""
+    try:
+        return datetime.strptime(valor, FORMATO_FECHA_ANTIGUO).date().isoformat()
+    except (TypeError, ValueError):
+        return valor
+
+
+def _lotes(filas, tamano=LOTE_ESCRITURA):
+    filas = list(filas)
+    for i in range(0, len(filas), tamano):
+        yield filas[i:i + tamano]
+
+
+def patron_contiene(texto):
+    """Patron LIKE/ILIKE (escape ``\\``) para buscar ``texto`` en cualquier posicion."""
+    texto = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{texto}%"
+
+
+# Columnas que muestra HISTORIAL.
+COLUMNAS_HISTORIAL = "id, fecha, cliente, estado, calificacion, notas_admin, evidencia_link"
+
+
+def _resumen(tendencia, por_estado):
+    evaluadas = sum(t["tareas"] for t in tendencia)
+    suma = sum(t["calificacion"] * t["tareas"] for t in tendencia)
+    return {
+        "promedio": suma / evaluadas if evaluadas else None,
+        "evaluadas": evaluadas,
+        "por_estado": por_estado,
+        "tendencia": tendencia,
+    }
+
+
+def _normalizar_tarea(fila):
+    if fila is not None:
+        fila["tareas_json"] = items_de_fila(fila.get("tareas_json"))
+    return fila
+
+
+# Acumula una tarea recien evaluada en su celda (ejecutivo, cliente, dia).
+SQL_ACUMULAR_ROLLUP = """
+    INSERT INTO metricas_rollup (ejecutivo, cliente, dia, semana, suma_calificacion, conteo)
+    SELECT ejecutivo, cliente, fecha_dia, semana, calificacion, 1
+    FROM vista_avance_fechas WHERE id = ?
+    ON CONFLICT (ejecutivo, cliente, dia) DO UPDATE SET
+        suma_calificacion = suma_calificacion + excluded.suma_calificacion,
+        conteo = conteo + 1
+"""
+SQL_RECONSTRUIR_ROLLUP = """
+    INSERT INTO metricas_rollup (ejecutivo, cliente, dia, semana, suma_calificacion, conteo)
+    SELECT ejecutivo, cliente, fecha_dia, semana, SUM(calificacion), COUNT(*)
+    FROM vista_avance_fechas
+    GROUP BY ejecutivo, cliente, fecha_dia
+"""
+
+# Agregados del tablero METRICAS sobre metricas_rollup. La ventana de fechas se
+# aplica sobre ``dia`` (indexado) antes de agregar. Equivalen a la
+# funcion metricas_avance() de sql/supabase_metricas.sql.
+_FILTRO_METRICAS = "WHERE dia BETWEEN :desde AND :hasta AND (:cliente IS NULL OR cliente = :cliente)"
+_SQL_AVANCE = f"""
+    SELECT ejecutivo, cliente,
+           SUM(suma_calificacion) / SUM(conteo) as promedio_usuario,
+           SUM(conteo) as tareas_evaluadas,
+           MAX(dia) as ultima_evaluacion
+    FROM metricas_rollup {_FILTRO_METRICAS}
+    GROUP BY ejecutivo, cliente
+"""
+SQL_METRICAS = {
+    "avance": _SQL_AVANCE,
+    "por_usuario": f"""
+        SELECT ejecutivo, ROUND(AVG(promedio_usuario), 2) as promedio, SUM(tareas_evaluadas) as tareas
+        FROM ({_SQL_AVANCE}) GROUP BY ejecutivo ORDER BY promedio DESC
+    """,
+    "por_cliente": f"""
+        SELECT cliente, ROUND(AVG(promedio_usuario), 2) as promedio, COUNT(ejecutivo) as miembros
+        FROM ({_SQL_AVANCE}) GROUP BY cliente ORDER BY cliente
+    """,
+    "tendencia": f"""
+        SELECT semana, SUM(suma_calificacion) / SUM(conteo) as calificacion
+        FROM metricas_rollup {_FILTRO_METRICAS}
+        GROUP BY semana ORDER BY semana
+    """,
+}
+
+
+class Repositorio:
+    """Interfaz comun de acceso a datos. Todas las lecturas devuelven listas de dicts."""
+
+    # ``True`` si varias lecturas pueden avanzar a la vez (ver ``leer_en_paralelo``).
+    lecturas_concurrentes = False
+
+    # --- USUARIOS ---
+    def obtener_usuario(self, usuario):
+        """``usuario`` y ``rol`` (sin ``pass``, para que el hash no llegue a la cache)."""
+        raise NotImplementedError
+
+    def credencial(self, usuario):
+        """Fila con el hash de ``pass``; no se cachea (solo para el ingreso)."""
+        raise NotImplementedError
+
+    def autenticar(self, usuario, clave):
+        """Busca por ``usuario`` y verifica el hash localmente (ver credenciales.py)."""
+        return autenticar(self, usuario, clave)
+
+    def listar_usuarios(self, rol="user"):
+        """Usuarios de ``rol`` sin la columna ``pass``."""
+        raise NotImplementedError
+
+    def crear_usuario(self, usuario, clave, rol="user"):
+        """``clave`` en texto plano: se guarda su hash."""
+        raise NotImplementedError
+
+    def actualizar_clave(self, usuario, clave):
+        """``clave`` en texto plano: se guarda su hash."""
+        raise NotImplementedError
+
+    def migrar_claves(self):
+        """Pasa a hash las claves guardadas en texto plano. Devuelve cuantas cambiaron."""
+        raise NotImplementedError
+
+    def borrar_usuario(self, usuario):
+        raise NotImplementedError
+
+    def buscar_usuarios(self, texto=None, rol="user", despues_de=None, limite=25):
+        """Pagina de usuarios de ``rol`` cuyo nombre contiene ``texto``.
+
+        Orden por ``usuario``; ``despues_de`` es el ultimo usuario de la pagina anterior.
+        """
+        raise NotImplementedError
+
+    def contar_usuarios(self, texto=None, rol="user"):
+        raise NotImplementedError
+
+    def crear_usuarios(self, filas):
+        """Alta masiva de ``[(usuario, clave, rol)]`` por lotes. Omite los existentes; devuelve cuantos creo."""
+        raise NotImplementedError
+
+    # --- CLIENTES ---
+    def listar_clientes(self, ejecutivo=None):
+        raise NotImplementedError
+
+    def crear_cliente(self, nombre_cliente, ejecutivo_asignado):
+        raise NotImplementedError
+
+    def actualizar_cliente(self, cliente_id, nombre_cliente, ejecutivo_asignado):
+        raise NotImplementedError
+
+    def borrar_cliente(self, cliente_id):
+        raise NotImplementedError
+
+    def buscar_clientes(self, texto=None, despues_de_id=None, limite=25):
+        """Pagina de clientes cuyo nombre contiene ``texto``, ordenada por id (paginacion por clave)."""
+        raise NotImplementedError
+
+    def contar_clientes(self, texto=None):
+        raise NotImplementedError
+
+    def crear_clientes(self, filas):
+        """Alta masiva de ``[(nombre_cliente, ejecutivo_asignado)]`` por lotes. Omite los existentes."""
+        raise NotImplementedError
+
+    def reasignar_clientes(self, nombres, ejecutivo_asignado):
+        """Asigna ``ejecutivo_asignado`` a todos los clientes de ``nombres``. Devuelve cuantos cambio."""
+        raise NotImplementedError
+
+    # --- TAREAS ---
+    def listar_tareas(self, estado=None, ejecutivo=None):
+        raise NotImplementedError
+
+    def pagina_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None,
+                      despues_de_id=None, limite=1000):
+        """Pagina de tareas por id ascendente; ``desde``/``hasta`` filtran por fecha."""
+        raise NotImplementedError
+
+    def contar_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None):
+        raise NotImplementedError
+
+    def historial_ejecutivo(self, ejecutivo, antes_de_id=None, limite=20):
+        """Pagina del historial de ``ejecutivo`` (id descendente, ``COLUMNAS_HISTORIAL``)."""
+        raise NotImplementedError
+
+    def resumen_ejecutivo(self, ejecutivo):
+        """Promedio, tareas por estado y tendencia semanal de ``ejecutivo``.
+
+        Sale de ``metricas_rollup`` y de un conteo por indice: no lee las filas de
+        tareas. Devuelve ``{"promedio", "evaluadas", "por_estado", "tendencia"}``.
+        """
+        raise NotImplementedError
+
+    def iterar_tareas(self, tamano_pagina=1000, **filtros):
+        """Recorre todas las tareas que cumplen ``filtros`` pagina a pagina, sin cargarlas juntas."""
+        despues_de_id = None
+        while True:
+            pagina = self.pagina_tareas(despues_de_id=despues_de_id, limite=tamano_pagina, **filtros)
+            yield from pagina
+            if len(pagina) < tamano_pagina:
+                return
+            despues_de_id = pagina[-1]["id"]
+
+    def obtener_tarea_activa(self, ejecutivo, cliente):
+        raise NotImplementedError
+
+    def crear_tarea(self, datos):
+        """``datos['tareas_json']`` es una lista de textos y ``datos['fecha']`` una fecha ISO."""
+        raise NotImplementedError
+
+    def actualizar_tarea(self, tarea_id, datos):
+        raise NotImplementedError
+
+    def guardar_borradores(self, borradores):
+        """Upsert por lote de la tarea activa de cada ``(ejecutivo, cliente)``.
+
+        Cada borrador es un dict con ``ejecutivo``, ``cliente``, ``tareas_json``,
+        ``evidencia_link``, ``fecha`` y opcionalmente ``estado`` (si falta se
+        conserva el de la tarea; las nuevas quedan "En progreso"). Devuelve
+        cuantos escribio.
+        """
+        raise NotImplementedError
+
+    def evaluar_tarea(self, tarea_id, notas_admin, calificacion):
+        """Finaliza la tarea y acumula su calificacion en ``metricas_rollup``."""
+        raise NotImplementedError
+
+    def evaluar_tareas(self, evaluaciones):
+        """Como ``evaluar_tarea`` para una lista de ``(id, notas_admin, calificacion)`` en un solo viaje."""
+        raise NotImplementedError
+
+    def cola_revision(self, ejecutivo=None, cliente=None, despues_de_id=None, limite=20):
+        """Tareas en Revision ordenadas por id, a partir de ``despues_de_id`` (paginacion por clave)."""
+        raise NotImplementedError
+
+    def contar_revision(self, ejecutivo=None, cliente=None):
+        raise NotImplementedError
+
+    def vista_avance(self):
+        raise NotImplementedError
+
+    def clientes_evaluados(self):
+        """Nombres de cliente con al menos una tarea Finalizada."""
+        raise NotImplementedError
+
+    def metricas_avance(self, desde=None, hasta=None, cliente=None):
+        """Agregados del tablero filtrados en la base de datos.
+
+        Devuelve un dict con las listas ``avance`` (por ejecutivo y cliente),
+        ``por_usuario``, ``por_cliente`` y ``tendencia`` (semanal).
+        """
+        raise NotImplementedError
+
+    def reconstruir_rollup(self):
+        """Recalcula ``metricas_rollup`` desde cero a partir de las tareas Finalizadas."""
+        raise NotImplementedError
+
+    def migrar_tareas(self):
+        """Convierte filas antiguas (fecha dd/mm/aaaa, tareas 'a||b'). Devuelve cuantas cambiaron."""
+        raise NotImplementedError
+
+    # --- MENSAJES ---
+    def enviar_mensaje(self, remitente, destinatario, mensaje, fecha):
+        raise NotImplementedError
+
+    def mensajes_nuevos(self, usuario, despues_de_id=None, limite=20):
+        """Mensajes enviados o recibidos por ``usuario`` con id mayor a ``despues_de_id``.
+
+        Sin ``despues_de_id`` devuelve los ``limite`` mas recientes. Orden: id descendente.
+        """
+        raise NotImplementedError
+
+    def mensajes_anteriores(self, usuario, antes_de_id, limite=20):
+        """Pagina de historial con id menor a ``antes_de_id``, id descendente."""
+        raise NotImplementedError
+
+    def contar_no_leidos(self, usuario):
+        raise NotImplementedError
+
+    def marcar_leidos(self, ids):
+        """Marca como leidos todos los ``ids`` en una sola actualizacion."""
+        raise NotImplementedError
+
+    # --- MANTENIMIENTO ---
+    def reiniciar(self):
+        raise NotImplementedError
+
+
+class RepositorioSupabase(Repositorio):
+    """Implementacion sobre el cliente de Supabase."""
+
+    # Cada lectura es una peticion HTTP independiente.
+    lecturas_concurrentes = True
+
+    def __init__(self, url, key):
+        if not SUPABASE_AVAILABLE:
+            raise RuntimeError("El paquete 'supabase' no esta instalado.")
+        self.cliente = create_client(url, key)
+
+    def _t(self, tabla):
+        return self.cliente.table(tabla)
+
+    def obtener_usuario(self, usuario):
+        res = self._t("usuarios").select("usuario, rol").eq("usuario", usuario).execute()
+        return res.data[0] if res.data else None
+
+    def credencial(self, usuario):
+        res = self._t("usuarios").select("usuario, pass, rol").eq("usuario", usuario).execute()
+        return res.data[0] if res.data else None
+
+    def listar_usuarios(self, rol="user"):
+        return self._t("usuarios").select("usuario, rol").eq("rol", rol).execute().data or []
+
+    def crear_usuario(self, usuario, clave, rol="user"):
+        self._t("usuarios").insert({"usuario": usuario, "pass": hashear(clave), "rol": rol}).execute()
+
+    def actualizar_clave(self, usuario, clave):
+        self._t("usuarios").update({"pass": hashear(clave)}).eq("usuario", usuario).execute()
+
+    def migrar_claves(self):
+        filas = [f for f in self._t("usuarios").select("usuario, pass, rol").execute().data or []
+                 if not es_hash(f["pass"])]
+        hashes = hashear_varias(f["pass"] or "" for f in filas)
+        for lote in _lotes([dict(f, **{"pass": h}) for f, h in zip(filas, hashes)]):
+            self._t("usuarios").upsert(lote, on_conflict="usuario").execute()
+        return len(filas)
+
+    def borrar_usuario(self, usuario):
+        self._t("usuarios").delete().eq("usuario", usuario).execute()
+
+    def _filtro_usuarios(self, q, texto, rol):
+        q = q.eq("rol", rol)
+        return q.ilike("usuario", patron_contiene(texto.upper())) if texto else q
+
+    def buscar_usuarios(self, texto=None, rol="user", despues_de=None, limite=25):
+        q = self._filtro_usuarios(self._t("usuarios").select("usuario, rol"), texto, rol)
+        if despues_de is not None:
+            q = q.gt("usuario", despues_de)
+        return q.order("usuario").limit(limite).execute().data or []
+
+    def contar_usuarios(self, texto=None, rol="user"):
+        q = self._filtro_usuarios(self._t("usuarios").select("usuario", count="exact", head=True), texto, rol)
+        return q.execute().count or 0
+
+    def crear_usuarios(self, filas):
+        creados = 0
+        hashes = hashear_varias(c for _, c, _ in filas)
+        for lote in _lotes([{"usuario": u, "pass": h, "rol": r} for (u, _, r), h in zip(filas, hashes)]):
+            res = self._t("usuarios").upsert(
+                lote, on_conflict="usuario", ignore_duplicates=True
+            ).execute()
+            creados += len(res.data or [])
+        return creados
+
+    def listar_clientes(self, ejecutivo=None):
+        q = self._t("clientes").select("*")
+        if ejecutivo is not None:
+            q = q.eq("ejecutivo_asignado", ejecutivo)
+        return q.execute().data or []
+
+    def crear_cliente(self, nombre_cliente, ejecutivo_asignado):
+        self._t("clientes").insert({
+            "nombre_cliente": nombre_cliente,
+            "ejecutivo_asignado": ejecutivo_asignado
+        }).execute()
+
+    def actualizar_cliente(self, cliente_id, nombre_cliente, ejecutivo_asignado):
+        self._t("clientes").update({
+            "nombre_cliente": nombre_cliente,
+            "ejecutivo_asignado": ejecutivo_asignado
+        }).eq("id", cliente_id).execute()
+
+    def borrar_cliente(self, cliente_id):
+        self._t("clientes").delete().eq("id", cliente_id).execute()
+
+    def buscar_clientes(self, texto=None, despues_de_id=None, limite=25):
+        q = self._t("clientes").select("id, nombre_cliente, ejecutivo_asignado")
+        if texto:
+            q = q.ilike("nombre_cliente", patron_contiene(texto.upper()))
+        if despues_de_id is not None:
+            q = q.gt("id", despues_de_id)
+        return q.order("id").limit(limite).execute().data or []
+
+    def contar_clientes(self, texto=None):
+        q = self._t("clientes").select("id", count="exact", head=True)
+        if texto:
+            q = q.ilike("nombre_cliente", patron_contiene(texto.upper()))
+        return q.execute().count or 0
+
+    def crear_clientes(self, filas):
+        # on_conflict requiere el indice unico de sql/supabase_importacion.sql.
+        creados = 0
+        for lote in _lotes(filas):
+            res = self._t("clientes").upsert(
+                [{"nombre_cliente": n, "ejecutivo_asignado": e} for n, e in lote],
+                on_conflict="nombre_cliente", ignore_duplicates=True
+            ).execute()
+            creados += len(res.data or [])
+        return creados
+
+    def reasignar_clientes(self, nombres, ejecutivo_asignado):
+        cambiados = 0
+        for lote in _lotes(nombres):
+            res = self._t("clientes").update({"ejecutivo_asignado": ejecutivo_asignado}) \
+                .in_("nombre_cliente", lote).execute()
+            cambiados += len(res.data or [])
+        return cambiados
+
+    def listar_tareas(self, estado=None, ejecutivo=None):
+        q = self._t("tareas").select("*")
+        if estado is not None:
+            q = q.eq("estado", estado)
+        if ejecutivo is not None:
+            q = q.eq("ejecutivo", ejecutivo)
+        return [_normalizar_tarea(f) for f in q.order("id", desc=True).execute().data or []]
+
+    @staticmethod
+    def _filtrar_tareas(q, estado, ejecutivo, cliente, desde, hasta):
+        for columna, valor in (("estado", estado), ("ejecutivo", ejecutivo), ("cliente", cliente)):
+            if valor is not None:
+                q = q.eq(columna, valor)
+        if desde is not None:
+            q = q.gte("fecha", desde.isoformat())
+        if hasta is not None:
+            q = q.lte("fecha", hasta.isoformat())
+        return q
+
+    def pagina_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None,
+                      despues_de_id=None, limite=1000):
+        q = self._filtrar_tareas(self._t("tareas").select("*"), estado, ejecutivo, cliente, desde, hasta)
+        if despues_de_id is not None:
+            q = q.gt("id", despues_de_id)
+        return [_normalizar_tarea(f) for f in q.order("id").limit(limite).execute().data or []]
+
+    def contar_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None):
+        q = self._filtrar_tareas(self._t("tareas").select("id", count="exact", head=True),
+                                 estado, ejecutivo, cliente, desde, hasta)
+        return q.execute().count or 0
+
+    def historial_ejecutivo(self, ejecutivo, antes_de_id=None, limite=20):
+        q = self._t("tareas").select(COLUMNAS_HISTORIAL).eq("ejecutivo", ejecutivo)
+        if antes_de_id is not None:
+            q = q.lt("id", antes_de_id)
+        return q.order("id", desc=True).limit(limite).execute().data or []
+
+    def resumen_ejecutivo(self, ejecutivo):
+        # Ver sql/supabase_historial.sql.
+        datos = self.cliente.rpc("resumen_ejecutivo", {"p_ejecutivo": ejecutivo}).execute().data or {}
+        return _resumen(datos.get("tendencia") or [], datos.get("por_estado") or {})
+
+    def obtener_tarea_activa(self, ejecutivo, cliente):
+        res = self._t("tareas").select("*").eq("ejecutivo", ejecutivo).eq("cliente", cliente).neq("estado", "Finalizado").order("id", desc=True).limit(1).execute()
+        return _normalizar_tarea(res.data[0]) if res.data else None
+
+    def crear_tarea(self, datos):
+        self._t("tareas").insert(datos).execute()
+
+    def actualizar_tarea(self, tarea_id, datos):
+        self._t("tareas").update(datos).eq("id", tarea_id).execute()
+
+    def guardar_borradores(self, borradores):
+        # Ver sql/supabase_borradores.sql: un solo viaje por lote.
+        return self.cliente.rpc("guardar_borradores", {"p_borradores": borradores}).execute().data or 0
+
+    def evaluar_tarea(self, tarea_id, notas_admin, calificacion):
+        self.cliente.rpc("registrar_evaluacion", {
+            "p_id": int(tarea_id),
+            "p_notas": notas_admin,
+            "p_calificacion": int(calificacion)
+        }).execute()
+
+    def evaluar_tareas(self, evaluaciones):
+        self.cliente.rpc("registrar_evaluaciones", {
+            "p_evaluaciones": [
+                {"id": int(i), "notas_admin": notas, "calificacion": int(pts)}
+                for i, notas, pts in evaluaciones
+            ]
+        }).execute()
+
+    def _filtro_revision(self, q, ejecutivo, cliente):
+        q = q.eq("estado", "Revision")
+        if ejecutivo is not None:
+            q = q.eq("ejecutivo", ejecutivo)
+        if cliente is not None:
+            q = q.eq("cliente", cliente)
+        return q
+
+    def cola_revision(self, ejecutivo=None, cliente=None, despues_de_id=None, limite=20):
+        q = self._filtro_revision(self._t("tareas").select("*"), ejecutivo, cliente)
+        if despues_de_id is not None:
+            q = q.gt("id", despues_de_id)
+        return [_normalizar_tarea(f) for f in q.order("id").limit(limite).execute().data or []]
+
+    def contar_revision(self, ejecutivo=None, cliente=None):
+        q = self._filtro_revision(self._t("tareas").select("id", count="exact", head=True), ejecutivo, cliente)
+        return q.execute().count or 0
+
+    def vista_avance(self):
+        return self._t("vista_avance").select("*").execute().data or []
+
+    def clientes_evaluados(self):
+        res = self._t("vista_clientes_evaluados").select("cliente").execute()
+        return [c["cliente"] for c in res.data or []]
+
+    def metricas_avance(self, desde=None, hasta=None, cliente=None):
+        res = self.cliente.rpc("metricas_avance", {
+            "p_desde": desde.isoformat() if desde else None,
+            "p_hasta": hasta.isoformat() if hasta else None,
+            "p_cliente": cliente
+        }).execute()
+        return res.data
+
+    def reconstruir_rollup(self):
+        self.cliente.rpc("reconstruir_rollup", {}).execute()
+
+    def migrar_tareas(self):
+        # El cambio de tipo de columnas se hace con sql/supabase_migracion_tareas.sql;
+        # PostgREST no permite DDL desde el cliente.
+        raise RuntimeError("En Supabase ejecute sql/supabase_migracion_tareas.sql en el editor SQL.")
+
+    def enviar_mensaje(self, remitente, destinatario, mensaje, fecha):
+        self._t("mensajes").insert({
+            "remitente": remitente,
+            "destinatario": destinatario,
+            "mensaje": mensaje,
+            "fecha": fecha
+        }).execute()
+
+    def _mensajes_de(self, usuario):
+        return self._t("mensajes").select("*").or_(f"destinatario.eq.{usuario},remitente.eq.{usuario}")
+
+    def mensajes_nuevos(self, usuario, despues_de_id=None, limite=20):
+        q = self._mensajes_de(usuario)
+        if despues_de_id is None:
+            q = q.limit(limite)
+        else:
+            q = q.gt("id", despues_de_id)
+        return q.order("id", desc=True).execute().data or []
+
+    def mensajes_anteriores(self, usuario, antes_de_id, limite=20):
+        res = self._mensajes_de(usuario).lt("id", antes_de_id).order("id", desc=True).limit(limite).execute()
+        return res.data or []
+
+    def contar_no_leidos(self, usuario):
+        res = self._t("mensajes").select("id", count="exact", head=True).eq("destinatario", usuario).eq("leido", 0).execute()
+        return res.count or 0
+
+    def marcar_leidos(self, ids):
+        if ids:
+            self._t("mensajes").update({"leido": 1}).in_("id", [int(i) for i in ids]).execute()
+
+    def reiniciar(self):
+        self._t("tareas").delete().execute()
+        self._t("clientes").delete().execute()
+        self._t("mensajes").delete().execute()
+        self._t("metricas_rollup").delete().execute()
+        self._t("usuarios").delete().neq("usuario", "GERENCIA").execute()
+
+
+# --- SQLITE ---
+_POOL = {}
+# ``PRAGMA user_version`` de una base cuyas tareas ya estan en fecha ISO y JSON.
+VERSION_TAREAS_SQLITE = 1
+_POOL_LOCK = threading.Lock()
+
+
+def obtener_conexion(ruta=DB_PATH):
+    """Devuelve la conexion compartida del proceso para ``ruta`` (y su candado).
+
+    SQLite en modo WAL permite lectores concurrentes con un escritor, asi que una
+    sola conexion por proceso, serializada con un candado, basta para Streamlit.
+    """
+    with _POOL_LOCK:
+        if ruta not in _POOL:
+            con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(ESQUEMA_SQLITE)
+            # La busqueda de filas antiguas recorre toda la tabla: solo hasta que se completa una vez.
+            if con.execute("PRAGMA user_version").fetchone()[0] < VERSION_TAREAS_SQLITE:
+                _migrar_tareas_sqlite(con)
+            _rellenar_rollup(con)
+            _POOL[ruta] = (con, threading.RLock())
+        return _POOL[ruta]
+
+
+def _migrar_tareas_sqlite(con):
+    """Pasa filas antiguas al formato actual. Es idempotente; devuelve cuantas cambiaron.
+
+    Al terminar deja ``PRAGMA user_version`` en ``VERSION_TAREAS_SQLITE``.
+    """
+    filas = con.execute(
+        "SELECT id, fecha, tareas_json FROM tareas "
+        "WHERE fecha LIKE '__/__/____' OR (tareas_json <> '' AND "
+        "CASE WHEN json_valid(tareas_json) THEN json_type(tareas_json) <> 'array' ELSE 1 END)"
+    ).fetchall()
+    if not filas:
+        con.execute(f"PRAGMA user_version = {VERSION_TAREAS_SQLITE}")
+        return 0
+    cambios = [(fecha_a_iso(f["fecha"]), items_a_json(items_de_fila(f["tareas_json"])), f["id"]) for f in filas]
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.executemany("UPDATE tareas SET fecha = ?, tareas_json = ? WHERE id = ?", cambios)
+        con.execute("DELETE FROM metricas_rollup")
+        con.execute(SQL_RECONSTRUIR_ROLLUP)
+        con.execute(f"PRAGMA user_version = {VERSION_TAREAS_SQLITE}")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+    return len(cambios)
+
+
+def _rellenar_rollup(con):
+    """Carga inicial de ``metricas_rollup`` en bases creadas antes de existir la tabla."""
+    vacia = con.execute("SELECT 1 FROM metricas_rollup LIMIT 1").fetchone() is None
+    if vacia and con.execute("SELECT 1 FROM vista_avance_fechas LIMIT 1").fetchone():
+        con.execute(SQL_RECONSTRUIR_ROLLUP)
+
+
+class RepositorioSQLite(Repositorio):
+    """Implementacion local sobre ``haylex_data.db``."""
+
+    # Una sola conexion por proceso tras ``self.lock``: las lecturas van de a una.
+    lecturas_concurrentes = False
+
+    def __init__(self, ruta=DB_PATH):
+        self.ruta = ruta
+        self.con, self.lock = obtener_conexion(ruta)
+
+    def _consultar(self, sql, params=()):
+        with self.lock:
+            return [dict(r) for r in self.con.execute(sql, params).fetchall()]
+
+    def _ejecutar(self, sql, params=()):
+        with self.lock:
+            return self.con.execute(sql, params).lastrowid
+
+    @contextmanager
+    def _transaccion(self):
+        with self.lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.con
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+            self.con.execute("COMMIT")
+
+    def obtener_usuario(self, usuario):
+        filas = self._consultar("SELECT usuario, rol FROM usuarios WHERE usuario = ?", (usuario,))
+        return filas[0] if filas else None
+
+    def credencial(self, usuario):
+        filas = self._consultar("SELECT usuario, pass, rol FROM usuarios WHERE usuario = ?", (usuario,))
+        return filas[0] if filas else None
+
+    def listar_usuarios(self, rol="user"):
+        return self._consultar("SELECT usuario, rol FROM usuarios WHERE rol = ?", (rol,))
+
+    def crear_usuario(self, usuario, clave, rol="user"):
+        self._ejecutar("INSERT INTO usuarios (usuario, pass, rol) VALUES (?, ?, ?)", (usuario, hashear(clave), rol))
+
+    def actualizar_clave(self, usuario, clave):
+        self._ejecutar("UPDATE usuarios SET pass = ? WHERE usuario = ?", (hashear(clave), usuario))
+
+    def migrar_claves(self):
+        filas = [f for f in self._consultar("SELECT usuario, pass FROM usuarios") if not es_hash(f["pass"])]
+        hashes = hashear_varias(f["pass"] or "" for f in filas)
+        with self._transaccion() as con:
+            con.executemany("UPDATE usuarios SET pass = ? WHERE usuario = ?",
+                            [(h, f["usuario"]) for f, h in zip(filas, hashes)])
+        return len(filas)
+
+    def borrar_usuario(self, usuario):
+        self._ejecutar("DELETE FROM usuarios WHERE usuario = ?", (usuario,))
+
+    @staticmethod
+    def _filtro_usuarios(texto, rol):
+        condiciones, params = ["rol = ?"], [rol]
+        if texto:
+            condiciones.append("usuario LIKE ? ESCAPE '\\'")
+            params.append(patron_contiene(texto.upper()))
+        return condiciones, params
+
+    def buscar_usuarios(self, texto=None, rol="user", despues_de=None, limite=25):
+        condiciones, params = self._filtro_usuarios(texto, rol)
+        if despues_de is not None:
+            condiciones.append("usuario > ?")
+            params.append(despues_de)
+        return self._consultar(
+            f"SELECT usuario, rol FROM usuarios WHERE {' AND '.join(condiciones)} ORDER BY usuario LIMIT ?",
+            params + [limite])
+
+    def contar_usuarios(self, texto=None, rol="user"):
+        condiciones, params = self._filtro_usuarios(texto, rol)
+        return self._consultar(f"SELECT COUNT(*) as n FROM usuarios WHERE {' AND '.join(condiciones)}", params)[0]["n"]
+
+    def crear_usuarios(self, filas):
+        # El hash (lento a proposito) se calcula antes de tomar el bloqueo de escritura.
+        hashes = hashear_varias(c for _, c, _ in filas)
+        filas = [(u, h, r) for (u, _, r), h in zip(filas, hashes)]
+        with self._transaccion() as con:
+            antes = con.total_changes
+            for lote in _lotes(filas):
+                con.executemany(
+                    "INSERT INTO usuarios (usuario, pass, rol) VALUES (?, ?, ?) ON CONFLICT (usuario) DO NOTHING", lote)
+            return con.total_changes - antes
+
+    def listar_clientes(self, ejecutivo=None):
+        if ejecutivo is None:
+            return self._consultar("SELECT * FROM clientes ORDER BY id")
+        return self._consultar("SELECT * FROM clientes WHERE ejecutivo_asignado = ? ORDER BY id", (ejecutivo,))
+
+    def crear_cliente(self, nombre_cliente, ejecutivo_asignado):
+        self._ejecutar("INSERT INTO clientes (nombre_cliente, ejecutivo_asignado) VALUES (?, ?)",
+                       (nombre_cliente, ejecutivo_asignado))
+
+    def actualizar_cliente(self, cliente_id, nombre_cliente, ejecutivo_asignado):
+        self._ejecutar("UPDATE clientes SET nombre_cliente = ?, ejecutivo_asignado = ? WHERE id = ?",
+                       (nombre_cliente, ejecutivo_asignado, cliente_id))
+
+    def borrar_cliente(self, cliente_id):
+        self._ejecutar("DELETE FROM clientes WHERE id = ?", (cliente_id,))
+
+    @staticmethod
+    def _filtro_clientes(texto):
+        if not texto:
+            return ["1 = 1"], []
+        return ["nombre_cliente LIKE ? ESCAPE '\\'"], [patron_contiene(texto.upper())]
+
+    def buscar_clientes(self, texto=None, despues_de_id=None, limite=25):
+        condiciones, params = self._filtro_clientes(texto)
+        if despues_de_id is not None:
+            condiciones.append("id > ?")
+            params.append(despues_de_id)
+        return self._consultar(
+            f"SELECT id, nombre_cliente, ejecutivo_asignado FROM clientes WHERE {' AND '.join(condiciones)} "
+            "ORDER BY id LIMIT ?", params + [limite])
+
+    def contar_clientes(self, texto=None):
+        condiciones, params = self._filtro_clientes(texto)
+        return self._consultar(f"SELECT COUNT(*) as n FROM clientes WHERE {' AND '.join(condiciones)}", params)[0]["n"]
+
+    def crear_clientes(self, filas):
+        with self._transaccion() as con:
+            antes = con.total_changes
+            for lote in _lotes(filas):
+                con.executemany(
+                    "INSERT INTO clientes (nombre_cliente, ejecutivo_asignado) VALUES (?, ?) "
+                    "ON CONFLICT (nombre_cliente) DO NOTHING", lote)
+            return con.total_changes - antes
+
+    def reasignar_clientes(self, nombres, ejecutivo_asignado):
+        with self._transaccion() as con:
+            antes = con.total_changes
+            for lote in _lotes(nombres):
+                con.execute(
+                    f"UPDATE clientes SET ejecutivo_asignado = ? WHERE nombre_cliente IN ({', '.join('?' for _ in lote)})",
+                    [ejecutivo_asignado, *lote])
+            return con.total_changes - antes
+
+    @staticmethod
+    def _filtro_tareas(estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None):
+        condiciones, params = [], []
+        for columna, valor in (("estado", estado), ("ejecutivo", ejecutivo), ("cliente", cliente)):
+            if valor is not None:
+                condiciones.append(f"{columna} = ?")
+                params.append(valor)
+        if desde is not None:
+            condiciones.append("fecha >= ?")
+            params.append(desde.isoformat())
+        if hasta is not None:
+            condiciones.append("fecha <= ?")
+            params.append(hasta.isoformat())
+        return condiciones, params
+
+    def listar_tareas(self, estado=None, ejecutivo=None):
+        condiciones, params = self._filtro_tareas(estado, ejecutivo)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._consultar(f"SELECT * FROM tareas {where} ORDER BY id DESC", params)
+        return [_normalizar_tarea(f) for f in filas]
+
+    def pagina_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None,
+                      despues_de_id=None, limite=1000):
+        condiciones, params = self._filtro_tareas(estado, ejecutivo, cliente, desde, hasta)
+        if despues_de_id is not None:
+            condiciones.append("id > ?")
+            params.append(despues_de_id)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._consultar(f"SELECT * FROM tareas {where} ORDER BY id LIMIT ?", params + [limite])
+        return [_normalizar_tarea(f) for f in filas]
+
+    def historial_ejecutivo(self, ejecutivo, antes_de_id=None, limite=20):
+        condiciones, params = ["ejecutivo = ?"], [ejecutivo]
+        if antes_de_id is not None:
+            condiciones.append("id < ?")
+            params.append(antes_de_id)
+        return self._consultar(
+            f"SELECT {COLUMNAS_HISTORIAL} FROM tareas WHERE {' AND '.join(condiciones)} ORDER BY id DESC LIMIT ?",
+            params + [limite])
+
+    def resumen_ejecutivo(self, ejecutivo):
+        with self.lock:
+            tendencia = self._consultar(
+                "SELECT semana, SUM(suma_calificacion) / SUM(conteo) as calificacion, SUM(conteo) as tareas "
+                "FROM metricas_rollup WHERE ejecutivo = ? GROUP BY semana ORDER BY semana", (ejecutivo,))
+            por_estado = self._consultar(
+                "SELECT estado, COUNT(*) as n FROM tareas WHERE ejecutivo = ? GROUP BY estado", (ejecutivo,))
+        return _resumen(tendencia, {f["estado"]: f["n"] for f in por_estado})
+
+    def contar_tareas(self, estado=None, ejecutivo=None, cliente=None, desde=None, hasta=None):
+        condiciones, params = self._filtro_tareas(estado, ejecutivo, cliente, desde, hasta)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._consultar(f"SELECT COUNT(*) as n FROM tareas {where}", params)[0]["n"]
+
+    def obtener_tarea_activa(self, ejecutivo, cliente):
+        filas = self._consultar(
+            "SELECT * FROM tareas WHERE ejecutivo = ? AND cliente = ? AND estado != 'Finalizado' "
+            "ORDER BY id DESC LIMIT 1", (ejecutivo, cliente))
+        return _normalizar_tarea(filas[0]) if filas else None
+
+    @staticmethod
+    def _serializar_tarea(datos):
+        datos = dict(datos)
+        if "tareas_json" in datos:
+            datos["tareas_json"] = items_a_json(datos["tareas_json"])
+        return datos
+
+    # Sin Realtime en modo local, las escrituras se publican directamente en el bus.
+    def crear_tarea(self, datos):
+        fila = self._serializar_tarea(datos)
+        columnas = list(fila)
+        tarea_id = self._ejecutar(
+            f"INSERT INTO tareas ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})",
+            [fila[c] for c in columnas])
+        BUS.publicar("tareas", "INSERT", dict(datos, id=tarea_id))
+
+    def actualizar_tarea(self, tarea_id, datos):
+        fila = self._serializar_tarea(datos)
+        columnas = list(fila)
+        evento = dict(datos, id=tarea_id)
+        with self.lock:
+            if "estado" in datos:
+                anterior = self.con.execute("SELECT estado FROM tareas WHERE id = ?", (tarea_id,)).fetchone()
+                evento["estado_anterior"] = anterior[0] if anterior is not None else None
+            self._ejecutar(
+                f"UPDATE tareas SET {', '.join(f'{c} = ?' for c in columnas)} WHERE id = ?",
+                [fila[c] for c in columnas] + [tarea_id])
+        BUS.publicar("tareas", "UPDATE", evento)
+
+    def guardar_borradores(self, borradores):
+        eventos = []
+        with self._transaccion() as con:
+            for b in borradores:
+                fila = self._serializar_tarea(b)
+                activa = con.execute(
+                    "SELECT id, estado FROM tareas WHERE ejecutivo = ? AND cliente = ? AND estado != 'Finalizado' "
+                    "ORDER BY id DESC LIMIT 1", (fila["ejecutivo"], fila["cliente"])).fetchone()
+                if activa is None:
+                    estado = fila.get("estado") or "En progreso"
+                    tarea_id = con.execute(
+                        "INSERT INTO tareas (fecha, ejecutivo, cliente, tareas_json, evidencia_link, estado, calificacion) "
+                        "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                        (fila["fecha"], fila["ejecutivo"], fila["cliente"], fila["tareas_json"],
+                         fila["evidencia_link"], estado)).lastrowid
+                    eventos.append(("INSERT", dict(b, id=tarea_id, estado=estado, estado_anterior=None)))
+                else:
+                    tarea_id, estado = activa[0], fila.get("estado") or activa[1]
+                    con.execute(
+                        "UPDATE tareas SET fecha = ?, tareas_json = ?, evidencia_link = ?, estado = ? WHERE id = ?",
+                        (fila["fecha"], fila["tareas_json"], fila["evidencia_link"], estado, tarea_id))
+                    eventos.append(("UPDATE", dict(b, id=tarea_id, estado=estado, estado_anterior=activa[1])))
+        for tipo, fila in eventos:
+            BUS.publicar("tareas", tipo, fila)
+        return len(eventos)
+
+    def evaluar_tarea(self, tarea_id, notas_admin, calificacion):
+        self.evaluar_tareas([(tarea_id, notas_admin, calificacion)])
+
+    def evaluar_tareas(self, evaluaciones):
+        evaluadas = []
+        with self._transaccion() as con:
+            for tarea_id, notas_admin, calificacion in evaluaciones:
+                cur = con.execute(
+                    "UPDATE tareas SET notas_admin = ?, calificacion = ?, estado = 'Finalizado' "
+                    "WHERE id = ? AND estado IS NOT 'Finalizado'",
+                    (notas_admin, calificacion, tarea_id))
+                if cur.rowcount:
+                    con.execute(SQL_ACUMULAR_ROLLUP, (tarea_id,))
+                    evaluadas.append((tarea_id, calificacion))
+        # Las ya evaluadas no cambiaron: sin evento.
+        for tarea_id, calificacion in evaluadas:
+            BUS.publicar("tareas", "UPDATE", {"id": tarea_id, "estado": "Finalizado", "calificacion": calificacion})
+
+    @staticmethod
+    def _filtro_revision(ejecutivo, cliente):
+        condiciones, params = ["estado = 'Revision'"], []
+        if ejecutivo is not None:
+            condiciones.append("ejecutivo = ?")
+            params.append(ejecutivo)
+        if cliente is not None:
+            condiciones.append("cliente = ?")
+            params.append(cliente)
+        return condiciones, params
+
+    def cola_revision(self, ejecutivo=None, cliente=None, despues_de_id=None, limite=20):
+        condiciones, params = self._filtro_revision(ejecutivo, cliente)
+        if despues_de_id is not None:
+            condiciones.append("id > ?")
+            params.append(despues_de_id)
+        filas = self._consultar(
+            f"SELECT * FROM tareas WHERE {' AND '.join(condiciones)} ORDER BY id LIMIT ?", params + [limite])
+        return [_normalizar_tarea(f) for f in filas]
+
+    def contar_revision(self, ejecutivo=None, cliente=None):
+        condiciones, params = self._filtro_revision(ejecutivo, cliente)
+        return self._consultar(f"SELECT COUNT(*) as n FROM tareas WHERE {' AND '.join(condiciones)}", params)[0]["n"]
+
+    def vista_avance(self):
+        return self._consultar("SELECT * FROM vista_avance")
+
+    def clientes_evaluados(self):
+        filas = self._consultar("SELECT DISTINCT cliente FROM metricas_rollup ORDER BY cliente")
+        return [f["cliente"] for f in filas]
+
+    def metricas_avance(self, desde=None, hasta=None, cliente=None):
+        params = {
+            "desde": desde.isoformat() if desde else "0000-01-01",
+            "hasta": hasta.isoformat() if hasta else "9999-12-31",
+            "cliente": cliente
+        }
+        with self.lock:
+            return {nombre: self._consultar(sql, params) for nombre, sql in SQL_METRICAS.items()}
+
+    def reconstruir_rollup(self):
+        with self._transaccion() as con:
+            con.execute("DELETE FROM metricas_rollup")
+            con.execute(SQL_RECONSTRUIR_ROLLUP)
+
+    def migrar_tareas(self):
+        with self.lock:
+            return _migrar_tareas_sqlite(self.con)
+
+    def enviar_mensaje(self, remitente, destinatario, mensaje, fecha):
+        mensaje_id = self._ejecutar(
+            "INSERT INTO mensajes (remitente, destinatario, mensaje, fecha) VALUES (?, ?, ?, ?)",
+            (remitente, destinatario, mensaje, fecha))
+        BUS.publicar("mensajes", "INSERT", {
+            "id": mensaje_id, "remitente": remitente, "destinatario": destinatario, "leido": 0
+        })
+
+    def mensajes_nuevos(self, usuario, despues_de_id=None, limite=20):
+        if despues_de_id is None:
+            return self._consultar(
+                "SELECT * FROM mensajes WHERE destinatario = ? OR remitente = ? ORDER BY id DESC LIMIT ?",
+                (usuario, usuario, limite))
+        return self._consultar(
+            "SELECT * FROM mensajes WHERE (destinatario = ? OR remitente = ?) AND id > ? ORDER BY id DESC",
+            (usuario, usuario, despues_de_id))
+
+    def mensajes_anteriores(self, usuario, antes_de_id, limite=20):
+        return self._consultar(
+            "SELECT * FROM mensajes WHERE (destinatario = ? OR remitente = ?) AND id < ? ORDER BY id DESC LIMIT ?",
+            (usuario, usuario, antes_de_id, limite))
+
+    def contar_no_leidos(self, usuario):
+        return self._consultar(
+            "SELECT COUNT(*) as n FROM mensajes WHERE destinatario = ? AND leido = 0", (usuario,))[0]["n"]
+
+    def marcar_leidos(self, ids):
+        ids = [int(i) for i in ids]
+        if ids:
+            self._ejecutar(f"UPDATE mensajes SET leido = 1 WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+
+    def reiniciar(self):
+        with self._transaccion() as con:
+            con.execute("DELETE FROM tareas")
+            con.execute("DELETE FROM clientes")
+            con.execute("DELETE FROM mensajes")
+            con.execute("DELETE FROM metricas_rollup")
+            con.execute("DELETE FROM usuarios WHERE usuario != 'GERENCIA'")
+
+
+def crear_repositorio(backend=None):
+    """Crea el repositorio segun ``HAYLEX_BACKEND`` (por defecto Supabase)."""
+    backend = (backend or os.getenv("HAYLEX_BACKEND", "supabase")).lower()
+    if backend == "sqlite":
+        return RepositorioSQLite(os.getenv("HAYLEX_DB_PATH", DB_PATH))
+    return RepositorioSupabase(
+        os.getenv("SUPABASE_URL", "TU_URL_DE_SUPABASE"),
+        os.getenv("SUPABASE_KEY", "TU_CLAVE_ANON_DE_SUPABASE"))
+
+
+# --- LECTURAS CONCURRENTES ---
+_POOL_LECTURAS = ThreadPoolExecutor(max_workers=LECTURAS_PARALELAS, thread_name_prefix="haylex-lecturas")
+
+
+def leer_en_paralelo(repo, **consultas):
+    """Ejecuta lecturas independientes a la vez y devuelve sus resultados por nombre.
+
+    ``leer_en_paralelo(repo, clientes=(repo.listar_clientes,), tareas=(repo.listar_tareas, None, "ANA"))``
+    tarda lo que la mas lenta en vez de la suma. Cada lectura corre con una copia
+    del contexto de quien llama (instrumentacion de la re-ejecucion). Si alguna
+    falla, se propaga su excepcion. Si ``repo`` no admite lecturas concurrentes
+    (SQLite) se ejecutan en orden: repartirlas solo sumaria el costo del grupo de hilos.
+    """
+    if len(consultas) <= 1 or not repo.lecturas_concurrentes:
+        return {nombre: funcion(*args) for nombre, (funcion, *args) in consultas.items()}
+    futuros = {
+        nombre: _POOL_LECTURAS.submit(contextvars.copy_context().run, funcion, *args)
+        for nombre, (funcion, *args) in consultas.items()
+    }
+    return {nombre: futuro.result() for nombre, futuro in futuros.items()}
@@ -0,0 +1,114 @@
+"""Tokens de sesion firmados (HMAC-SHA256).
+
+La sesion ya no depende solo de ``st.session_state.auth`` (que vive en una
+replica): al ingresar se emite un token ``<datos>.<firma>`` que el navegador
+guarda en la cookie ``COOKIE_SESION`` (``SameSite=Strict``, ``Secure`` con
+HTTPS). Si el balanceador manda al navegador a otra replica, esta valida el
+token y restaura la sesion sin pedir la clave. El token nunca va en la URL:
+ahi quedaria en el historial, en los enlaces copiados, en los logs de proxies y
+en el ``Referer`` de los enlaces de evidencia. Streamlit no puede emitir
+cabeceras ``Set-Cookie``, asi que la cookie se escribe desde JavaScript
+(``script_cookie``) y no es ``HttpOnly``.
+
+La clave de firma sale de ``HAYLEX_SECRETO_SESION``. Si no se define se genera
+una y se guarda en el estado compartido, asi que todas las replicas que lo
+comparten firman igual. Al salir, el token queda revocado en el estado
+compartido hasta que vence.
+
+La firma incluye un sello del usuario (el hash de su clave): al cambiar la
+clave el sello cambia y los tokens ya emitidos dejan de validar.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from estado import ESTADO
+
+COOKIE_SESION = "haylex_sesion"
+DURACION_SESION = int(os.getenv("HAYLEX_DURACION_SESION", str(8 * 3600)))
+# Cada cuantos segundos una sesion abierta vuelve a validar su token (clave cambiada, salida en otra pestana).
+REVALIDAR_SESION = int(os.getenv("HAYLEX_REVALIDAR_SESION", "30"))
+
+
+def _b64(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _desde_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class Sesiones:
+    def __init__(self, estado, secreto=None, duracion=DURACION_SESION):
+        self.estado = estado
+        self.duracion = duracion
+        self._secreto = secreto.encode("utf-8") if secreto else None
+
+    @property
+    def secreto(self):
+        if self._secreto is None:
+            self._secreto = self.estado.agregar("sesion:secreto", secrets.token_hex(32)).encode("ascii")
+        return self._secreto
+
+    def _firma(self, datos, sello):
+        mensaje = datos.encode("utf-8") + b"." + sello.encode("utf-8")
+        return hmac.new(self.secreto, mensaje, hashlib.sha256).digest()
+
+    def emitir(self, usuario, rol, sello):
+        """Token para ``usuario``/``rol`` que vence en ``duracion`` segundos.
+
+        ``sello`` es el hash de clave vigente del usuario.
+        """
+        carga = {"u": usuario, "r": rol, "exp": int(time.time()) + self.duracion, "id": secrets.token_hex(8)}
+        datos = _b64(json.dumps(carga, separators=(",", ":")).encode("utf-8"))
+        return f"{datos}.{_b64(self._firma(datos, sello))}"
+
+    def _carga(self, token, sello_de):
+        """Carga del token si la firma coincide con el sello actual (``sello_de(usuario)``)."""
+        if not token or token.count(".") != 1:
+            return None
+        datos, firma = token.split(".")
+        # El token llega de la URL: cualquier texto (no ASCII, base64 roto) es solo invalido.
+        try:
+            carga = json.loads(_desde_b64(datos))
+            firma = _desde_b64(firma)
+        except (UnicodeError, TypeError, ValueError):
+            return None
+        if not isinstance(carga, dict) or not isinstance(carga.get("u"), str):
+            return None
+        sello = sello_de(carga["u"])
+        if not sello or not hmac.compare_digest(firma, self._firma(datos, sello)):
+            return None
+        if carga.get("exp", 0) <= time.time():
+            return None
+        return carga
+
+    def validar(self, token, sello_de):
+        """``{"user", "rol"}`` si el token es autentico, vigente y no revocado; si no ``None``."""
+        carga = self._carga(token, sello_de)
+        if carga is None or self.estado.obtener(f"sesion:revocada:{carga['id']}")[0]:
+            return None
+        return {"user": carga["u"], "rol": carga["r"]}
+
+    def revocar(self, token, sello_de):
+        carga = self._carga(token, sello_de)
+        if carga is not None:
+            self.estado.guardar(f"sesion:revocada:{carga['id']}", True, carga["exp"] - time.time())
+
+
+def script_cookie(token, duracion=DURACION_SESION):
+    """``<script>`` que guarda ``token`` en la cookie de sesion (``None``: la borra)."""
+    if token is None:
+        token, duracion = "", 0
+    # Los tokens son base64 url-safe y un punto: no necesitan escape.
+    return (f'<script>parent.document.cookie = "{COOKIE_SESION}={token}; path=/; max-age={int(duracion)}; '
+            'SameSite=Strict" + (parent.location.protocol === "https:" ? "; Secure" : "");</script>')
+
+
+# Sesiones del proceso (misma clave de firma en todas las replicas que comparten ESTADO).
+SESIONES = Sesiones(ESTADO, os.getenv("HAYLEX_SECRETO_SESION"))
+
@@ -0,0 +1,39 @@
+-- Autoguardado de borradores (Supabase): upsert por lote de la tarea activa
+-- (no Finalizada) de cada (ejecutivo, cliente). Sin "estado" se conserva el
+-- de la tarea; las nuevas quedan "En progreso". Requiere
+-- supabase_migracion_tareas.sql (fecha date, tareas_json jsonb).
+
+create or replace function guardar_borradores(p_borradores json)
+returns integer
+language plpgsql
+as $$
+declare
+    b json;
+    v_id bigint;
+    n integer := 0;
+begin
+    for b in select * from json_array_elements(p_borradores) loop
+        select id into v_id
+        from tareas
+        where ejecutivo = b->>'ejecutivo' and cliente = b->>'cliente' and estado <> 'Finalizado'
+        order by id desc
+        limit 1
+        for update;
+
+        if v_id is null then
+            insert into tareas (fecha, ejecutivo, cliente, tareas_json, evidencia_link, estado, calificacion)
+            values ((b->>'fecha')::date, b->>'ejecutivo', b->>'cliente', (b->'tareas_json')::jsonb,
+                    b->>'evidencia_link', coalesce(b->>'estado', 'En progreso'), 0);
+        else
+            update tareas
+            set fecha = (b->>'fecha')::date,
+                tareas_json = (b->'tareas_json')::jsonb,
+                evidencia_link = b->>'evidencia_link',
+                estado = coalesce(b->>'estado', estado)
+            where id = v_id;
+        end if;
+        n := n + 1;
+    end loop;
+    return n;
+end;
+$$;
@@ -0,0 +1,23 @@
+-- Cola de EVALUACION (Supabase): indice para la paginacion por clave de las
+-- tareas en Revision y calificacion en lote en un solo viaje.
+-- Requiere supabase_rollup.sql (registrar_evaluacion).
+
+create index if not exists idx_tareas_estado_id on tareas (estado, id);
+
+-- p_evaluaciones: [{"id": 1, "notas_admin": "...", "calificacion": 80}, ...]
+create or replace function registrar_evaluaciones(p_evaluaciones jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    e jsonb;
+begin
+    for e in select * from jsonb_array_elements(p_evaluaciones) loop
+        perform registrar_evaluacion(
+            (e->>'id')::bigint,
+            e->>'notas_admin',
+            (e->>'calificacion')::integer
+        );
+    end loop;
+end;
+$$;
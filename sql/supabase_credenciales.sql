@@ -0,0 +1,6 @@
+-- Credenciales (Supabase): el ingreso busca por usuario y verifica el hash en
+-- la aplicacion, asi que basta el indice unico sobre usuario.
+-- Despues de aplicar este archivo ejecute:  python mantenimiento.py claves
+-- para pasar a hash las claves que siguen en texto plano.
+
+create unique index if not exists idx_usuarios_usuario on usuarios (usuario);
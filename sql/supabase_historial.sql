@@ -0,0 +1,32 @@
+-- HISTORIAL del ejecutivo (Supabase): indice para paginar por id y resumen
+-- calculado desde metricas_rollup (ver supabase_rollup.sql) mas un conteo por
+-- estado, sin leer las filas de tareas.
+
+create index if not exists idx_tareas_ejecutivo_id on tareas (ejecutivo, id);
+create index if not exists idx_tareas_ejecutivo_estado on tareas (ejecutivo, estado);
+
+create or replace function resumen_ejecutivo(p_ejecutivo text)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'tendencia', coalesce((
+            select json_agg(t) from (
+                select semana,
+                       sum(suma_calificacion) / sum(conteo) as calificacion,
+                       sum(conteo) as tareas
+                from metricas_rollup
+                where ejecutivo = p_ejecutivo
+                group by semana
+                order by semana
+            ) t), '[]'::json),
+        'por_estado', coalesce((
+            select json_object_agg(estado, n) from (
+                select estado, count(*) as n
+                from tareas
+                where ejecutivo = p_ejecutivo
+                group by estado
+            ) e), '{}'::json)
+    );
+$$;
@@ -0,0 +1,7 @@
+-- Importacion masiva (Supabase): los upsert por lotes de crear_clientes()
+-- usan on_conflict=nombre_cliente, que requiere un indice unico.
+-- Antes de crearlo, revise que no haya nombres repetidos:
+--   select nombre_cliente, count(*) from clientes group by 1 having count(*) > 1;
+
+create unique index if not exists clientes_nombre_cliente_key on clientes (nombre_cliente);
+create index if not exists idx_clientes_ejecutivo_asignado on clientes (ejecutivo_asignado);
@@ -0,0 +1,6 @@
+-- Bandeja de MENSAJES (Supabase): indices para el conteo de no leidos y para
+-- leer solo los mensajes nuevos / paginar el historial por id.
+
+create index if not exists idx_mensajes_destinatario_leido on mensajes (destinatario, leido);
+create index if not exists idx_mensajes_destinatario_id on mensajes (destinatario, id);
+create index if not exists idx_mensajes_remitente_id on mensajes (remitente, id);
@@ -0,0 +1,63 @@
+-- Agregados del tablero METRICAS calculados en Postgres (Supabase).
+-- Ejecutar en el editor SQL del proyecto. La app llama a metricas_avance()
+-- por RPC y solo recibe los marcos ya agregados, leidos de metricas_rollup
+-- (ver supabase_rollup.sql, que debe ejecutarse antes).
+
+create or replace view vista_clientes_evaluados as
+select distinct cliente
+from metricas_rollup
+order by cliente;
+
+create or replace function metricas_avance(
+    p_desde date default null,
+    p_hasta date default null,
+    p_cliente text default null
+)
+returns json
+language sql
+stable
+as $$
+    with base as (
+        select *
+        from metricas_rollup
+        where (p_desde is null or dia >= p_desde)
+          and (p_hasta is null or dia <= p_hasta)
+          and (p_cliente is null or cliente = p_cliente)
+    ),
+    avance as (
+        select ejecutivo, cliente,
+               sum(suma_calificacion) / sum(conteo) as promedio_usuario,
+               sum(conteo) as tareas_evaluadas,
+               max(dia) as ultima_evaluacion
+        from base
+        group by ejecutivo, cliente
+    )
+    select json_build_object(
+        'avance', coalesce((select json_agg(a) from avance a), '[]'::json),
+        'por_usuario', coalesce((
+            select json_agg(u) from (
+                select ejecutivo,
+                       round(avg(promedio_usuario), 2) as promedio,
+                       sum(tareas_evaluadas) as tareas
+                from avance
+                group by ejecutivo
+                order by promedio desc
+            ) u), '[]'::json),
+        'por_cliente', coalesce((
+            select json_agg(c) from (
+                select cliente,
+                       round(avg(promedio_usuario), 2) as promedio,
+                       count(ejecutivo) as miembros
+                from avance
+                group by cliente
+                order by cliente
+            ) c), '[]'::json),
+        'tendencia', coalesce((
+            select json_agg(t) from (
+                select semana, sum(suma_calificacion) / sum(conteo) as calificacion
+                from base
+                group by semana
+                order by semana
+            ) t), '[]'::json)
+    );
+$$;
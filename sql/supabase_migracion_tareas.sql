@@ -0,0 +1,65 @@
+-- Migracion de tareas (Supabase): fecha dd/mm/aaaa -> date y
+-- tareas_json 'a||b' -> arreglo jsonb, con indices para filtros por
+-- ejecutivo/cliente/estado y rangos de fecha.
+--
+-- Orden: este archivo, luego supabase_rollup.sql y supabase_metricas.sql
+-- (redefinen las vistas y funciones que dependen de fecha).
+
+begin;
+
+-- Texto antiguo -> arreglo jsonb. Un texto que empieza con '[' solo se toma
+-- como JSON si es un arreglo valido ('[URGENTE] llamar||enviar' es antiguo).
+create or replace function pg_temp.tareas_a_jsonb(valor text)
+returns jsonb
+language plpgsql
+immutable
+as $$
+declare
+    arreglo jsonb;
+begin
+    if valor is null or valor = '' then
+        return '[]'::jsonb;
+    end if;
+    if left(valor, 1) = '[' then
+        begin
+            arreglo := valor::jsonb;
+            if jsonb_typeof(arreglo) = 'array' then
+                return arreglo;
+            end if;
+        exception when invalid_text_representation then
+            null;
+        end;
+    end if;
+    return to_jsonb(string_to_array(valor, '||'));
+end;
+$$;
+
+drop view if exists vista_avance_fechas;
+drop view if exists vista_avance;
+
+alter table tareas
+    alter column fecha type date
+    using case
+        when fecha ~ '^\d{2}/\d{2}/\d{4}$' then to_date(fecha, 'DD/MM/YYYY')
+        else nullif(fecha, '')::date
+    end;
+
+alter table tareas
+    alter column tareas_json type jsonb
+    using pg_temp.tareas_a_jsonb(tareas_json);
+
+create index if not exists idx_tareas_ejecutivo_cliente_estado on tareas (ejecutivo, cliente, estado);
+create index if not exists idx_tareas_fecha on tareas (fecha);
+
+create or replace view vista_avance as
+select
+    ejecutivo,
+    cliente,
+    avg(calificacion::numeric) as promedio_usuario,
+    count(*) as tareas_evaluadas,
+    max(fecha) as ultima_evaluacion
+from tareas
+where estado = 'Finalizado' and calificacion is not null
+group by ejecutivo, cliente;
+
+commit;
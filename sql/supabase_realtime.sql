@@ -0,0 +1,8 @@
+-- Notificaciones en vivo (Supabase): publica los cambios de mensajes y tareas
+-- en el canal Realtime que escucha notificaciones.py.
+
+alter publication supabase_realtime add table mensajes, tareas;
+
+-- Los UPDATE traen la fila anterior completa: los avisos distinguen una tarea
+-- que pasa a Revision de un autoguardado de una que ya estaba en Revision.
+alter table tareas replica identity full;
@@ -0,0 +1,79 @@
+-- Rollup incremental de METRICAS (Supabase).
+-- Una fila por (ejecutivo, cliente, dia) con sumas y conteos, que se
+-- actualiza al guardar cada evaluacion. ``dia`` esta indexado para que la
+-- ventana de fechas del tablero sea un recorrido de rango; ``semana`` (lunes
+-- ISO) agrupa la tendencia. Ejecutar despues de
+-- supabase_migracion_tareas.sql y antes de supabase_metricas.sql.
+
+-- Tareas Finalizadas con su fecha como date y el lunes de su semana.
+create or replace view vista_avance_fechas as
+select
+    id,
+    ejecutivo,
+    cliente,
+    calificacion::numeric as calificacion,
+    fecha as fecha_dia,
+    date_trunc('week', fecha)::date as semana
+from tareas
+where estado = 'Finalizado' and calificacion is not null;
+
+create table if not exists metricas_rollup (
+    ejecutivo text not null,
+    cliente text not null,
+    dia date not null,
+    semana date not null,
+    suma_calificacion numeric not null default 0,
+    conteo integer not null default 0,
+    primary key (ejecutivo, cliente, dia)
+);
+
+create index if not exists idx_metricas_rollup_dia on metricas_rollup (dia, cliente);
+
+-- GUARDAR EVALUACION: finaliza la tarea y acumula su calificacion en una sola
+-- transaccion. Una tarea ya Finalizada no se vuelve a sumar.
+create or replace function registrar_evaluacion(
+    p_id bigint,
+    p_notas text,
+    p_calificacion integer
+)
+returns void
+language plpgsql
+as $$
+declare
+    t record;
+begin
+    update tareas
+       set notas_admin = p_notas,
+           calificacion = p_calificacion,
+           estado = 'Finalizado'
+     where id = p_id and estado is distinct from 'Finalizado'
+    returning ejecutivo, cliente, fecha as fecha_dia into t;
+
+    if not found then
+        return;
+    end if;
+
+    insert into metricas_rollup as r
+        (ejecutivo, cliente, dia, semana, suma_calificacion, conteo)
+    values
+        (t.ejecutivo, t.cliente, t.fecha_dia, date_trunc('week', t.fecha_dia)::date, p_calificacion, 1)
+    on conflict (ejecutivo, cliente, dia) do update set
+        suma_calificacion = r.suma_calificacion + excluded.suma_calificacion,
+        conteo = r.conteo + 1;
+end;
+$$;
+
+-- Backfill / reparacion: recalcula el rollup desde las tareas Finalizadas.
+create or replace function reconstruir_rollup()
+returns void
+language sql
+as $$
+    delete from metricas_rollup where true;
+    insert into metricas_rollup
+        (ejecutivo, cliente, dia, semana, suma_calificacion, conteo)
+    select ejecutivo, cliente, fecha_dia, min(semana), sum(calificacion), count(*)
+    from vista_avance_fechas
+    group by ejecutivo, cliente, fecha_dia;
+$$;
+
+select reconstruir_rollup();
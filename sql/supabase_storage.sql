@@ -0,0 +1,15 @@
+-- Evidencias adjuntas (Supabase Storage). Bucket privado: solo la app accede,
+-- con la clave service_role (SUPABASE_SERVICE_KEY); la clave anon no puede leer
+-- ni escribir evidencias. Los archivos se nombran por el SHA-256 de su
+-- contenido y las miniaturas viven en miniaturas/, asi que nunca se reemplazan
+-- (no hay politica de update). Cambie el nombre si usa HAYLEX_BUCKET_ADJUNTOS.
+
+insert into storage.buckets (id, name, public, file_size_limit, allowed_mime_types)
+values ('evidencias', 'evidencias', false, 10485760,
+        array['image/png', 'image/jpeg', 'application/pdf'])
+on conflict (id) do nothing;
+
+create policy "haylex evidencias lectura" on storage.objects
+    for select to service_role using (bucket_id = 'evidencias');
+create policy "haylex evidencias alta" on storage.objects
+    for insert to service_role with check (bucket_id = 'evidencias');
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+import adjuntos
+from adjuntos import AdjuntoInvalido, AlmacenLocal
+
+
+def test_imagen_danada_no_se_guarda(tmp_path):
+    pytest.importorskip("PIL")
+    almacen = AlmacenLocal(str(tmp_path))
+    with pytest.raises(AdjuntoInvalido):
+        almacen.guardar(io.BytesIO(b"no es un png"), "foto.png")
+    assert not any(p.is_file() for p in tmp_path.rglob("*"))
+
+
+def test_miniatura_fallida_guarda_el_adjunto(tmp_path, monkeypatch):
+    monkeypatch.setattr(adjuntos, "THUMBNAILS_AVAILABLE", True)
+    monkeypatch.setattr(adjuntos, "_validar_imagen", lambda ruta: None)
+
+    def falla(ruta):
+        raise OSError("truncada")
+    monkeypatch.setattr(adjuntos, "_miniatura", falla)
+    almacen = AlmacenLocal(str(tmp_path))
+    referencia = almacen.guardar(io.BytesIO(b"datos"), "foto.png")
+    assert almacen.leer(referencia) == b"datos"
+
+    # Al reintentar con la miniatura disponible se completa.
+    monkeypatch.setattr(adjuntos, "_miniatura", lambda ruta: b"mini")
+    assert almacen.guardar(io.BytesIO(b"datos"), "foto.png") == referencia
+    assert almacen.miniatura(referencia) == b"mini"
@@ -0,0 +1,44 @@
+import pytest
+
+from autoguardado import ColaAutoguardado
+
+
+class RepoInestable:
+    def __init__(self, fallos):
+        self.fallos = fallos
+        self.escritos = []
+
+    def guardar_borradores(self, borradores):
+        if self.fallos:
+            self.fallos -= 1
+            raise ConnectionError("sin conexion")
+        self.escritos.extend(borradores)
+
+
+def test_fallido_hasta_que_se_escribe():
+    repo = RepoInestable(fallos=1)
+    cola = ColaAutoguardado(repo)
+    cola._iniciar = lambda: None  # sin hilo: se vacia a mano
+    cola.encolar("EJ", "CL", ["a"], "", estado="En progreso")
+    assert not cola.fallido("EJ", "CL")
+    assert cola.vaciar() is False
+    assert cola.fallido("EJ", "CL") and cola.pendiente("EJ", "CL")
+    cola.encolar("EJ", "CL", ["a", "b"], "")
+    assert cola.vaciar() is True
+    assert not cola.fallido("EJ", "CL") and not cola.pendiente("EJ", "CL")
+    assert repo.escritos[-1]["tareas_json"] == ["a", "b"]
+    assert repo.escritos[-1]["estado"] == "En progreso"
+
+
+def test_escribir_ya_conserva_lo_pendiente_si_falla():
+    repo = RepoInestable(fallos=1)
+    cola = ColaAutoguardado(repo)
+    cola._iniciar = lambda: None
+    cola.encolar("EJ", "CL", ["a"], "", estado="En progreso")
+    with pytest.raises(ConnectionError):
+        cola.escribir_ya("EJ", "CL", ["a", "b"], "link", estado="Revision")
+    assert cola.pendiente("EJ", "CL") and repo.escritos == []
+    cola.escribir_ya("EJ", "CL", ["a", "b"], "link", estado="Revision")
+    assert not cola.pendiente("EJ", "CL")
+    assert repo.escritos == [dict(repo.escritos[0], tareas_json=["a", "b"], evidencia_link="link", estado="Revision")]
+    assert cola.vaciar() is True and len(repo.escritos) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from cache import CacheCompartida, CacheConsultas, RepositorioCacheado, tablas_de_evento
+from estado import EstadoMemoria
+from notificaciones import Evento
+from repositorio import RepositorioSQLite
+
+
+class RepoLento:
+    """``listar_clientes`` devuelve lo leido aunque otra sesion escriba mientras tanto."""
+
+    def __init__(self):
+        self.clientes = ["VIEJO"]
+        self.lecturas = 0
+        self.durante_lectura = None
+
+    def listar_clientes(self, ejecutivo=None):
+        self.lecturas += 1
+        leidos = list(self.clientes)
+        if self.durante_lectura is not None:
+            accion, self.durante_lectura = self.durante_lectura, None
+            accion()
+        return leidos
+
+    def crear_cliente(self, nombre):
+        self.clientes.append(nombre)
+
+
+@pytest.mark.parametrize("cache", [CacheConsultas(), CacheCompartida(EstadoMemoria())])
+def test_no_guarda_lectura_invalidada_durante_la_consulta(cache):
+    base = RepoLento()
+    repo = RepositorioCacheado(base, cache)
+    base.durante_lectura = lambda: repo.crear_cliente("NUEVO")
+    assert repo.listar_clientes() == ["VIEJO"]
+    assert repo.listar_clientes() == ["VIEJO", "NUEVO"]
+    assert repo.listar_clientes() == ["VIEJO", "NUEVO"]
+    assert base.lecturas == 2
+
+
+def test_autoguardado_no_invalida_metricas(tmp_path):
+    cache = CacheConsultas()
+    repo = RepositorioCacheado(RepositorioSQLite(str(tmp_path / "metricas.db")), cache)
+    borrador = {"ejecutivo": "EJ", "cliente": "CL", "tareas_json": ["a"], "evidencia_link": "",
+                "fecha": "2026-10-05", "estado": "Revision"}
+    repo.guardar_borradores([borrador])
+    antes = cache.version("metricas_rollup")
+    repo.guardar_borradores([dict(borrador, tareas_json=["a", "b"])])
+    assert cache.version("metricas_rollup") == antes
+
+    repo.evaluar_tareas([(repo.obtener_tarea_activa("EJ", "CL")["id"], "ok", 90)])
+    assert cache.version("metricas_rollup") != antes
+
+
+def test_tablas_de_evento():
+    assert tablas_de_evento(Evento(1, "tareas", "UPDATE", {"estado": "En progreso"})) == ("tareas",)
+    assert tablas_de_evento(Evento(2, "tareas", "UPDATE", {"estado": "Finalizado"})) == ("tareas", "metricas_rollup")
+    assert tablas_de_evento(Evento(3, "tareas", "UPDATE", {"estado": "Revision", "estado_anterior": "Finalizado"})) \
+        == ("tareas", "metricas_rollup")
+    assert tablas_de_evento(Evento(4, "tareas", "DELETE", {})) == ("tareas", "metricas_rollup")
+    assert tablas_de_evento(Evento(5, "mensajes", "INSERT", {})) == ("mensajes",)
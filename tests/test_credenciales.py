@@ -0,0 +1,81 @@
+import pytest
+
+import credenciales
+from cache import CacheConsultas, RepositorioCacheado
+from credenciales import (CUBETA_USUARIO, DemasiadosIntentos, LimitadorIntentos, autenticar, hashear,
+                          necesita_rehash, verificar)
+from repositorio import RepositorioSQLite
+
+
+def test_hash_y_verificacion():
+    guardado = hashear("clave segura")
+    assert guardado != hashear("clave segura")  # sal aleatoria
+    assert verificar("clave segura", guardado)
+    assert not verificar("otra", guardado)
+    assert not verificar("clave segura", "scrypt$roto")
+    assert not verificar("clave segura", None)
+
+
+def test_pbkdf2_sin_scrypt(monkeypatch):
+    monkeypatch.setattr(credenciales, "SCRYPT_AVAILABLE", False)
+    guardado = hashear("ñandú")
+    assert guardado.startswith("pbkdf2_sha256$")
+    assert verificar("ñandú", guardado)
+    assert not necesita_rehash(guardado)
+
+
+def test_autenticar_pasa_a_hash_la_clave_antigua(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "h.db"))
+    repo.con.execute("INSERT INTO usuarios (usuario, pass, rol) VALUES ('ANA', 'plana', 'user')")
+    assert autenticar(repo, "ANA", "mala") is None
+    assert autenticar(repo, "ANA", "plana") == {"usuario": "ANA", "rol": "user"}
+    assert credenciales.es_hash(repo.credencial("ANA")["pass"])
+    assert autenticar(repo, "ANA", "plana") is not None
+    assert autenticar(repo, "NADIE", "plana") is None
+
+
+def test_el_hash_no_queda_en_cache(tmp_path):
+    repo = RepositorioCacheado(RepositorioSQLite(str(tmp_path / "c.db")), CacheConsultas())
+    repo.crear_usuario("ANA", "clave")
+    assert repo.obtener_usuario("ANA") == {"usuario": "ANA", "rol": "user"}
+    assert autenticar(repo, "ANA", "clave") is not None
+    assert all("pass" not in repr(v) for v in repo.cache._datos.values())
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_limitador_cuenta_solo_fallos(tmp_path, monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(credenciales.time, "monotonic", reloj)
+    monkeypatch.setattr(credenciales, "LIMITADOR", LimitadorIntentos())
+    repo = RepositorioSQLite(str(tmp_path / "l.db"))
+    repo.crear_usuario("ANA", "clave")
+    capacidad, segundos = CUBETA_USUARIO
+    for _ in range(capacidad * 2):
+        assert credenciales.iniciar_sesion(repo, "ANA", "clave", "1.2.3.4") is not None
+    for _ in range(capacidad):
+        assert credenciales.iniciar_sesion(repo, "ANA", "mala", "1.2.3.4") is None
+    # Bloqueado incluso con la clave correcta hasta que se repone una ficha.
+    with pytest.raises(DemasiadosIntentos) as error:
+        credenciales.iniciar_sesion(repo, "ANA", "clave", "1.2.3.4")
+    assert error.value.espera == pytest.approx(segundos)
+    reloj.ahora += segundos
+    assert credenciales.iniciar_sesion(repo, "ANA", "clave", "1.2.3.4") is not None
+
+
+def test_limitador_por_ip_y_reinicio(monkeypatch):
+    monkeypatch.setattr(credenciales.time, "monotonic", Reloj())
+    limitador = LimitadorIntentos()
+    capacidad, _ = credenciales.CUBETA_IP
+    for i in range(capacidad):
+        limitador.consumir(f"U{i}", "9.9.9.9")
+    with pytest.raises(DemasiadosIntentos):
+        limitador.consumir("OTRO", "9.9.9.9")
+    limitador.reiniciar()
+    limitador.consumir("OTRO", "9.9.9.9")
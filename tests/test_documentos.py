@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from documentos import ErrorPDF, MotorPDF, PDFNoDisponible
+
+
+def test_error_de_render_se_informa_y_se_reintenta():
+    motor = MotorPDF(trabajadores=1)
+    intentos = []
+
+    def render():
+        intentos.append(1)
+        if len(intentos) == 1:
+            raise ValueError("fuente rota")
+        return b"%PDF"
+
+    with pytest.raises(ErrorPDF):
+        motor.obtener("guia", render)
+    assert motor.obtener("guia", render) == b"%PDF"
+    assert motor.obtener("guia", render) == b"%PDF"
+    assert len(intentos) == 2
+
+
+def test_espera_corta_sin_bloquear():
+    motor = MotorPDF(trabajadores=1)
+    liberar = threading.Event()
+
+    def render():
+        liberar.wait(5)
+        return b"%PDF"
+
+    with pytest.raises(PDFNoDisponible):
+        motor.obtener("guia", render, espera=0.01)
+    liberar.set()
+    assert motor.obtener("guia", render, espera=5) == b"%PDF"
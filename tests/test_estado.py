@@ -0,0 +1,29 @@
+import pytest
+
+import estado
+from estado import EstadoMemoria, EstadoSQLite
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(estado, "PURGAR_CADA", 1)
+    if request.param == "memoria":
+        return EstadoMemoria(max_claves=10)
+    return EstadoSQLite(str(tmp_path / "estado.db"), max_claves=10)
+
+
+def test_lleno_solo_descarta_cache(almacen):
+    almacen.guardar("sesion:revocada:viejo", True, 3600)
+    almacen.guardar("borrador:ANA", {"cliente": "CL"}, 3600)
+    for i in range(50):
+        almacen.guardar(f"cache:tareas:{i}", i, 60)
+    assert almacen.obtener("sesion:revocada:viejo") == (True, True)
+    assert almacen.obtener("borrador:ANA")[0]
+    assert almacen.contar_prefijo("cache:") <= 10
+    assert almacen.obtener("cache:tareas:49") == (True, 49)
+
+
+def test_sin_cache_no_descarta_nada(almacen):
+    for i in range(30):
+        almacen.guardar(f"sesion:revocada:{i}", True, 3600)
+    assert almacen.contar_prefijo("sesion:revocada:") == 30
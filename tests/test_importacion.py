@@ -0,0 +1,29 @@
+import pytest
+
+from importacion import (COLUMNAS_CLIENTES, COLUMNAS_USUARIOS, CSVInvalido, leer_csv, validar_reasignaciones,
+                         validar_usuarios)
+
+
+def test_reasignaciones_cuentan_filas():
+    contenido = "cliente,ejecutivo\nA,E2\nB,E2\nC,E2\nD,E1\n".encode("utf-8")
+    clientes = [{"nombre_cliente": n, "ejecutivo_asignado": "E1"} for n in "ABCD"]
+    resultado = validar_reasignaciones(leer_csv(contenido, COLUMNAS_CLIENTES), ["E1", "E2"], clientes)
+    assert resultado.validas == [("A", "E2"), ("B", "E2"), ("C", "E2")]
+    assert resultado.existentes == ["D"]
+    assert resultado.total == 4
+
+
+def test_csv_mal_formado_es_error_de_archivo():
+    contenido = ('usuario,clave\n"ANA' + "x" * 200000 + "\n").encode("utf-8")
+    with pytest.raises(CSVInvalido, match="mal formado"):
+        leer_csv(contenido, COLUMNAS_USUARIOS)
+    # Lo que no es UTF-8 se lee como latin-1 en lugar de fallar.
+    assert leer_csv("usuario,clave\nNUÑEZ,x\n".encode("latin-1"), COLUMNAS_USUARIOS)[0]["usuario"] == "NUÑEZ"
+
+
+def test_rol_admin_requiere_confirmacion():
+    filas = leer_csv(b"usuario,clave,rol\nANA,x,user\nJEFE,y,admin\n", COLUMNAS_USUARIOS)
+    resultado = validar_usuarios(filas, [])
+    assert resultado.validas == [("ANA", "x", "user")]
+    assert [(e.valor, e.motivo) for e in resultado.errores] == [("JEFE", "Rol admin sin confirmar")]
+    assert validar_usuarios(filas, [], permitir_admin=True).validas == [("ANA", "x", "user"), ("JEFE", "y", "admin")]
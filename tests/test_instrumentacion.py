@@ -0,0 +1,33 @@
+import json
+import urllib.request
+
+import pytest
+
+import instrumentacion
+from instrumentacion import MUESTRA_BYTES, _bytes
+
+
+def test_bytes_exacto_en_resultados_cortos():
+    filas = [{"id": i, "cliente": "CL"} for i in range(MUESTRA_BYTES)]
+    assert _bytes(filas) == len(json.dumps(filas).encode("utf-8"))
+    assert _bytes(None) == 4
+
+
+def test_bytes_estimado_en_resultados_largos():
+    filas = [{"id": i, "tareas_json": ["x" * (i % 7)]} for i in range(5000)]
+    exacto = len(json.dumps(filas).encode("utf-8"))
+    assert _bytes(filas) == pytest.approx(exacto, rel=0.1)
+    assert _bytes({"a": filas, "b": filas[:3]}) == pytest.approx(exacto + len(json.dumps(filas[:3])), rel=0.1)
+
+
+def test_servidor_metricas_local_por_defecto(monkeypatch):
+    monkeypatch.setattr(instrumentacion, "_servidor", None)
+    servidor = instrumentacion.iniciar_servidor_metricas(0)
+    try:
+        host, puerto = servidor.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics", timeout=5) as r:
+            assert b"haylex_consultas_total" in r.read()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
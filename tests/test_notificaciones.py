@@ -0,0 +1,47 @@
+import notificaciones
+import repositorio
+from notificaciones import BusEventos, enviada_a_revision
+from repositorio import RepositorioSQLite
+
+
+def _borrador(estado=None, tareas=("a",)):
+    return {"ejecutivo": "EJ", "cliente": "CL", "tareas_json": list(tareas), "evidencia_link": "",
+            "fecha": "2026-10-18", "estado": estado}
+
+
+def test_solo_avisa_la_transicion_a_revision(tmp_path, monkeypatch):
+    bus = BusEventos()
+    monkeypatch.setattr(repositorio, "BUS", bus)
+    repo = RepositorioSQLite(str(tmp_path / "avisos.db"))
+
+    repo.guardar_borradores([_borrador()])
+    repo.guardar_borradores([_borrador("Revision")])
+    # Autoguardados de una tarea que ya esta en Revision.
+    repo.guardar_borradores([_borrador(tareas=("b",))])
+    repo.guardar_borradores([_borrador(tareas=("c",))])
+
+    envios = [e for e in bus.eventos_desde(0) if enviada_a_revision(e)]
+    assert len(envios) == 1
+
+
+def test_realtime_incluye_estado_anterior(monkeypatch):
+    bus = BusEventos()
+    monkeypatch.setattr(notificaciones, "BUS", bus)
+    notificaciones._publicar_cambio("tareas", {"data": {
+        "type": "UPDATE", "record": {"id": 1, "estado": "Revision"}, "old_record": {"id": 1, "estado": "Revision"}}})
+    notificaciones._publicar_cambio("tareas", {"data": {
+        "type": "UPDATE", "record": {"id": 2, "estado": "Revision"}, "old_record": {"id": 2, "estado": "En progreso"}}})
+    assert [e.fila["id"] for e in bus.eventos_desde(0) if enviada_a_revision(e)] == [2]
+
+
+def test_evaluar_dos_veces_publica_una(tmp_path, monkeypatch):
+    bus = BusEventos()
+    monkeypatch.setattr(repositorio, "BUS", bus)
+    repo = RepositorioSQLite(str(tmp_path / "evaluar.db"))
+    repo.guardar_borradores([_borrador("Revision")])
+    tarea_id = repo.obtener_tarea_activa("EJ", "CL")["id"]
+    desde = bus.eventos_desde(0)[-1].secuencia
+
+    repo.evaluar_tareas([(tarea_id, "bien", 5)])
+    repo.evaluar_tareas([(tarea_id, "otra vez", 3), (tarea_id + 99, "no existe", 1)])
+    assert [(e.fila["id"], e.fila["calificacion"]) for e in bus.eventos_desde(desde)] == [(tarea_id, 5)]
@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+
+import pytest
+
+import repositorio
+from repositorio import VERSION_TAREAS_SQLITE, RepositorioSQLite, items_de_fila, leer_en_paralelo, obtener_conexion
+
+
+def test_items_de_fila_formatos():
+    assert items_de_fila('["a", "b"]') == ["a", "b"]
+    assert items_de_fila("a||b") == ["a", "b"]
+    assert items_de_fila("") == []
+
+
+def test_items_de_fila_corchete_antiguo():
+    assert items_de_fila("[URGENTE] llamar||enviar") == ["[URGENTE] llamar", "enviar"]
+    # JSON valido que no es arreglo tambien es texto antiguo.
+    assert items_de_fila('["sin cerrar') == ['["sin cerrar']
+
+
+def test_migracion_con_fila_antigua_entre_corchetes(tmp_path):
+    ruta = str(tmp_path / "antigua.db")
+    con = sqlite3.connect(ruta)
+    con.execute("CREATE TABLE tareas (id INTEGER PRIMARY KEY AUTOINCREMENT, fecha TEXT, ejecutivo TEXT, "
+                "cliente TEXT, tareas_json TEXT, evidencia_link TEXT, notas_ejecutivo TEXT, "
+                "notas_admin TEXT, calificacion INTEGER, estado TEXT)")
+    con.executemany(
+        "INSERT INTO tareas (fecha, ejecutivo, cliente, tareas_json, estado, calificacion) VALUES (?, ?, ?, ?, ?, ?)",
+        [("05/10/2026", "EJ", "CL", "[URGENTE] llamar||enviar", "En progreso", 0),
+         ("2026-10-06", "EJ", "CL2", "[OJO] revisar", "En progreso", 0)])
+    con.commit()
+    con.close()
+
+    repo = RepositorioSQLite(ruta)
+    tarea = repo.obtener_tarea_activa("EJ", "CL")
+    assert tarea["fecha"] == "2026-10-05"
+    assert tarea["tareas_json"] == ["[URGENTE] llamar", "enviar"]
+    assert repo.obtener_tarea_activa("EJ", "CL2")["tareas_json"] == ["[OJO] revisar"]
+    filas = sqlite3.connect(ruta).execute("SELECT tareas_json FROM tareas ORDER BY id").fetchall()
+    assert filas == [('["[URGENTE] llamar", "enviar"]',), ('["[OJO] revisar"]',)]
+    assert sqlite3.connect(ruta).execute("PRAGMA user_version").fetchone()[0] == VERSION_TAREAS_SQLITE
+
+
+def test_migracion_al_abrir_solo_una_vez(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "nueva.db")
+    obtener_conexion(ruta)
+    monkeypatch.delitem(repositorio._POOL, ruta)
+    monkeypatch.setattr(repositorio, "_migrar_tareas_sqlite", lambda con: pytest.fail("migro otra vez"))
+    obtener_conexion(ruta)
+
+
+def test_leer_en_paralelo_secuencial_en_sqlite(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "lecturas.db"))
+    hilo = lambda: threading.current_thread().name
+    assert set(leer_en_paralelo(repo, a=(hilo,), b=(hilo,)).values()) == {threading.current_thread().name}
+
+    class Concurrente:
+        lecturas_concurrentes = True
+    assert threading.current_thread().name not in leer_en_paralelo(Concurrente(), a=(hilo,), b=(hilo,)).values()
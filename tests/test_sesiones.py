@@ -0,0 +1,47 @@
+import pytest
+
+from credenciales import hashear
+from estado import EstadoMemoria
+from sesiones import COOKIE_SESION, Sesiones, script_cookie
+
+
+@pytest.fixture
+def claves():
+    return {"ANA": hashear("vieja")}
+
+
+@pytest.fixture
+def sesiones():
+    return Sesiones(EstadoMemoria(), "secreto")
+
+
+def test_emitir_validar_revocar(sesiones, claves):
+    token = sesiones.emitir("ANA", "user", claves["ANA"])
+    assert sesiones.validar(token, claves.get) == {"user": "ANA", "rol": "user"}
+    sesiones.revocar(token, claves.get)
+    assert sesiones.validar(token, claves.get) is None
+
+
+@pytest.mark.parametrize("token", [None, "", "sin-punto", "é.x", "abc.é", "a.b", "%%.%%", "W10.AAAA"])
+def test_token_invalido_no_falla(sesiones, claves, token):
+    assert sesiones.validar(token, claves.get) is None
+
+
+def test_token_alterado(sesiones, claves):
+    datos, firma = sesiones.emitir("ANA", "user", claves["ANA"]).split(".")
+    otro = sesiones.emitir("ANA", "admin", claves["ANA"]).split(".")[0]
+    assert sesiones.validar(f"{otro}.{firma}", claves.get) is None
+
+
+def test_cambio_de_clave_invalida_tokens(sesiones, claves):
+    token = sesiones.emitir("ANA", "user", claves["ANA"])
+    claves["ANA"] = hashear("nueva")
+    assert sesiones.validar(token, claves.get) is None
+    assert sesiones.validar(token, {}.get) is None  # usuario borrado
+
+
+def test_script_cookie(sesiones, claves):
+    token = sesiones.emitir("ANA", "user", claves["ANA"])
+    script = script_cookie(token, 60)
+    assert f"{COOKIE_SESION}={token}; path=/; max-age=60; SameSite=Strict" in script
+    assert f"{COOKIE_SESION}=; path=/; max-age=0;" in script_cookie(None)